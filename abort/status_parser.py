@@ -1,41 +1,40 @@
 import os
-import re
+import sys
+import getpass
+import argparse
 import subprocess
 
+# 作业状态表在上级目录的 job_tracker.py 中
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if base_dir not in sys.path:
+    sys.path.insert(0, base_dir)
+
+from job_tracker import SUBMIT_LOG_PATH, JobTracker, get_job_tracker, parse_submit_lines
+
 # 日志文件路径
-LOG_FILE_PATH = os.path.expanduser('~/.sub/submit.log')
+LOG_FILE_PATH = SUBMIT_LOG_PATH
 
 def parse_submit_log(log_file=LOG_FILE_PATH):
     """
     解析 submit.log 文件，提取任务号和对应的 gjf 文件路径。
-    返回一个任务字典，格式为 {'job_id': 'gjf_file_path'}
+    返回一个任务字典，格式为 {'job_id': 'gjf_file_path'}；作业数组元素的任务号为 '作业号_序号'。
+    提交失败（任务号为空）的行被跳过。需要反复查询时使用 check_job_status，只读取新追加的行。
     """
-    tasks = {}
-
     with open(log_file, 'r') as f:
-        for line in f:
-            # 使用正则表达式匹配任务号和文件路径
-            match = re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} - Job (\d+): (.*\.gjf)$', line)
-            if match:
-                job_id, gjf_file = match.groups()
-                tasks[job_id] = gjf_file
-            # 处理任务号为空的情况（即提交失败的情况）
-            elif re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} - Job :', line):
-                continue
-
-    return tasks
+        return {job_id: gjf_file for job_id, gjf_file, _ in parse_submit_lines(f.read())}
 
 def get_running_jobs():
     """
-    使用 squeue 命令获取当前正在运行的任务号。
-    返回一个列表，包含当前运行的 job_id。
+    使用 squeue 命令获取当前用户在队列中的任务号。
+    返回一个列表，包含当前排队或运行的 job_id；-r 使作业数组的每个元素单独一行（'作业号_序号'）。
     """
     running_jobs = []
     try:
-        result = subprocess.run(['squeue', '--noheader', '--format=%A'], stdout=subprocess.PIPE, text=True)
+        result = subprocess.run(['squeue', '-u', getpass.getuser(), '-r', '--noheader', '--format=%i'],
+                                stdout=subprocess.PIPE, text=True)
         if result.returncode == 0:
             # 按行分割输出，提取 job_id 列表
-            running_jobs = result.stdout.strip().split('\n')
+            running_jobs = result.stdout.split()
         else:
             print("Error executing squeue.")
     except Exception as e:
@@ -43,30 +42,43 @@ def get_running_jobs():
 
     return running_jobs
 
-def check_job_status(log_file=LOG_FILE_PATH):
+def check_job_status(log_file=LOG_FILE_PATH, tracker=None, refresh=True):
     """
-    比对 submit.log 和当前运行的任务，返回一个字典。
-    字典的格式为 {'job_id': 'running/finished'}，表示每个任务的运行状态。
+    增量同步 submit.log 并用一次批量 sacct 刷新未结束的作业，返回一个字典。
+    字典的格式为 {'job_id': 状态}，状态为 PENDING/RUNNING/COMPLETED/FAILED/TIMEOUT/OOM/CANCELLED/UNKNOWN
+    （见 job_tracker.py）。
     """
-    job_status = {}
-    
-    # 解析日志文件中的任务号
-    submitted_jobs = parse_submit_log(log_file)
-    
-    # 获取当前正在运行的任务号
-    running_jobs = get_running_jobs()
-    
-    # 判断每个任务是否还在运行
-    for job_id, gjf_file in submitted_jobs.items():
-        if job_id in running_jobs:
-            job_status[job_id] = 'running'
-        else:
-            job_status[job_id] = 'finished'
+    tracker = tracker or get_job_tracker()
+    tracker.sync_log(log_file)
+    if refresh:
+        tracker.refresh()
+    return {job_id: state for job_id, (_, state) in tracker.states().items()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Track the state of jobs listed in submit.log.')
+    parser.add_argument('--log', default=LOG_FILE_PATH, help='submit.log to read (default: ~/.sub/submit.log)')
+    parser.add_argument('--db', default=None, help='Job store (default: $AUTOTASKER_JOBS_PATH)')
+    parser.add_argument('--no-refresh', action='store_true', help='Only read new submit.log lines, do not call sacct')
+    parser.add_argument('--quiet', action='store_true', help='Only print a summary')
+    args = parser.parse_args()
+
+    tracker = JobTracker(args.db)
+    try:
+        added = tracker.sync_log(args.log)
+        changed = 0 if args.no_refresh else tracker.refresh()
+        states = tracker.states()
+    finally:
+        tracker.close()
 
-    return job_status
+    if not args.quiet:
+        for job_id, (gjf_file, state) in states.items():
+            print(f"Job {job_id}: {state} {gjf_file}")
+    counts = {}
+    for _, state in states.values():
+        counts[state] = counts.get(state, 0) + 1
+    summary = ', '.join(f"{state} {count}" for state, count in sorted(counts.items()))
+    print(f"{len(states)} jobs ({added} new, {changed} changed): {summary or 'none'}")
 
 # 测试函数调用
 if __name__ == "__main__":
-    job_status = check_job_status()
-    for job_id, status in job_status.items():
-        print(f"Job {job_id}: {status}")
+    main()
@@ -0,0 +1,336 @@
+"""
+CAS 号 -> SMILES 解析。
+
+查询顺序：
+    1. 本地缓存表（$AUTOTASKER_CACHE_PATH/cas_cache.db）
+    2. 本地数据集：AUTOTASKER_CAS_TABLE 指定的 TSV/CSV 文件（多个用 : 分隔），
+       每行 "CAS号<TAB或逗号>SMILES"，文件变化后自动重新导入缓存表
+    3. PubChem，仅在 AUTOTASKER_CAS_NETWORK=1 时使用，每秒不超过 PUBCHEM_RATE 个请求；
+       查到的结果写入缓存表，查不到的 CAS 号在一天内不再重复请求
+缓存目录不可写或数据库无法打开时退化为进程内的字典，不影响解析。
+
+其他环境变量：
+    AUTOTASKER_PUBCHEM_URL     PUG REST 根地址（默认 https://pubchem.ncbi.nlm.nih.gov/rest/pug），可指向本地测试服务
+    AUTOTASKER_CAS_TIMEOUT     单次请求超时秒数（默认 10）
+
+命令行：
+    python cas_resolver.py import table.tsv [more.csv ...]
+    python cas_resolver.py resolve 50-00-0 64-17-5
+case/bench_cas.py 用本地的 PubChem 替身检查网络查询。
+"""
+import os
+import csv
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from urllib.parse import quote
+
+from config import AUTOTASKER_CACHE_PATH
+from sqlite_store import Schema, open_database, rebuild
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = Schema(
+    version=1,
+    statements=(
+        # smiles 为 NULL 表示网络查询未找到
+        "CREATE TABLE IF NOT EXISTS cas ("
+        " cas TEXT PRIMARY KEY,"
+        " smiles TEXT,"
+        " source TEXT NOT NULL,"
+        " updated REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS datasets ("
+        " path TEXT PRIMARY KEY,"
+        " size INTEGER NOT NULL,"
+        " mtime_ns INTEGER NOT NULL)",
+    ),
+    check_table='cas',
+)
+DEFAULT_PUBCHEM_URL = 'https://pubchem.ncbi.nlm.nih.gov/rest/pug'
+# 网络查询失败（未收录）的 CAS 号在此时间内不再请求
+NEGATIVE_TTL = 24 * 3600
+# PubChem 限制每秒不超过 5 个请求：并发数只限制同时进行的请求，发出请求的间隔由 RateLimiter 控制
+PUBCHEM_RATE = 5
+NETWORK_WORKERS = 5
+
+
+def default_cache_path():
+    return os.path.join(AUTOTASKER_CACHE_PATH, 'cas_cache.db')
+
+
+def _env_datasets():
+    value = os.getenv('AUTOTASKER_CAS_TABLE', '')
+    return [os.path.expanduser(path) for path in value.split(':') if path]
+
+
+def read_table(path):
+    """
+    逐行产出 (CAS号, SMILES)。分隔符按扩展名判断（.csv 为逗号，其余为制表符），
+    自动跳过表头和空行。
+    """
+    delimiter = ',' if path.lower().endswith('.csv') else '\t'
+    with open(path, 'r', newline='') as f:
+        for row in csv.reader(f, delimiter=delimiter):
+            if len(row) < 2:
+                continue
+            cas, smiles = row[0].strip(), row[1].strip()
+            if not cas or not smiles or cas.lower() in ('cas', 'cas_number', 'casrn'):
+                continue
+            yield cas, smiles
+
+
+class RateLimiter:
+    """
+    线程安全的请求间隔控制：相邻两次 wait() 返回的时间至少相隔 1/rate 秒。
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class CasResolver:
+    def __init__(self, db_path=None, datasets=None, network=None, base_url=None, timeout=None, rate=PUBCHEM_RATE):
+        self.db_path = db_path or default_cache_path()
+        self.datasets = _env_datasets() if datasets is None else list(datasets)
+        self.network = os.getenv('AUTOTASKER_CAS_NETWORK', '0') == '1' if network is None else network
+        self.base_url = (base_url or os.getenv('AUTOTASKER_PUBCHEM_URL', DEFAULT_PUBCHEM_URL)).rstrip('/')
+        self.timeout = timeout if timeout is not None else float(os.getenv('AUTOTASKER_CAS_TIMEOUT', '10'))
+        self.limiter = RateLimiter(rate)
+        self.pid = os.getpid()
+        self.conn = None
+        # 缓存数据库不可用时的进程内缓存：{cas: (smiles, updated)}
+        self.memory = {}
+        self._datasets_checked = False
+        self._open()
+
+    def _open(self):
+        try:
+            self.conn = open_database(self.db_path, SCHEMA, 'CAS cache')
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"CAS cache {self.db_path} unavailable ({e}), results are kept in memory only.")
+            self.conn = None
+
+    def _rebuild(self, error):
+        logger.warning(f"CAS cache {self.db_path} is corrupt ({error}), rebuilding.")
+        conn, self.conn = self.conn, None
+        try:
+            self.conn = rebuild(conn, self.db_path, SCHEMA)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"CAS cache {self.db_path} unavailable ({e}), results are kept in memory only.")
+        self._datasets_checked = False
+
+    # ---------- 本地表 ----------
+
+    def _lookup(self, cas_numbers):
+        """
+        返回 {cas: smiles 或 None}，None 表示近期网络查询未找到；未记录的 CAS 号不出现在结果中。
+        """
+        found = {}
+        cas_numbers = list(cas_numbers)
+        now = time.time()
+        if self.conn is None:
+            for cas in cas_numbers:
+                if cas in self.memory:
+                    smiles, updated = self.memory[cas]
+                    if smiles is not None or now - updated <= NEGATIVE_TTL:
+                        found[cas] = smiles
+            return found
+        for start in range(0, len(cas_numbers), 500):
+            chunk = cas_numbers[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT cas, smiles, updated FROM cas WHERE cas IN ({','.join('?' * len(chunk))})", chunk)
+            for cas, smiles, updated in rows:
+                if smiles is None and now - updated > NEGATIVE_TTL:
+                    continue
+                found[cas] = smiles
+        return found
+
+    def _store(self, entries, source):
+        now = time.time()
+        if self.conn is None:
+            self.memory.update((cas, (smiles, now)) for cas, smiles in entries)
+            return
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO cas (cas, smiles, source, updated) VALUES (?, ?, ?, ?)",
+            [(cas, smiles, source, now) for cas, smiles in entries])
+        self.conn.commit()
+
+    def import_table(self, path):
+        """
+        把 TSV/CSV 数据集导入本地表，返回导入的条数。
+        """
+        count = 0
+        batch = []
+        for entry in read_table(path):
+            batch.append(entry)
+            if len(batch) >= 10000:
+                self._store(batch, 'import')
+                count += len(batch)
+                batch = []
+        if batch:
+            self._store(batch, 'import')
+            count += len(batch)
+        if self.conn is None:
+            return count
+        st = os.stat(path)
+        self.conn.execute("INSERT OR REPLACE INTO datasets (path, size, mtime_ns) VALUES (?, ?, ?)",
+                          (os.path.realpath(path), st.st_size, st.st_mtime_ns))
+        self.conn.commit()
+        return count
+
+    def _refresh_datasets(self):
+        """
+        导入自上次以来新增或修改过的数据集文件（每个实例只检查一次）。
+        """
+        if self._datasets_checked:
+            return
+        self._datasets_checked = True
+        for path in self.datasets:
+            try:
+                st = os.stat(path)
+            except OSError:
+                logger.warning(f"CAS table {path} not found.")
+                continue
+            if self.conn is None:
+                logger.info(f"Imported {self.import_table(path)} CAS entries from {path} into memory")
+                continue
+            row = self.conn.execute("SELECT size, mtime_ns FROM datasets WHERE path = ?",
+                                    (os.path.realpath(path),)).fetchone()
+            if row is not None and tuple(row) == (st.st_size, st.st_mtime_ns):
+                continue
+            count = self.import_table(path)
+            logger.info(f"Imported {count} CAS entries from {path}")
+
+    # ---------- 网络 ----------
+
+    def _fetch(self, session, cas):
+        url = f"{self.base_url}/compound/name/{quote(cas)}/property/CanonicalSMILES/JSON"
+        self.limiter.wait()
+        response = session.get(url, timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        properties = response.json()['PropertyTable']['Properties'][0]
+        # PubChem 新版接口把 CanonicalSMILES 改名为 ConnectivitySMILES
+        for key in ('CanonicalSMILES', 'ConnectivitySMILES', 'SMILES', 'IsomericSMILES'):
+            if properties.get(key):
+                return properties[key]
+        return None
+
+    def _fetch_many(self, cas_numbers):
+        """
+        并发查询 PubChem（请求间隔由 self.limiter 控制），返回 {cas: smiles 或 None}；网络错误的 CAS 号不出现在结果中（下次重试）。
+        """
+        import requests
+        from concurrent.futures import ThreadPoolExecutor
+
+        results = {}
+        with requests.Session() as session, \
+                ThreadPoolExecutor(max_workers=min(NETWORK_WORKERS, len(cas_numbers))) as executor:
+            futures = {cas: executor.submit(self._fetch, session, cas) for cas in cas_numbers}
+            for cas, future in futures.items():
+                try:
+                    results[cas] = future.result()
+                except Exception as e:
+                    logger.warning(f"PubChem lookup failed for CAS {cas}: {e}")
+        return results
+
+    # ---------- 对外接口 ----------
+
+    def resolve_many(self, cas_numbers):
+        """
+        批量解析，返回 {cas: smiles 或 None}（None 表示未找到）。
+        """
+        cas_numbers = list(dict.fromkeys(cas.strip() for cas in cas_numbers))
+        results = {cas: None for cas in cas_numbers}
+        if not cas_numbers:
+            return results
+
+        try:
+            known = self._lookup(cas_numbers)
+            # 近期网络查询未找到的 CAS 号仍然可能在本地数据集中
+            if self.datasets and any(known.get(cas) is None for cas in cas_numbers):
+                self._refresh_datasets()
+                known.update(self._lookup([cas for cas in cas_numbers if known.get(cas) is None]))
+            missing = [cas for cas in cas_numbers if cas not in known]
+        except sqlite3.DatabaseError as e:
+            self._rebuild(e)
+            return self.resolve_many(cas_numbers)
+        results.update(known)
+
+        if missing and self.network:
+            fetched = self._fetch_many(missing)
+            results.update(fetched)
+            try:
+                self._store(fetched.items(), 'pubchem')
+            except sqlite3.Error as e:
+                logger.warning(f"Cannot write CAS cache {self.db_path}: {e}")
+        return results
+
+    def resolve(self, cas_number):
+        smiles = self.resolve_many([cas_number])[cas_number.strip()]
+        if smiles is None:
+            hint = "" if self.network else " (network lookup disabled, set AUTOTASKER_CAS_NETWORK=1 or import a CAS table)"
+            raise ValueError(f"SMILES not found for CAS number: {cas_number}{hint}")
+        return smiles
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+_default_resolver = None
+
+
+def get_cas_resolver():
+    """
+    返回进程级共享的解析器实例。
+    """
+    global _default_resolver
+    # fork 出的子进程不能复用父进程的 SQLite 连接
+    if _default_resolver is None or _default_resolver.pid != os.getpid():
+        _default_resolver = CasResolver()
+    return _default_resolver
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resolve CAS numbers to SMILES.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help='Import TSV/CSV tables of "CAS SMILES" rows')
+    import_parser.add_argument('tables', nargs='+')
+    resolve_parser = subparsers.add_parser('resolve', help='Print "CAS<TAB>SMILES" for each CAS number')
+    resolve_parser.add_argument('cas_numbers', nargs='+')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    resolver = CasResolver()
+    try:
+        if args.command == 'import':
+            for path in args.tables:
+                print(f"{path}: {resolver.import_table(path)} entries")
+        else:
+            results = resolver.resolve_many(args.cas_numbers)
+            for cas, smiles in results.items():
+                print(f"{cas}\t{smiles or ''}")
+            if not all(results.values()):
+                sys.exit(1)
+    finally:
+        resolver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+用本地的 PubChem 替身检查 cas_resolver.py 的网络查询。
+
+在本机端口上启动一个 http.server，按 PUG REST 的路径应答：
+    KNOWN 中的 CAS 号    200，返回 {"PropertyTable": {"Properties": [{"CanonicalSMILES": ...}]}}
+    SLOW 中的 CAS 号     超过 --timeout 后才应答
+    其余                 404
+AUTOTASKER_PUBCHEM_URL 指向替身，依次检查：
+    hits       查到的结果正确，再次解析时命中缓存表，不再请求
+    negative   404 的 CAS 号返回 None，NEGATIVE_TTL 内不再请求
+    timeout    超时的 CAS 号返回 None 且不写入缓存，下次重新请求
+    rate       任意 1 秒内（扣除 JITTER 的计时误差）替身收到的请求不超过 PUBCHEM_RATE 个
+    fallback   缓存目录不可写时退化为进程内缓存，解析结果不变
+输出 JSON 报告；检查失败时以非零状态退出。需要 requests。
+
+用法：
+    python case/bench_cas.py --requests 12
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+KNOWN = {'64-17-5': 'CCO', '50-00-0': 'C=O', '67-56-1': 'CO'}
+SLOW = {'7732-18-5'}
+# 替身记录的是收到请求的时间，与发出时间相差线程调度的误差
+JITTER = 0.05
+
+
+class FakePubChem(BaseHTTPRequestHandler):
+    """
+    记录每个请求的 (时间, CAS 号)；路径为 /compound/name/<CAS>/property/CanonicalSMILES/JSON。
+    """
+    requests = []
+    delay = 0.0
+
+    def do_GET(self):
+        parts = self.path.split('/')
+        cas = parts[3] if len(parts) > 3 else ''
+        FakePubChem.requests.append((time.monotonic(), cas))
+        if cas in SLOW:
+            time.sleep(FakePubChem.delay)
+        if cas in KNOWN:
+            body = json.dumps({'PropertyTable': {'Properties': [{'CanonicalSMILES': KNOWN[cas]}]}}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+        else:
+            body = b'{"Fault": {"Code": "PUGREST.NotFound"}}'
+            self.send_response(404)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def take_requests():
+    requests = list(FakePubChem.requests)
+    FakePubChem.requests.clear()
+    return requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exercise cas_resolver.py against a local PubChem stand-in.')
+    parser.add_argument('--requests', type=int, default=12, help='Unknown CAS numbers queried for the rate check (default: 12)')
+    parser.add_argument('--timeout', type=float, default=0.5, help='Request timeout in seconds (default: 0.5)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated files')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakePubChem)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakePubChem.delay = args.timeout * 3
+
+    work_dir = tempfile.mkdtemp(prefix='tasker_cas_')
+    os.environ['AUTOTASKER_PUBCHEM_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ['AUTOTASKER_CACHE_PATH'] = os.path.join(work_dir, 'cache')
+    sys.path.insert(0, BASE_DIR)
+    logging.basicConfig(level=logging.ERROR)
+    import cas_resolver
+
+    failures = []
+    try:
+        resolver = cas_resolver.CasResolver(datasets=[], network=True, timeout=args.timeout)
+
+        # 查到的结果写入缓存表，第二次不再请求
+        results = resolver.resolve_many(KNOWN)
+        if results != KNOWN:
+            failures.append(f"hits: expected {KNOWN}, got {results}")
+        first = take_requests()
+        resolver.resolve_many(KNOWN)
+        if len(first) != len(KNOWN) or take_requests():
+            failures.append(f"hits: expected {len(KNOWN)} requests and none on the second call")
+
+        # 404 的 CAS 号记为未找到，不再请求
+        results = resolver.resolve_many(['0-00-0'])
+        resolver.resolve_many(['0-00-0'])
+        requests = take_requests()
+        if results != {'0-00-0': None} or len(requests) != 1:
+            failures.append(f"negative: expected None and 1 request, got {results} and {len(requests)}")
+
+        # 超时不写入缓存，下次重新请求
+        start = time.perf_counter()
+        results = resolver.resolve_many(SLOW)
+        timeout_s = time.perf_counter() - start
+        resolver.resolve_many(SLOW)
+        requests = take_requests()
+        if any(results.values()) or len(requests) != 2 * len(SLOW):
+            failures.append(f"timeout: expected None and a retry, got {results} and {len(requests)} requests")
+        if timeout_s > args.timeout * 2 + 1:
+            failures.append(f"timeout: lookup took {timeout_s:.2f}s with a {args.timeout}s timeout")
+
+        # 任意 1 秒内的请求数不超过 PUBCHEM_RATE
+        unknown = [f"{100 + index}-00-{index % 10}" for index in range(args.requests)]
+        start = time.perf_counter()
+        resolver.resolve_many(unknown)
+        rate_s = time.perf_counter() - start
+        times = sorted(stamp for stamp, _ in take_requests())
+        burst = max((sum(1 for other in times if stamp <= other < stamp + 1.0 - JITTER) for stamp in times), default=0)
+        if len(times) != args.requests or burst > cas_resolver.PUBCHEM_RATE:
+            failures.append(f"rate: {len(times)} requests, up to {burst} within one second")
+        resolver.close()
+
+        # 缓存目录的上级是普通文件：无法创建数据库，退化为进程内缓存
+        blocker = os.path.join(work_dir, 'not_a_dir')
+        open(blocker, 'w').close()
+        fallback = cas_resolver.CasResolver(db_path=os.path.join(blocker, 'cas_cache.db'), datasets=[],
+                                            network=True, timeout=args.timeout)
+        results = fallback.resolve_many(['64-17-5', '0-00-0'])
+        fallback.resolve_many(['64-17-5', '0-00-0'])
+        requests = take_requests()
+        if fallback.conn is not None or results != {'64-17-5': 'CCO', '0-00-0': None} or len(requests) != 2:
+            failures.append(f"fallback: got {results} and {len(requests)} requests")
+        fallback.close()
+
+        report = {
+            'timeout_s': round(timeout_s, 3),
+            'rate_requests': args.requests,
+            'rate_s': round(rate_s, 3),
+            'max_per_second': burst,
+            'failures': failures,
+            'ok': not failures,
+        }
+    finally:
+        server.shutdown()
+        if args.keep:
+            print(f"Files kept in {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['ok'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+对比最终几何结构提取的 mmap 实现（gaussian_log.read_final_log_data）与旧的 readlines 实现。
+
+在指定目录生成若干个合成的 Gaussian opt+freq log（默认 1、2、5 GB），
+每种实现都在独立的子进程中运行，记录耗时和峰值内存（ru_maxrss）。
+
+用法：
+    python case/bench_log_extract.py --sizes 1 2 5 --dir /scratch/bench
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from geom_tools.geom_extract import atomic_number_to_symbol
+
+
+def legacy_extract_final_optimized_coordinates_from_log(log_file_path):
+    """
+    旧实现：readlines() 读入整个文件后前后扫描，仅用于对比。
+    """
+    result = {
+        'charge': None,
+        'spin_multiplicity': None,
+        'coordinates': [],
+        'keywords': ''
+    }
+
+    with open(log_file_path, 'r') as file:
+        lines = file.readlines()
+
+    keywords = []
+    collecting_keywords = False
+    for line in lines:
+        if line.strip().startswith('#'):
+            collecting_keywords = True
+            keywords.append(line.strip())
+        elif collecting_keywords:
+            if line.strip().startswith('----'):
+                break
+            elif line.strip():
+                keywords[-1] = keywords[-1] + line.strip()
+    result['keywords'] = ' '.join(keywords)
+
+    for marker in ('Standard orientation', 'Input orientation'):
+        for i in range(len(lines) - 1, -1, -1):
+            if marker in lines[i]:
+                j = i + 5
+                while j < len(lines) and '----' not in lines[j]:
+                    parts = lines[j].strip().split()
+                    if len(parts) >= 6:
+                        element = atomic_number_to_symbol.get(parts[1], parts[1])
+                        result['coordinates'].append("{} {} {} {}".format(element, parts[3], parts[4], parts[5]))
+                    j += 1
+                break
+        if result['coordinates']:
+            break
+
+    for line in lines:
+        match = re.search(r'Charge\s*=\s*(-?\d+)\s+Multiplicity\s*=\s*(\d+)', line)
+        if match:
+            result['charge'] = int(match.group(1))
+            result['spin_multiplicity'] = int(match.group(2))
+            break
+
+    return result
+
+
+def mmap_extract_final_optimized_coordinates_from_log(log_file_path):
+    # bench_pipeline / bench_startup 只用到 orientation_block，不在导入时加载解析器
+    from geom_tools.gaussian_log import read_final_log_data
+    return read_final_log_data(log_file_path)
+
+
+IMPLEMENTATIONS = {
+    'legacy': legacy_extract_final_optimized_coordinates_from_log,
+    'mmap': mmap_extract_final_optimized_coordinates_from_log,
+}
+
+
+def orientation_block(kind, natoms, shift):
+    lines = [
+        f"                         {kind} orientation:",
+        " ---------------------------------------------------------------------",
+        " Center     Atomic      Atomic             Coordinates (Angstroms)",
+        " Number     Number       Type             X           Y           Z",
+        " ---------------------------------------------------------------------",
+    ]
+    for i in range(natoms):
+        atomic_number = 6 if i % 2 == 0 else 1
+        lines.append(f" {i + 1:6d} {atomic_number:10d} {0:11d} {i * 0.5 + shift:15.6f}{shift:12.6f}{-shift:12.6f}")
+    lines.append(" ---------------------------------------------------------------------")
+    return "\n".join(lines) + "\n"
+
+
+def generate_log(path, size_bytes, natoms=200):
+    """
+    生成约 size_bytes 大小的合成 opt+freq log：重复的优化步，每步包含
+    Input/Standard orientation、SCF 能量和填充行，最后一行为 Normal termination。
+    """
+    header = (
+        " Entering Gaussian System, Link 0=g16\n"
+        " ----------------------------------------------------------------------\n"
+        " #p opt freq b3lyp/6-31g(d) scrf=(solvent=water)\n"
+        " ----------------------------------------------------------------------\n"
+        " Symbolic Z-matrix:\n"
+        " Charge =  0 Multiplicity = 1\n"
+    )
+    filler = " Filler line emulating SCF iteration output and population analysis ......\n" * 400
+    with open(path, 'w') as f:
+        f.write(header)
+        written = len(header)
+        step = 0
+        while written < size_bytes:
+            chunk = (orientation_block('Input', natoms, step * 1e-4) +
+                     orientation_block('Standard', natoms, step * 1e-4) +
+                     f" SCF Done:  E(RB3LYP) =  -{1000 + step * 1e-6:.9f}     A.U. after   12 cycles\n" +
+                     filler)
+            f.write(chunk)
+            written += len(chunk)
+            step += 1
+        f.write(" Normal termination of Gaussian 16 at Sun Oct 18 12:00:00 2026.\n")
+
+
+def run_child(impl, log_path):
+    """
+    子进程入口：运行一次提取并以 JSON 输出耗时和峰值内存。
+    """
+    start = time.perf_counter()
+    result = IMPLEMENTATIONS[impl](log_path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'impl': impl,
+        'seconds': elapsed,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'atoms': len(result['coordinates']),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark final-geometry extraction on synthetic Gaussian logs.')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 2, 5], help='Log sizes in GB (default: 1 2 5)')
+    parser.add_argument('--dir', default='.', help='Directory for the generated logs')
+    parser.add_argument('--atoms', type=int, default=200, help='Atoms per geometry block (default: 200)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated logs')
+    parser.add_argument('--child', nargs=2, metavar=('IMPL', 'LOG'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    os.makedirs(args.dir, exist_ok=True)
+    print(f"{'size(GB)':>8} {'impl':>7} {'time(s)':>9} {'peak RSS(MB)':>13} {'atoms':>6}")
+    for size in args.sizes:
+        log_path = os.path.join(args.dir, f"bench_{size:g}GB.log")
+        generate_log(log_path, int(size * 1024 ** 3), args.atoms)
+        try:
+            for impl in IMPLEMENTATIONS:
+                output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', impl, log_path],
+                                        stdout=subprocess.PIPE, text=True, check=True).stdout
+                stats = json.loads(output.strip().splitlines()[-1])
+                print(f"{size:>8g} {impl:>7} {stats['seconds']:>9.3f} {stats['peak_rss_mb']:>13.1f} {stats['atoms']:>6}")
+        finally:
+            if not args.keep:
+                os.remove(log_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+合成计算目录上的整体基准测试。
+
+生成一个假的 AUTOTASKER_CALC_PATH：若干项目文件夹，每个 .task 中有若干任务，
+按给定的依赖深度串成链；链上除最后一级外的任务都已“提交”，带有指定大小和
+结束状态的假 Gaussian log。随后在独立子进程中分别计时：
+
+    pipeline_cold     process_all_tasks，全量扫描，空的 log 缓存
+    pipeline_warm     同一棵树恢复后再次全量扫描，log 缓存已热
+    pipeline_noop     增量扫描，且没有任何变化
+    parse_gaussian_log   逐个完整解析所有 log（不经缓存）
+    final_geometry    mmap 提取最终几何结构（不经缓存）
+    task_rewrite      对每个任务执行 update_task_title_with_quotes
+
+结果（耗时、吞吐量、峰值内存）以 JSON 输出，可用 --output 保存后在不同版本间 diff。
+
+用法：
+    python case/bench_pipeline.py --folders 200 --tasks 6 --depth 3 --log-kb 512 --output before.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_log_extract import orientation_block
+
+BENCHMARKS = ['pipeline_cold', 'pipeline_warm', 'pipeline_noop',
+              'parse_gaussian_log', 'final_geometry', 'task_rewrite']
+TERMINATIONS = ('normal', 'error', 'running', 'mixed')
+
+
+# ---------- 生成合成目录 ----------
+
+def write_xyz(path, natoms):
+    lines = [str(natoms), "0 1"]
+    for i in range(natoms):
+        element = 'C' if i % 2 == 0 else 'H'
+        lines.append(f"{element} {i * 0.5:.6f} {(i % 7) * 0.3:.6f} {(i % 5) * 0.2:.6f}")
+    with open(path, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def write_fake_log(path, size_bytes, natoms, termination):
+    """
+    写一个约 size_bytes 大小的 opt log，最后一行按 termination 给出正常/错误结束或仍在运行。
+    """
+    header = (
+        " Entering Gaussian System, Link 0=g16\n"
+        " ----------------------------------------------------------------------\n"
+        " #p opt b3lyp/6-31g(d)\n"
+        " ----------------------------------------------------------------------\n"
+        " Symbolic Z-matrix:\n"
+        " Charge =  0 Multiplicity = 1\n"
+    )
+    filler = " Filler line emulating SCF iteration output and population analysis ......\n" * 20
+    with open(path, 'w') as f:
+        f.write(header)
+        written = len(header)
+        step = 0
+        while True:
+            chunk = (orientation_block('Input', natoms, step * 1e-4) +
+                     orientation_block('Standard', natoms, step * 1e-4) +
+                     f" SCF Done:  E(RB3LYP) =  -{100 + step * 1e-6:.9f}     A.U. after   12 cycles\n" +
+                     filler)
+            f.write(chunk)
+            written += len(chunk)
+            step += 1
+            if written >= size_bytes:
+                break
+        if termination == 'normal':
+            f.write(" Normal termination of Gaussian 16 at Sun Oct 18 12:00:00 2026.\n")
+        elif termination == 'error':
+            f.write(" Error termination via Lnk1e in /opt/g16/l9999.exe at Sun Oct 18 12:00:00 2026.\n")
+
+
+def generate_tree(calc_dir, folders, tasks, depth, natoms, log_bytes, termination):
+    """
+    任务 i 的来源为任务 i-1（每 depth 个任务开始一条新链，来源为 origin）。
+    除链尾外的任务都标记为已处理（加引号）并写入假 log。
+    """
+    states = ('normal', 'error', 'running')
+    log_count = 0
+    for n in range(folders):
+        name = f"mol{n:05d}"
+        folder = os.path.join(calc_dir, name)
+        os.makedirs(folder)
+        write_xyz(os.path.join(folder, f"{name}.xyz"), natoms)
+
+        blocks = []
+        for i in range(tasks):
+            title = f"t{i:02d}"
+            level = i % depth
+            source = 'origin' if level == 0 else f"t{i - 1:02d}"
+            submitted = level < depth - 1 and i < tasks - 1
+            heading = f'$"{title}"' if submitted else f"${title}"
+            blocks.append(f"{heading}\n%{source}\n#opt b3lyp/6-31g(d)\n")
+            if submitted:
+                state = states[(n + i) % 3] if termination == 'mixed' else termination
+                output_dir = os.path.join(folder, title)
+                os.makedirs(output_dir)
+                write_fake_log(os.path.join(output_dir, f"{title}_{name}.log"), log_bytes, natoms, state)
+                log_count += 1
+        with open(os.path.join(folder, f"{name}.task"), 'w') as f:
+            f.write("\n".join(blocks))
+    return log_count
+
+
+def list_logs(calc_dir):
+    logs = []
+    for root, _, files in os.walk(calc_dir):
+        logs.extend(os.path.join(root, f) for f in files if f.endswith('.log'))
+    return sorted(logs)
+
+
+# ---------- 子进程中的各项计时 ----------
+
+def _import_pipeline():
+    sys.path.insert(0, BASE_DIR)
+    import task_module
+    task_module.configure_logging()
+    return task_module
+
+
+def run_benchmark(name, calc_dir, jobs):
+    """
+    返回 (耗时, 处理条目数, 处理字节数)。
+    """
+    if name.startswith('pipeline'):
+        task_module = _import_pipeline()
+        task_dirs = task_module.list_task_dirs(calc_dir)
+        state_store = None
+        if name == 'pipeline_noop':
+            state_store = task_module.open_state_store(os.environ['AUTOTASKER_STATE_PATH'])
+            task_module.process_all_tasks(calc_dir, state_store, jobs)
+        start = time.perf_counter()
+        task_module.process_all_tasks(calc_dir, state_store, jobs)
+        elapsed = time.perf_counter() - start
+        if state_store is not None:
+            state_store.close()
+        return elapsed, len(task_dirs), 0
+
+    if name in ('parse_gaussian_log', 'final_geometry'):
+        _import_pipeline()
+        logs = list_logs(calc_dir)
+        if name == 'parse_gaussian_log':
+            from geom_tools.gaussian_log import parse_gaussian_log as parse
+        else:
+            from geom_tools.gaussian_log import read_final_log_data as parse
+        start = time.perf_counter()
+        for log in logs:
+            parse(log)
+        elapsed = time.perf_counter() - start
+        return elapsed, len(logs), sum(os.path.getsize(log) for log in logs)
+
+    if name == 'task_rewrite':
+        task_module = _import_pipeline()
+        task_dirs = task_module.list_task_dirs(calc_dir)
+        work = []
+        for task_dir in task_dirs:
+            task_file_path, _ = task_module.find_task_files(task_dir)
+            work.append((task_file_path, task_module.parse_task_file(task_file_path)))
+        count = 0
+        start = time.perf_counter()
+        for task_file_path, tasks in work:
+            for task_info in tasks:
+                if not task_info.get('quoted'):
+                    task_module.update_task_title_with_quotes(task_file_path, task_info)
+                    count += 1
+        elapsed = time.perf_counter() - start
+        return elapsed, count, 0
+
+    raise ValueError(f"Unknown benchmark: {name}")
+
+
+def run_child(name, calc_dir, jobs):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    elapsed, items, nbytes = run_benchmark(name, calc_dir, jobs)
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(json.dumps({
+        'seconds': round(elapsed, 6),
+        'items': items,
+        'items_per_s': round(items / elapsed, 2) if elapsed > 0 else None,
+        'mb_per_s': round(nbytes / 1024 ** 2 / elapsed, 2) if nbytes and elapsed > 0 else None,
+        'start_rss_mb': round(baseline / 1024, 1),
+        'peak_rss_mb': round(max(usage, children) / 1024, 1),
+    }))
+
+
+# ---------- 主流程 ----------
+
+def git_revision():
+    try:
+        return subprocess.run(['git', '-C', BASE_DIR, 'describe', '--always', '--dirty'],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the task pipeline on a synthetic calc tree.')
+    parser.add_argument('--folders', type=int, default=100, help='Number of project folders (default: 100)')
+    parser.add_argument('--tasks', type=int, default=6, help='Tasks per .task file (default: 6)')
+    parser.add_argument('--depth', type=int, default=3, help='Length of each dependency chain (default: 3)')
+    parser.add_argument('--atoms', type=int, default=30, help='Atoms per molecule (default: 30)')
+    parser.add_argument('--log-kb', type=float, default=256, help='Size of each fake log in KB (default: 256)')
+    parser.add_argument('--termination', choices=TERMINATIONS, default='normal',
+                        help='Termination state of the fake logs (default: normal)')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Worker processes for process_all_tasks')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, help='Run only these benchmarks')
+    parser.add_argument('--dir', help='Working directory (default: a temporary directory)')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated tree')
+    parser.add_argument('--child', nargs=3, metavar=('NAME', 'CALC', 'JOBS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        name, calc_dir, jobs = args.child
+        run_child(name, calc_dir, int(jobs))
+        return
+
+    work_dir = os.path.abspath(args.dir) if args.dir else tempfile.mkdtemp(prefix='tasker_bench_')
+    template_dir = os.path.join(work_dir, 'template')
+    calc_dir = os.path.join(work_dir, 'calc')
+    cache_dir = os.path.join(work_dir, 'cache')
+    for path in (template_dir, calc_dir, cache_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    params = {key: getattr(args, key) for key in ('folders', 'tasks', 'depth', 'atoms', 'log_kb', 'termination', 'jobs')}
+    start = time.perf_counter()
+    log_count = generate_tree(template_dir, args.folders, args.tasks, max(args.depth, 1),
+                              args.atoms, int(args.log_kb * 1024), args.termination)
+    print(f"Generated {args.folders} folders, {log_count} logs in {time.perf_counter() - start:.1f}s ({work_dir})",
+          file=sys.stderr)
+
+    env = dict(os.environ,
+               AUTOTASKER_CALC_PATH=calc_dir,
+               AUTOTASKER_LOG_PATH=os.path.join(work_dir, 'task_processing.log'),
+               AUTOTASKER_CACHE_PATH=cache_dir,
+               AUTOTASKER_STATE_PATH=os.path.join(cache_dir, 'scan_state.db'),
+               AUTOTASKER_METRICS_PATH=os.path.join(cache_dir, 'metrics'))
+
+    results = {}
+    try:
+        for name in args.only or BENCHMARKS:
+            # 除 pipeline_warm 复用上一步的 log 缓存外，每项都从原始目录和空缓存开始
+            shutil.rmtree(calc_dir, ignore_errors=True)
+            shutil.copytree(template_dir, calc_dir)
+            if name != 'pipeline_warm':
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name, calc_dir, str(args.jobs)],
+                                    stdout=subprocess.PIPE, text=True, env=env, check=True).stdout
+            results[name] = json.loads(output.strip().splitlines()[-1])
+            stats = results[name]
+            print(f"{name:>20} {stats['seconds']:>9.3f}s {stats['items_per_s'] or 0:>10.1f}/s "
+                  f"{stats['peak_rss_mb']:>8.1f} MB", file=sys.stderr)
+    finally:
+        if not args.keep and not args.dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = json.dumps({'revision': git_revision(), 'params': params, 'results': results}, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + "\n")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+“无事可做”时 task_module.py 的启动耗时。
+
+在合成计算目录（见 bench_pipeline.py）上先完整运行一次，之后没有任何变化，
+再多次运行 task_module.py，记录整个进程的耗时、导入 task_module 的耗时，
+并检查是否加载了只有处理任务时才需要的重模块（numpy、RDKit、requests、ORCA 生成器）。
+解释器本身的启动时间与机器有关，--budget-ms 只约束导入 task_module 加 main() 的耗时；
+超出预算或加载了重模块时以非零状态退出，可以放在 cron 升级前做回归检查。
+
+用法：
+    python case/bench_startup.py --folders 200 --runs 20 --budget-ms 100
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import generate_tree
+
+HEAVY_MODULES = ('numpy', 'rdkit', 'requests', 'orca_generator', 'geom_tools.gaussian_log', 'smiles_parser')
+
+
+def run_child():
+    """
+    子进程入口：导入并运行一次 task_module.main()，输出耗时和已加载的重模块。
+    """
+    start = time.perf_counter()
+    sys.path.insert(0, BASE_DIR)
+    import task_module
+    imported = time.perf_counter()
+    sys.argv = ['task_module.py']
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            task_module.main()
+        finally:
+            sys.stdout = stdout
+    finished = time.perf_counter()
+    print(json.dumps({
+        'import_ms': (imported - start) * 1000,
+        'main_ms': (finished - imported) * 1000,
+        'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure task_module.py startup on a no-op tick.')
+    parser.add_argument('--folders', type=int, default=100, help='Number of project folders (default: 100)')
+    parser.add_argument('--tasks', type=int, default=4, help='Tasks per .task file (default: 4)')
+    parser.add_argument('--runs', type=int, default=10, help='Number of no-op runs (default: 10)')
+    parser.add_argument('--budget-ms', type=float, default=100,
+                        help='Fail if the median import + main() time exceeds this (default: 100)')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='tasker_startup_')
+    calc_dir = os.path.join(work_dir, 'calc')
+    cache_dir = os.path.join(work_dir, 'cache')
+    env = dict(os.environ,
+               AUTOTASKER_CALC_PATH=calc_dir,
+               AUTOTASKER_LOG_PATH=os.path.join(work_dir, 'task_processing.log'),
+               AUTOTASKER_CACHE_PATH=cache_dir,
+               AUTOTASKER_STATE_PATH=os.path.join(cache_dir, 'scan_state.db'),
+               AUTOTASKER_METRICS_PATH=os.path.join(cache_dir, 'metrics'))
+    command = [sys.executable, os.path.abspath(__file__), '--child']
+
+    try:
+        generate_tree(calc_dir, args.folders, args.tasks, 2, 10, 16 * 1024, 'normal')
+        # 第一次运行处理所有文件夹并记录扫描状态
+        subprocess.run([sys.executable, os.path.join(BASE_DIR, 'task_module.py')],
+                       stdout=subprocess.DEVNULL, env=env, check=True)
+
+        # 空解释器的启动耗时，作为进程耗时的参照
+        baseline = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', 'pass'], env=env, check=True)
+            baseline.append((time.perf_counter() - start) * 1000)
+
+        runs = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            output = subprocess.run(command, stdout=subprocess.PIPE, text=True, env=env, check=True).stdout
+            stats = json.loads(output.strip().splitlines()[-1])
+            stats['process_ms'] = (time.perf_counter() - start) * 1000
+            stats['tick_ms'] = stats['import_ms'] + stats['main_ms']
+            runs.append(stats)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    heavy = sorted({name for stats in runs for name in stats['heavy_modules']})
+    report = {
+        'folders': args.folders,
+        'runs': args.runs,
+        'process_ms_median': round(statistics.median(stats['process_ms'] for stats in runs), 2),
+        'process_ms_min': round(min(stats['process_ms'] for stats in runs), 2),
+        'interpreter_ms_median': round(statistics.median(baseline), 2),
+        'tick_ms_median': round(statistics.median(stats['tick_ms'] for stats in runs), 2),
+        'import_ms_median': round(statistics.median(stats['import_ms'] for stats in runs), 2),
+        'main_ms_median': round(statistics.median(stats['main_ms'] for stats in runs), 2),
+        'heavy_modules': heavy,
+        'budget_ms': args.budget_ms,
+    }
+    report['ok'] = not heavy and report['tick_ms_median'] <= args.budget_ms
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
+    sys.exit(0 if report['ok'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+用假的 sacct 检查并测量 job_tracker.py 的增量状态跟踪。
+
+在临时目录中生成 --jobs 行的 submit.log（含提交失败的空作业号行和作业数组元素），
+假的 sacct 记录每次调用的作业数并输出预先写好的 "JobID|State" 行（含作业步、
+"CANCELLED by 0"、未展开的数组元素 "N_[0-3]"）。依次检查：
+    cold       从头同步并刷新，状态映射正确，sacct 按 SACCT_BATCH 分批
+    noop       submit.log 未变化时不读取新行（sync_noop_s），已结束的作业不再查询（noop_s 含 sacct）
+    append     追加的行（最后一行未写完）只解析完整的部分，未写完的行下次补上
+    rotate     submit.log 被替换后从头读取，已有作业保持原状态
+    missing    sacct 连续 SACCT_MISSING_LIMIT 次没有返回的作业记为 UNKNOWN，之后不再查询
+    reader     job_state 只读地读取作业库，库损坏时返回 None 且不修改文件
+输出 JSON 报告；检查失败时以非零状态退出。
+
+用法：
+    python case/bench_status.py --jobs 20000
+full_parse_s 为原先每次整体重读 submit.log 的耗时，供对比。
+"""
+import os
+import sys
+import json
+import stat
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FAKE_SACCT = """#!/bin/bash
+# 假的 sacct：记录请求的作业数，输出 states 文件中的全部行（job_tracker 只取请求的作业）
+ids=""
+while [ $# -gt 0 ]; do
+    if [ "$1" = "-j" ]; then
+        ids="$2"
+        shift
+    fi
+    shift
+done
+echo "$ids" | tr ',' '\\n' | wc -l >> "$FAKE_SLURM_DIR/sacct_calls"
+cat "$FAKE_SLURM_DIR/states"
+"""
+
+# 作业号 % 7 -> sacct 状态，以及期望的跟踪状态
+SACCT_STATES = [
+    ('COMPLETED', 'COMPLETED'),
+    ('RUNNING', 'RUNNING'),
+    ('FAILED', 'FAILED'),
+    ('TIMEOUT', 'TIMEOUT'),
+    ('OUT_OF_MEMORY', 'OOM'),
+    ('CANCELLED by 0', 'CANCELLED'),
+    ('PENDING', 'PENDING'),
+]
+
+
+def write_executable(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def log_line(job_id, path):
+    return f"2026-10-18 12:00:00 - Job {job_id}: {path}\n"
+
+
+def sacct_calls(fake_dir):
+    path = os.path.join(fake_dir, 'sacct_calls')
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        calls = [int(line) for line in f]
+    os.remove(path)
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exercise job_tracker.py against a fake sacct.')
+    parser.add_argument('--jobs', type=int, default=5000, help='Lines in the generated submit.log (default: 5000)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated files')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='tasker_status_')
+    fake_dir = os.path.join(work_dir, 'slurm')
+    os.makedirs(os.path.join(fake_dir, 'bin'))
+    write_executable(os.path.join(fake_dir, 'bin', 'sacct'), FAKE_SACCT)
+    os.environ['PATH'] = f"{os.path.join(fake_dir, 'bin')}{os.pathsep}{os.environ.get('PATH', '')}"
+    os.environ['FAKE_SLURM_DIR'] = fake_dir
+    os.environ['AUTOTASKER_CACHE_PATH'] = os.path.join(work_dir, 'cache')
+    os.environ['AUTOTASKER_JOBS_PATH'] = os.path.join(work_dir, 'cache', 'jobs.db')
+    sys.path.insert(0, BASE_DIR)
+    sys.path.insert(0, os.path.join(BASE_DIR, 'abort'))
+    import job_tracker
+    import status_parser
+
+    submit_log = os.path.join(work_dir, 'submit.log')
+    failures = []
+    expected = {}
+    try:
+        # 普通作业 1000..，最后 4 个为作业数组 900_0..900_3，另有一行提交失败
+        with open(submit_log, 'w') as log, open(os.path.join(fake_dir, 'states'), 'w') as states:
+            for index in range(args.jobs):
+                job_id = str(1000 + index)
+                log.write(log_line(job_id, f"/calc/p{index}/opt/opt_m{index}.gjf"))
+                raw, state = SACCT_STATES[index % len(SACCT_STATES)]
+                states.write(f"{job_id}|{raw}\n{job_id}.batch|COMPLETED\n")
+                expected[job_id] = state
+            log.write("2026-10-18 12:00:00 - Job : /calc/failed.gjf\n")
+            for index in range(4):
+                log.write(log_line(f"900_{index}", f"/calc/arr/a{index}.gjf"))
+                expected[f"900_{index}"] = 'PENDING' if index else 'RUNNING'
+            states.write("900_0|RUNNING\n900_[1-3%2]|PENDING\n")
+
+        tracker = job_tracker.JobTracker()
+        start = time.perf_counter()
+        added, changed = tracker.update(submit_log)
+        cold = time.perf_counter() - start
+        calls = sacct_calls(fake_dir)
+        states = {job_id: state for job_id, (_, state) in tracker.states().items()}
+        if added != len(expected):
+            failures.append(f"cold: expected {len(expected)} new jobs, got {added}")
+        wrong = [job_id for job_id, state in expected.items() if states.get(job_id) != state]
+        if wrong:
+            failures.append(f"cold: wrong states for {len(wrong)} jobs, e.g. {wrong[:3]}")
+        batches = -(-len(expected) // job_tracker.SACCT_BATCH)
+        if len(calls) != batches or sum(calls) != len(expected):
+            failures.append(f"cold: expected {batches} sacct calls for {len(expected)} jobs, got {calls}")
+
+        active = sum(1 for state in expected.values() if state not in job_tracker.FINAL_STATES)
+        start = time.perf_counter()
+        tracker.sync_log(submit_log)
+        sync_noop = time.perf_counter() - start
+        start = time.perf_counter()
+        added, _ = tracker.update(submit_log)
+        noop = time.perf_counter() - start
+        calls = sacct_calls(fake_dir)
+        if added or sum(calls) != active:
+            failures.append(f"noop: expected 0 new jobs and {active} queried, got {added} and {sum(calls)}")
+
+        start = time.perf_counter()
+        status_parser.parse_submit_log(submit_log)
+        full_parse = time.perf_counter() - start
+
+        # 追加 3 行，最后一行没有换行符（提交脚本正在写）
+        with open(submit_log, 'a') as log:
+            log.write(log_line('5000001', '/calc/new/n1.gjf') + log_line('5000002', '/calc/new/n2.gjf'))
+            log.write("2026-10-18 12:00:00 - Job 5000003: /calc/new/n3")
+        added = tracker.sync_log(submit_log)
+        if added != 2:
+            failures.append(f"append: expected 2 complete lines, got {added}")
+        with open(submit_log, 'a') as log:
+            log.write(".gjf\n")
+        added = tracker.sync_log(submit_log)
+        if added != 1 or tracker.state_of('/calc/new/n3.gjf') != 'PENDING':
+            failures.append("append: the line completed later was not picked up")
+
+        # submit.log 被替换（如按月归档）：从头读取，已有作业的状态不变
+        os.replace(submit_log, f"{submit_log}.1")
+        with open(submit_log, 'w') as log:
+            log.write(log_line('1002', '/calc/p2/opt/opt_m2.gjf') + log_line('6000001', '/calc/r/r1.gjf'))
+        added = tracker.sync_log(submit_log)
+        if added != 1 or tracker.state_of('/calc/p2/opt/opt_m2.gjf') != expected['1002']:
+            failures.append(f"rotate: expected 1 new job and the old state kept, got {added}")
+
+        # 5000001..5000003、6000001 不在 sacct 的输出中，查不到的次数达到上限后记为 UNKNOWN
+        missing = ['/calc/new/n1.gjf', '/calc/new/n3.gjf', '/calc/r/r1.gjf']
+        for _ in range(job_tracker.SACCT_MISSING_LIMIT - 1):
+            tracker.refresh()
+        if any(tracker.state_of(path) != 'PENDING' for path in missing):
+            failures.append("missing: jobs were marked before SACCT_MISSING_LIMIT refreshes")
+        tracker.refresh()
+        if any(tracker.state_of(path) != job_tracker.UNKNOWN for path in missing):
+            failures.append("missing: jobs absent from sacct were not marked UNKNOWN")
+        if tracker.state_of('/calc/p6/opt/opt_m6.gjf') != expected['1006']:
+            failures.append("missing: a job returned by sacct changed state")
+        sacct_calls(fake_dir)
+        tracker.refresh()
+        if sum(sacct_calls(fake_dir)) != active:
+            failures.append("missing: UNKNOWN jobs are still queried")
+
+        # 只读接口：正常读取；库损坏时返回 None，不重建
+        if job_tracker.job_state('/calc/p4/opt/opt_m4.gjf') != 'OOM':
+            failures.append("reader: job_state did not return the stored state")
+
+        # 兼容接口
+        statuses = status_parser.check_job_status(submit_log, tracker=tracker, refresh=False)
+        if statuses.get('1004') != 'OOM':
+            failures.append(f"check_job_status returned {statuses.get('1004')} for an OOM job")
+        tracker.close()
+
+        db_path = os.environ['AUTOTASKER_JOBS_PATH']
+        with open(db_path, 'r+b') as f:
+            f.write(b'\0' * 4096)
+        with open(db_path, 'rb') as f:
+            digest = hashlib.md5(f.read()).hexdigest()
+        job_tracker._reader = None
+        state = job_tracker.job_state('/calc/p4/opt/opt_m4.gjf')
+        with open(db_path, 'rb') as f:
+            if state is not None or hashlib.md5(f.read()).hexdigest() != digest:
+                failures.append(f"reader: corrupt store returned {state} or was modified")
+
+        report = {
+            'jobs': len(expected),
+            'cold_s': round(cold, 3),
+            'sync_noop_s': round(sync_noop, 5),
+            'noop_s': round(noop, 4),
+            'full_parse_s': round(full_parse, 4),
+            'active_after_cold': active,
+            'failures': failures,
+            'ok': not failures,
+        }
+    finally:
+        if args.keep:
+            print(f"Files kept in {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['ok'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+用假的 sbatch/squeue/sinfo 检查并测量 slurm_submit.py。
+
+在临时目录中按默认布局（提交目录 AutoCalc，计算目录 AutoCalc/tasks）生成 --folders 个任务目录，
+每个任务目录 --inputs 个 gjf（其中一部分已有 log），
+把假的 SLURM 命令放在 PATH 最前面：sbatch 记录作业名并输出 "Submitted batch job N"，
+squeue 按 "%F|%j" 列出已提交的作业（数组作业号|作业名），sinfo 输出一个默认分区。HOME 也指向临时目录，
+submit.log 和作业数组的清单写在其中的 .sub 下。--array-size 大于 1 时检查作业数组打包。
+
+依次运行：
+    cold   队列中只有 EXTERNAL_JOBS（两个同名的普通作业、一个运行中的作业数组），状态库中没有目录清单
+    warm   队列已满，目录清单全部命中缓存
+    drain  已提交的作业全部结束（写出 log 并离开队列）后再次提交，检查不会重复提交
+检查 submit.log 的格式、提交数量、作业脚本的清理，以及 cold 一轮在各任务目录之间轮转，
+输出 JSON 报告；检查失败时以非零状态退出。
+
+用法：
+    python case/bench_submit.py --folders 500 --inputs 4 --depth 20
+    python case/bench_submit.py --folders 500 --inputs 4 --depth 20 --array-size 8
+"""
+import os
+import re
+import sys
+import json
+import stat
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOG_LINE = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} - Job (\d+(?:_\d+)?): (/.+\.gjf)$')
+
+FAKE_SBATCH = """#!/bin/bash
+# 假的 sbatch：作业名取自脚本中的 #SBATCH -J，"作业号|作业名" 追加到队列文件（作业数组也只追加一次）
+name=$(sed -n 's/^#SBATCH -J //p' "$1")
+count=$(cat "$FAKE_SLURM_DIR/count" 2>/dev/null || echo 0)
+echo $((count + 1)) > "$FAKE_SLURM_DIR/count"
+echo "$((1000 + count))|$name" >> "$FAKE_SLURM_DIR/queue"
+cp "$1" "$FAKE_SLURM_DIR/scripts/$name.sh"
+echo "Submitted batch job $((1000 + count))"
+"""
+
+# 提交前已在队列中的作业：两个同名的普通作业各占一个名额，运行中的数组元素共用一个数组作业号
+EXTERNAL_JOBS = "1|dup\n2|dup\n3|arr\n3|arr\n"
+EXTERNAL_SLOTS = 3
+
+FAKE_SQUEUE = """#!/bin/bash
+echo "$@" >> "$FAKE_SLURM_DIR/squeue_calls"
+cat "$FAKE_SLURM_DIR/queue"
+"""
+
+FAKE_SINFO = """#!/bin/bash
+echo "debug*"
+echo "long"
+"""
+
+
+def write_executable(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def generate_tree(root, folders, inputs):
+    """
+    每个项目 inputs 个 gjf，第一个已有 log（视为已运行），每个项目带一个 comd 文件。
+    返回待提交的 gjf 数量。
+    """
+    pending = 0
+    for folder in range(folders):
+        project = os.path.join(root, f"proj{folder:05d}")
+        for index in range(inputs):
+            task_dir = os.path.join(project, f"task{index}")
+            os.makedirs(task_dir, exist_ok=True)
+            name = f"task{index}_mol{folder:05d}"
+            with open(os.path.join(task_dir, f"{name}.gjf"), 'w') as f:
+                f.write(f"%chk=/old/place/{name}.chk\n# sp b3lyp/6-31g*\n\n{name}\n\n0 1\nH 0 0 0\nH 0 0 0.74\n\n")
+            if index == 0:
+                with open(os.path.join(task_dir, f"{name}.log"), 'w') as f:
+                    f.write(" Normal termination of Gaussian 16\n")
+            else:
+                pending += 1
+            with open(os.path.join(task_dir, 'comd'), 'w') as f:
+                f.write("echo done\n")
+        os.makedirs(os.path.join(project, 'template'), exist_ok=True)
+        with open(os.path.join(project, 'template', 'template.gjf'), 'w') as f:
+            f.write("# template\n")
+    return pending
+
+
+def run_submitter(env, depth, array_size):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(BASE_DIR, 'slurm_submit.py'), '--depth', str(depth),
+                             '--array-size', str(array_size)],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env)
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        print(result.stdout, file=sys.stderr)
+        raise SystemExit(f"slurm_submit.py exited with {result.returncode}")
+    return seconds
+
+
+def read_submit_log(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return [line.rstrip('\n') for line in f]
+
+
+def check_arrays(work_dir, fake_dir, job_ids, paths):
+    """
+    检查作业数组：每个元素在 submit.log 中一行，清单顺序与元素序号一致，comd 副本齐全。
+    """
+    failures = []
+    arrays_dir = os.path.join(work_dir, '.sub', 'arrays')
+    if not any('_' in job_id for job_id in job_ids):
+        return ["no array elements in submit.log"]
+    manifests = sorted(name for name in os.listdir(arrays_dir) if name.endswith('.txt'))
+    elements = {}
+    for manifest in manifests:
+        name = manifest[:-len('.txt')]
+        with open(os.path.join(arrays_dir, manifest), 'r') as f:
+            inputs = [line.strip() for line in f]
+        with open(os.path.join(fake_dir, 'scripts', f"{name}.sh"), 'r') as f:
+            script = f.read()
+        if f"#SBATCH --array=0-{len(inputs) - 1}\n" not in script or '#SBATCH -p debug\n' not in script:
+            failures.append(f"array script {name} is missing --array or the partition")
+        for index, input_file in enumerate(inputs):
+            elements[input_file] = index
+            if not os.path.exists(os.path.join(arrays_dir, f"{name}_{index}.comd")):
+                failures.append(f"comd copy missing for {name}_{index}")
+    for job_id, path in zip(job_ids, paths):
+        if '_' in job_id and elements.get(path) != int(job_id.split('_')[1]):
+            failures.append(f"array index of {path} does not match its manifest")
+    if any(name.endswith('.sh') for name in os.listdir(arrays_dir)):
+        failures.append("array job scripts left behind")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exercise slurm_submit.py against fake SLURM commands.')
+    parser.add_argument('--folders', type=int, default=200, help='Number of project folders (default: 200)')
+    parser.add_argument('--inputs', type=int, default=4, help='gjf files per project (default: 4)')
+    parser.add_argument('--depth', type=int, default=20, help='Target queue depth (default: 20)')
+    parser.add_argument('--array-size', type=int, default=0,
+                        help='Inputs per job array, 0 submits every input separately (default: 0)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated tree')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='tasker_submit_')
+    root = os.path.join(work_dir, 'AutoCalc')
+    calc_dir = os.path.join(root, 'tasks')
+    fake_dir = os.path.join(work_dir, 'slurm')
+    bin_dir = os.path.join(fake_dir, 'bin')
+    os.makedirs(os.path.join(fake_dir, 'scripts'))
+    os.makedirs(bin_dir)
+    with open(os.path.join(fake_dir, 'queue'), 'w') as f:
+        f.write(EXTERNAL_JOBS)
+    write_executable(os.path.join(bin_dir, 'sbatch'), FAKE_SBATCH)
+    write_executable(os.path.join(bin_dir, 'squeue'), FAKE_SQUEUE)
+    write_executable(os.path.join(bin_dir, 'sinfo'), FAKE_SINFO)
+
+    env = dict(os.environ,
+               HOME=work_dir,
+               PATH=f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+               FAKE_SLURM_DIR=fake_dir,
+               AUTOTASKER_SUBMIT_PATH=root,
+               AUTOTASKER_CALC_PATH=calc_dir,
+               AUTOTASKER_CACHE_PATH=os.path.join(work_dir, 'cache'),
+               AUTOTASKER_STATE_PATH=os.path.join(work_dir, 'cache', 'scan_state.db'))
+    submit_log = os.path.join(work_dir, '.sub', 'submit.log')
+    failures = []
+
+    try:
+        pending = generate_tree(calc_dir, args.folders, args.inputs)
+        # 让目录 mtime 离开 slurm_submit.py 不写缓存的时间窗口
+        time.sleep(2.1)
+
+        cold = run_submitter(env, args.depth, args.array_size)
+        cold_paths = [match.group(2) for match in map(LOG_LINE.match, read_submit_log(submit_log)) if match]
+        warm = run_submitter(env, args.depth, args.array_size)
+        # 模拟作业结束：写出 log 并离开队列
+        for line in read_submit_log(submit_log):
+            match = LOG_LINE.match(line)
+            if match:
+                with open(f"{os.path.splitext(match.group(2))[0]}.log", 'w') as f:
+                    f.write(" Normal termination of Gaussian 16\n")
+        open(os.path.join(fake_dir, 'queue'), 'w').close()
+        drain = run_submitter(env, args.depth, args.array_size)
+
+        lines = read_submit_log(submit_log)
+        paths = []
+        job_ids = []
+        for line in lines:
+            match = LOG_LINE.match(line)
+            if not match:
+                failures.append(f"bad submit.log line: {line!r}")
+                continue
+            job_ids.append(match.group(1))
+            paths.append(match.group(2))
+        expected = min((2 * args.depth - EXTERNAL_SLOTS) * max(args.array_size, 1), pending)
+        if len(paths) != expected:
+            failures.append(f"expected {expected} submissions, got {len(paths)}")
+        # 每个任务目录的输入代价相同，按项目轮转时第一轮各取一个
+        cold_projects = [os.path.relpath(path, calc_dir).split(os.sep, 1)[0] for path in cold_paths]
+        if len(cold_paths) <= args.folders and len(set(cold_projects)) != len(cold_projects):
+            failures.append(f"cold run did not rotate between projects: {len(set(cold_projects))} projects "
+                            f"for {len(cold_projects)} inputs")
+        if len(set(paths)) != len(paths):
+            failures.append("an input was submitted twice")
+        if any(path.endswith('template.gjf') for path in paths):
+            failures.append("template.gjf was submitted")
+        leftover = [name for name in os.listdir(os.path.dirname(paths[0])) if name.endswith('.sh')] if paths else []
+        if leftover:
+            failures.append(f"job scripts left behind: {leftover}")
+        if paths:
+            with open(paths[0], 'r') as f:
+                first_line = f.readline().strip()
+            if first_line != f"%chk={os.path.splitext(paths[0])[0]}.chk":
+                failures.append(f"chk path not rewritten: {first_line}")
+        if args.array_size > 1:
+            failures.extend(check_arrays(work_dir, fake_dir, job_ids, paths))
+        elif paths:
+            script = os.path.join(fake_dir, 'scripts', f"{os.path.splitext(os.path.basename(paths[0]))[0]}.sh")
+            with open(script, 'r') as f:
+                content = f.read()
+            if '#SBATCH -p debug\n' not in content or not content.endswith("# Commands from comd file\necho done\n"):
+                failures.append("job script is missing the partition or comd commands")
+        with open(os.path.join(fake_dir, 'squeue_calls'), 'r') as f:
+            squeue_calls = len(f.readlines())
+        if squeue_calls != 3:
+            failures.append(f"expected one squeue call per run, got {squeue_calls}")
+
+        report = {
+            'folders': args.folders,
+            'pending_inputs': pending,
+            'depth': args.depth,
+            'array_size': args.array_size,
+            'jobs': len({job_id.split('_')[0] for job_id in job_ids}),
+            'cold_s': round(cold, 3),
+            'warm_s': round(warm, 3),
+            'drain_s': round(drain, 3),
+            'submitted': len(paths),
+            'failures': failures,
+            'ok': not failures,
+        }
+    finally:
+        if args.keep:
+            print(f"Tree kept in {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['ok'] else 1)
+
+
+if __name__ == "__main__":
+    main()
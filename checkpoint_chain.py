@@ -0,0 +1,108 @@
+import re
+
+# 任务块中 "chain = chk" 开启检查点续算
+CHAIN_MODES = ('chk',)
+
+# Gaussian 关键词行开头的输出级别：#p / #n / #t
+_print_levels = ('p', 'n', 't')
+# 需要自定义基组段、无法从关键词行判断是否相同的基组
+_custom_basis = ('gen', 'genecp')
+# 已经给出初始力常数来源的 opt 选项
+_hessian_options = ('calcfc', 'calcall', 'readfc', 'rcfc', 'calchffc')
+_option_pattern = re.compile(r'^([a-z]+)\s*(?:=\s*\(?|\()?(.*?)\)?$', re.IGNORECASE)
+
+
+def split_route(route):
+    """
+    把关键词行按空白切分，括号内的空白不切分；去掉开头的 # 和输出级别。
+    """
+    tokens = []
+    depth = 0
+    current = ''
+    for char in route.strip().lstrip('#'):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(depth - 1, 0)
+        if char.isspace() and depth == 0:
+            if current:
+                tokens.append(current)
+            current = ''
+        else:
+            current += char
+    if current:
+        tokens.append(current)
+    if tokens and tokens[0].lower() in _print_levels:
+        tokens = tokens[1:]
+    return tokens
+
+
+def route_option(route, name):
+    """
+    返回关键词（opt、guess、geom、freq 等）对应的原始片段，没有时返回 None。
+    """
+    for token in split_route(route):
+        match = _option_pattern.match(token)
+        if match and match.group(1).lower() == name:
+            return token
+    return None
+
+
+def route_basis(route):
+    """
+    返回 "方法/基组" 中规范化后的基组，没有时返回 None。
+    """
+    for token in split_route(route):
+        if '/' not in token or '=' in token.split('/', 1)[0]:
+            continue
+        basis = token.split('/', 1)[1].lower()
+        return basis.replace('(d,p)', '**').replace('(d)', '*')
+    return None
+
+
+def incompatibility(route, parent_route):
+    """
+    检查能否从来源任务的 chk 续算，兼容时返回 None，否则返回原因。
+    续算任务的电荷和自旋多重度取自来源的 log，总与来源相同，因此只比较基组。
+    """
+    basis = route_basis(route)
+    parent_basis = route_basis(parent_route)
+    if basis is None or parent_basis is None:
+        return "basis set not found in the route"
+    if basis in _custom_basis or parent_basis in _custom_basis:
+        return "custom basis (gen/genecp) cannot be compared"
+    if basis != parent_basis:
+        return f"basis {basis} differs from the source ({parent_basis})"
+    return None
+
+
+def _add_readfc(route):
+    """
+    给 opt 加上 readfc：opt -> opt=readfc，opt=tight -> opt=(tight,readfc)。
+    """
+    token = route_option(route, 'opt')
+    options = [option.strip() for option in _option_pattern.match(token).group(2).split(',') if option.strip()]
+    if any(option.lower() in _hessian_options for option in options):
+        return route
+    new_token = f"{token[:3]}=({','.join(options + ['readfc'])})" if options else f"{token[:3]}=readfc"
+    return route.replace(token, new_token, 1)
+
+
+def chain_route(route, parent_route):
+    """
+    返回 (续算用的关键词行, 是否从 chk 读取结构)。
+
+    加上 guess=read 和 geom=check；来源做过频率计算且本任务是优化时加上 opt=readfc。
+    关键词行中已有 guess= 或 geom= 时保留原设置，此时仍写出坐标。
+    """
+    geom_check = route_option(route, 'geom') is None
+    extra = []
+    if route_option(route, 'guess') is None:
+        extra.append('guess=read')
+    if geom_check:
+        extra.append('geom=check')
+    if route_option(route, 'opt') is not None and route_option(parent_route, 'freq') is not None:
+        route = _add_readfc(route)
+    if extra:
+        route = f"{route.rstrip()} {' '.join(extra)}"
+    return route, geom_check
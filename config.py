@@ -19,4 +19,31 @@ AUTOTASKER_TEMPLATES_PATH = get_env_or_default('AUTOTASKER_TEMPLATES_PATH',
 AUTOTASKER_GEOMTOOLS_PATH = get_env_or_default('AUTOTASKER_GEOMTOOLS_PATH', 
                                               os.path.join(AUTOTASKER_BASE_PATH, 'geom_tools'))
 AUTOTASKER_SCRIPTS_PATH = get_env_or_default('AUTOTASKER_SCRIPTS_PATH', 
-                                            os.path.join(AUTOTASKER_BASE_PATH, 'scripts'))
\ No newline at end of file
+                                            os.path.join(AUTOTASKER_BASE_PATH, 'scripts'))
+AUTOTASKER_CACHE_PATH = get_env_or_default('AUTOTASKER_CACHE_PATH',
+                                          os.path.expanduser("~/.tasker"))
+AUTOTASKER_STATE_PATH = get_env_or_default('AUTOTASKER_STATE_PATH',
+                                          os.path.join(AUTOTASKER_CACHE_PATH, 'scan_state.db'))
+AUTOTASKER_METRICS_PATH = get_env_or_default('AUTOTASKER_METRICS_PATH',
+                                            os.path.join(AUTOTASKER_CACHE_PATH, 'metrics'))
+AUTOTASKER_JOBS_PATH = get_env_or_default('AUTOTASKER_JOBS_PATH',
+                                         os.path.join(AUTOTASKER_CACHE_PATH, 'jobs.db'))
+# log 解析结果缓存（geom_tools/log_cache.py）：为 0 时关闭，磁盘缓存上限单位 MB
+AUTOTASKER_LOG_CACHE = get_env_or_default('AUTOTASKER_LOG_CACHE', '1') == '1'
+AUTOTASKER_LOG_CACHE_MB = float(get_env_or_default('AUTOTASKER_LOG_CACHE_MB', '512'))
+
+# 为 1 时已处理的任务记录在 name.task.done 中，不再改写 .task 文件
+AUTOTASKER_TASK_JOURNAL = get_env_or_default('AUTOTASKER_TASK_JOURNAL', '0') == '1'
+
+# slurm_submit.py 扫描待提交 gjf 的根目录，以及希望维持的队列作业数
+AUTOTASKER_SUBMIT_PATH = get_env_or_default('AUTOTASKER_SUBMIT_PATH', os.path.expanduser("~/AutoCalc"))
+AUTOTASKER_QUEUE_DEPTH = int(get_env_or_default('AUTOTASKER_QUEUE_DEPTH', '20'))
+# priority：按依赖图的关键路径排序并在项目之间轮转；path：按路径排序
+AUTOTASKER_SUBMIT_ORDER = get_env_or_default('AUTOTASKER_SUBMIT_ORDER', 'priority')
+# 大于 1 时，资源需求相同的待提交输入最多这么多个打包成一个 SLURM 作业数组
+AUTOTASKER_ARRAY_SIZE = int(get_env_or_default('AUTOTASKER_ARRAY_SIZE', '0'))
+
+# 为 1 时按原子数、基组和作业类型为生成的 gjf 写入 %nprocshared/%mem（见 resource_policy.py），
+# 默认关闭，生成的 gjf 与原先相同；AUTOTASKER_RESOURCE_RULES 指向 JSON 规则文件时替换内置规则
+AUTOTASKER_RESOURCE_POLICY = get_env_or_default('AUTOTASKER_RESOURCE_POLICY', '0') == '1'
+AUTOTASKER_RESOURCE_RULES = get_env_or_default('AUTOTASKER_RESOURCE_RULES', '')
@@ -13,6 +13,31 @@ export AUTOTASKER_TEMPLATES_PATH="${GAUSSIAN_TEMPLATE_DIR:-$AUTOTASKER_BASE_PATH
 export AUTOTASKER_GEOMTOOLS_PATH="$AUTOTASKER_BASE_PATH/geom_tools"
 export AUTOTASKER_SCRIPTS_PATH="$AUTOTASKER_BASE_PATH/scripts"
 
+# 本地缓存与增量扫描状态库（建议放在本地磁盘而非 NFS 上）
+export AUTOTASKER_CACHE_PATH="$HOME/.tasker"
+export AUTOTASKER_STATE_PATH="$AUTOTASKER_CACHE_PATH/scan_state.db"
+export AUTOTASKER_METRICS_PATH="$AUTOTASKER_CACHE_PATH/metrics"
+# 已提交作业的状态表（abort/status_parser.py 增量同步 submit.log 并用 sacct 刷新）
+export AUTOTASKER_JOBS_PATH="$AUTOTASKER_CACHE_PATH/jobs.db"
+# log 解析结果缓存($AUTOTASKER_CACHE_PATH/log_cache.db)：设为 0 时关闭；磁盘缓存上限(MB)，超出后按最近访问时间淘汰
+export AUTOTASKER_LOG_CACHE=1
+export AUTOTASKER_LOG_CACHE_MB=512
+# 设为 1 时已处理的任务记录在 name.task.done 中，不再改写 .task 文件
+export AUTOTASKER_TASK_JOURNAL=0
+# slurm_submit.py：扫描待提交 gjf 的根目录和希望维持的队列作业数
+export AUTOTASKER_SUBMIT_PATH="$HOME/AutoCalc"
+export AUTOTASKER_QUEUE_DEPTH=20
+# 提交顺序：priority 按关键路径优先并在项目之间轮转，path 按路径排序
+export AUTOTASKER_SUBMIT_ORDER=priority
+# 大于 1 时把资源相同的小作业打包为作业数组（每个数组最多这么多个输入），0 表示逐个提交
+export AUTOTASKER_ARRAY_SIZE=0
+# 设为 1 时按分子大小和方法为 gjf 写入 %nprocshared/%mem 和时限；规则文件为空时使用 resource_policy.py 的内置规则
+export AUTOTASKER_RESOURCE_POLICY=0
+export AUTOTASKER_RESOURCE_RULES=""
+# CAS 号解析：本地数据集(TSV/CSV，多个用 : 分隔)；计算节点无外网时保持 AUTOTASKER_CAS_NETWORK=0
+export AUTOTASKER_CAS_TABLE=""
+export AUTOTASKER_CAS_NETWORK=0
+
 # 定义tast命令函数
 tast() {
     case "$1" in
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+结构与计算输出的解析工具。
+
+作为包导入（from geom_tools.geometry import Geometry），仓库根目录需要在 sys.path 上；
+命令行工具用 python -m 运行，例如在仓库根目录下：
+    python -m geom_tools.gaussian_log name.log --status
+"""
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+按来源任务查找并读取计算输出：Gaussian 的 .log 或 ORCA 的 .out。
+
+本模块只依赖标准库，解析器在 read_log_data 中按需导入，
+可以在检查依赖是否满足时直接使用而不加载 numpy。
+"""
+import os
+
+ORCA_SUFFIX = '.out'
+# ORCA 在正常结束标记之后还会打印总运行时间，因此检查文件末尾的一段而不是最后一行
+_TAIL_BYTES = 4096
+
+
+def output_candidates(task_dir, source, original_file_name):
+    """
+    来源任务可能的输出路径，按优先级排列：
+        <source>/<source>_<原始文件名>.log    Gaussian
+        <source>/<source>_<原始文件名>.out    ORCA（与 Gaussian 相同的命名）
+        <source>/<source>.out                 ORCA（由 <source>.inp 直接运行）
+    """
+    source_dir = os.path.join(task_dir, source)
+    return [
+        os.path.join(source_dir, f"{source}_{original_file_name}.log"),
+        os.path.join(source_dir, f"{source}_{original_file_name}{ORCA_SUFFIX}"),
+        os.path.join(source_dir, f"{source}{ORCA_SUFFIX}"),
+    ]
+
+
+def find_source_output(task_dir, source, original_file_name):
+    """
+    返回第一个存在的输出路径；都不存在时返回 Gaussian 的 .log 路径。
+    """
+    candidates = output_candidates(task_dir, source, original_file_name)
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return candidates[0]
+
+
+def is_orca_output(path):
+    return path.endswith(ORCA_SUFFIX)
+
+
+def orca_terminated_normally(out_file):
+    """
+    只读取文件末尾，检查 ORCA 的正常结束标记。
+    """
+    with open(out_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - _TAIL_BYTES))
+        tail = f.read()
+    return b'ORCA TERMINATED NORMALLY' in tail
+
+
+def read_log_data(path):
+    """
+    读取（经缓存的）生成后续任务所需的数据，格式见 gaussian_log.read_final_log_data：
+    Gaussian log 只读开头和末尾的最后一帧结构，不完整解析；ORCA 输出取 OrcaLog.to_log_data()。
+    """
+    if is_orca_output(path):
+        from geom_tools.orca_log import load_orca_output
+        return load_orca_output(path).to_log_data()
+    from geom_tools.gaussian_log import load_final_log_data
+    return load_final_log_data(path)
@@ -0,0 +1,472 @@
+# -*- coding: utf-8 -*-
+"""
+Gaussian log 的解析，两种读法：
+    parse_gaussian_log      单次流式读取整个文件，按 Link1 步骤输出结构化记录（能量、激发态、频率等）
+    read_final_log_data     只读文件开头（关键词）和用 mmap 从末尾反向查找的最后一个坐标块，
+                            不随文件大小线性增长；生成后续任务只需要这一部分
+两者对最后一帧结构、电荷和自旋多重度的取法相同。
+
+命令行用法（供 scripts 下的 bash 脚本调用，除 --json 外都不需要 numpy）：
+    python -m geom_tools.gaussian_log name.log --status          # normal / error / running
+    python -m geom_tools.gaussian_log name.log --charge          # 电荷 自旋多重度
+    python -m geom_tools.gaussian_log name.log --geom            # 元素符号 x y z
+    python -m geom_tools.gaussian_log name.log --geom --atomic-numbers
+    python -m geom_tools.gaussian_log name.log --json
+"""
+import os
+import re
+import mmap
+from dataclasses import dataclass, field, asdict
+from typing import TYPE_CHECKING, List, Optional
+
+from geom_tools.geom_extract import element_symbol, orientation_rows, format_coordinates
+from geom_tools.log_cache import cached_parse
+
+if TYPE_CHECKING:
+    from geom_tools.geometry import Geometry
+
+# 解析结果格式变化时递增，使磁盘缓存失效
+PARSER_VERSION = 3
+
+_charge_pattern = re.compile(r'Charge\s*=\s*(-?\d+)\s+Multiplicity\s*=\s*(\d+)')
+_scf_pattern = re.compile(r'SCF Done:\s+E\((\S+)\)\s+=\s+(-?\d+\.\d+)')
+_excited_state_pattern = re.compile(
+    r'Excited State\s+(\d+):\s+(\S+)\s+(-?\d+\.\d+)\s+eV\s+(-?\d+\.\d+)\s+nm\s+f=(-?\d+\.\d+)')
+
+
+@dataclass
+class ExcitedState:
+    index: int
+    symmetry: str
+    energy_ev: float
+    wavelength_nm: float
+    oscillator_strength: float
+
+
+@dataclass
+class LinkStep:
+    """
+    一个 Link1 步骤（包括 opt freq 自动追加的 freq 步骤）的解析结果。
+    """
+    route: str = ''
+    charge: Optional[int] = None
+    spin_multiplicity: Optional[int] = None
+    geometry: Optional['Geometry'] = None
+    orientation: Optional[str] = None  # 'standard' 或 'input'
+    scf_method: Optional[str] = None
+    scf_energies: List[float] = field(default_factory=list)
+    excited_states: List[ExcitedState] = field(default_factory=list)
+    frequencies: List[float] = field(default_factory=list)
+    normal_termination: bool = False
+    error_termination: bool = False
+
+    @property
+    def scf_energy(self) -> Optional[float]:
+        return self.scf_energies[-1] if self.scf_energies else None
+
+    @property
+    def coordinates(self) -> List[str]:
+        return self.geometry.to_lines() if self.geometry is not None else []
+
+    def is_empty(self) -> bool:
+        return not (self.route or self.charge is not None or self.geometry is not None or self.scf_energies)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data['geometry'] = None
+        if self.geometry is not None:
+            data['geometry'] = {
+                'symbols': self.geometry.symbols,
+                'coords': self.geometry.coords.tolist(),
+            }
+        return data
+
+
+@dataclass
+class GaussianLog:
+    path: str
+    steps: List[LinkStep] = field(default_factory=list)
+
+    @property
+    def normal_termination(self) -> bool:
+        """
+        与只看最后一行的判断一致：最后一个步骤正常结束。
+        """
+        return bool(self.steps) and self.steps[-1].normal_termination
+
+    @property
+    def status(self) -> str:
+        if self.normal_termination:
+            return 'normal'
+        if any(step.error_termination for step in self.steps):
+            return 'error'
+        return 'running'
+
+    @property
+    def final_step(self) -> Optional[LinkStep]:
+        """
+        最后一个含有几何结构的步骤。
+        """
+        for step in reversed(self.steps):
+            if step.geometry is not None and len(step.geometry):
+                return step
+        return None
+
+    @property
+    def charge(self) -> Optional[int]:
+        return self._first('charge')
+
+    @property
+    def spin_multiplicity(self) -> Optional[int]:
+        return self._first('spin_multiplicity')
+
+    def _first(self, attr):
+        final = self.final_step
+        if final is not None and getattr(final, attr) is not None:
+            return getattr(final, attr)
+        for step in self.steps:
+            if getattr(step, attr) is not None:
+                return getattr(step, attr)
+        return None
+
+    @property
+    def final_geometry(self) -> Optional['Geometry']:
+        final = self.final_step
+        return final.geometry if final is not None else None
+
+    def to_log_data(self) -> dict:
+        """
+        转换为 read_final_log_data 的返回格式。
+        """
+        from geom_tools.geometry import Geometry
+
+        final = self.final_step
+        geometry = None
+        if final is not None:
+            geometry = Geometry(final.geometry.numbers, final.geometry.coords, self.charge, self.spin_multiplicity)
+        return {
+            'charge': self.charge,
+            'spin_multiplicity': self.spin_multiplicity,
+            'coordinates': geometry.to_lines() if geometry is not None else [],
+            'geometry': geometry,
+            'keywords': self.steps[0].route if self.steps else '',
+        }
+
+    def to_dict(self) -> dict:
+        return {'path': self.path, 'steps': [step.to_dict() for step in self.steps]}
+
+
+class _StepParser:
+    """
+    逐行喂入的解析状态机。坐标块只保留原始行，到步骤结束时才解析最后一块。
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.step = None
+        self._route_state = None  # None=未开始 'collecting' 'done'
+        self._route_lines = []
+        self._block_kind = None
+        self._block_skip = 0
+        self._block_lines = []
+        self._last_blocks = {}
+
+    def _current(self):
+        if self.step is None:
+            self.step = LinkStep()
+            self.steps.append(self.step)
+        return self.step
+
+    def _finish_step(self):
+        step = self.step
+        if step is None:
+            return
+        if self._route_lines and not step.route:
+            step.route = ' '.join(self._route_lines)
+        kind = 'standard' if 'standard' in self._last_blocks else 'input'
+        lines = self._last_blocks.get(kind)
+        if lines:
+            from geom_tools.geometry import Geometry
+            step.orientation = kind
+            step.geometry = Geometry.from_orientation_lines(lines, step.charge, step.spin_multiplicity)
+        if step.is_empty() and not (step.normal_termination or step.error_termination):
+            self.steps.remove(step)
+        self.step = None
+        self._route_state = None
+        self._route_lines = []
+        self._block_kind = None
+        self._last_blocks = {}
+
+    def feed(self, line):
+        # 坐标块内部
+        if self._block_kind is not None:
+            if self._block_skip > 0:
+                self._block_skip -= 1
+                return
+            if '----' in line:
+                self._last_blocks[self._block_kind] = self._block_lines
+                self._block_kind = None
+                return
+            self._block_lines.append(line)
+            return
+
+        stripped = line.strip()
+
+        if stripped.startswith('Entering Link 1 '):
+            if self.step is not None:
+                self._finish_step()
+            self._current()
+            return
+
+        # 计算关键词：第一组 # 行直到 ---- 分隔线
+        if self._route_state != 'done':
+            if stripped.startswith('#'):
+                self._route_state = 'collecting'
+                self._route_lines.append(stripped)
+                self._current()
+                return
+            if self._route_state == 'collecting':
+                if stripped.startswith('----'):
+                    self._route_state = 'done'
+                    self._current().route = ' '.join(self._route_lines)
+                elif stripped:
+                    self._route_lines[-1] = self._route_lines[-1] + stripped
+                return
+
+        if 'orientation:' in line:
+            if 'Standard orientation' in line:
+                kind = 'standard'
+            elif 'Input orientation' in line:
+                kind = 'input'
+            else:
+                kind = None
+            if kind is not None:
+                self._current()
+                self._block_kind = kind
+                self._block_skip = 4
+                self._block_lines = []
+                return
+
+        if stripped.startswith('Charge ='):
+            step = self._current()
+            if step.charge is None:
+                match = _charge_pattern.search(line)
+                if match:
+                    step.charge = int(match.group(1))
+                    step.spin_multiplicity = int(match.group(2))
+        elif stripped.startswith('SCF Done:'):
+            match = _scf_pattern.search(line)
+            if match:
+                step = self._current()
+                step.scf_method = match.group(1)
+                step.scf_energies.append(float(match.group(2)))
+        elif stripped.startswith('Excited State'):
+            match = _excited_state_pattern.search(line)
+            if match:
+                step = self._current()
+                index = int(match.group(1))
+                # TD 优化中每一步都会重新打印激发态，只保留最后一组
+                if index == 1:
+                    step.excited_states = []
+                step.excited_states.append(ExcitedState(index, match.group(2), float(match.group(3)),
+                                                        float(match.group(4)), float(match.group(5))))
+        elif stripped.startswith('Frequencies --'):
+            step = self._current()
+            step.frequencies.extend(float(value) for value in stripped.split()[2:])
+        elif stripped.startswith('Normal termination of Gaussian'):
+            self._current().normal_termination = True
+            self._finish_step()
+        elif stripped.startswith('Error termination'):
+            self._current().error_termination = True
+            self._finish_step()
+
+    def close(self):
+        # 文件末尾未写完的坐标块（正在运行的作业）丢弃，保留之前完整的一块
+        self._block_kind = None
+        self._finish_step()
+        return self.steps
+
+
+def parse_gaussian_log(log_file_path) -> GaussianLog:
+    """
+    单次顺序读取 log 文件，返回包含每个 Link1 步骤信息的 GaussianLog。
+    """
+    parser = _StepParser()
+    with open(log_file_path, 'r', errors='replace') as file:
+        for line in file:
+            parser.feed(line)
+    return GaussianLog(path=log_file_path, steps=parser.close())
+
+
+def load_gaussian_log(log_file_path) -> GaussianLog:
+    """
+    通过解析缓存读取 log：同一个（未变化的）文件只会被完整解析一次。
+    """
+    return cached_parse(log_file_path, 'gaussian_log', PARSER_VERSION, parse_gaussian_log)
+
+
+_step_markers = (b'Entering Link 1 ', b'Normal termination of Gaussian', b'Error termination')
+_orientation_markers = (b'Standard orientation', b'Input orientation')
+# 结束行之后只有几行时间统计，检查末尾一段即可
+_TAIL_BYTES = 4096
+_SCAN_CHUNK = 1 << 20
+
+
+def _read_route(file):
+    """
+    从文件开头顺序读取第一组 # 关键词行（直到 ---- 分隔线），与 _StepParser 的拼接方式相同。
+    """
+    route_lines = []
+    for raw_line in file:
+        stripped = raw_line.decode('utf-8', errors='replace').strip()
+        # 关键词总在电荷行之前，到这里还没有就不再往下读
+        if not route_lines and stripped.startswith('Charge ='):
+            break
+        if stripped.startswith('#') and not route_lines:
+            route_lines.append(stripped)
+        elif route_lines:
+            if stripped.startswith('----'):
+                break
+            if stripped.startswith('#'):
+                route_lines.append(stripped)
+            elif stripped:
+                route_lines[-1] = route_lines[-1] + stripped
+    return ' '.join(route_lines)
+
+
+def _read_block(mm, marker_pos):
+    """
+    读取 marker_pos 所在标题行之后的坐标块（标题后第五行起，到 ---- 分隔线为止）。
+    块没有写完（到达文件末尾）时返回 None。
+    """
+    mm.seek(mm.rfind(b'\n', 0, marker_pos) + 1)
+    for _ in range(5):
+        if not mm.readline():
+            return None
+    lines = []
+    while True:
+        line = mm.readline()
+        if not line:
+            return None
+        if b'----' in line:
+            return lines
+        lines.append(line.decode('utf-8', errors='replace'))
+
+
+def _step_start(fd, pos):
+    """
+    pos 所在步骤的起点：之前最近的 Entering Link 1 或上一步骤的结束行，没有时为 0。
+    按块向前读取，找到最近的一个即停止；不经 mmap，单步骤的大文件整个扫过也不占用内存。
+    """
+    overlap = max(len(marker) for marker in _step_markers)
+    end = pos
+    while end > 0:
+        start = max(0, end - _SCAN_CHUNK)
+        chunk = os.pread(fd, min(end + overlap, pos) - start, start)
+        found = max(chunk.rfind(marker) for marker in _step_markers)
+        if found >= 0:
+            return start + found
+        end = start
+    return 0
+
+
+def _read_charge(mm, start, end):
+    """
+    [start, end) 中第一个 "Charge = ... Multiplicity = ..." 行，没有时返回 None。
+    """
+    pos = mm.find(b'Charge =', start, end)
+    while pos >= 0:
+        mm.seek(mm.rfind(b'\n', 0, pos) + 1)
+        match = _charge_pattern.search(mm.readline().decode('utf-8', errors='replace'))
+        if match:
+            return int(match.group(1)), int(match.group(2))
+        pos = mm.find(b'Charge =', pos + 1, end)
+    return None
+
+
+def _last_orientation(mm):
+    """
+    返回 (最后一个完整坐标块的标题位置, 数据行)。与 _StepParser 相同，所在步骤中有
+    Standard orientation 时优先使用，没有时使用 Input orientation；找不到时返回 (-1, [])。
+    """
+    end = len(mm)
+    while True:
+        standard, inp = (mm.rfind(marker, 0, end) for marker in _orientation_markers)
+        if max(standard, inp) < 0:
+            return -1, []
+        # Input 在后且两者之间开始了新步骤时，新步骤中没有 Standard orientation
+        new_step = inp > standard and max(mm.rfind(marker, max(standard, 0), inp) for marker in _step_markers) >= 0
+        marker_pos = inp if standard < 0 or new_step else standard
+        lines = _read_block(mm, marker_pos)
+        if lines is not None:
+            return marker_pos, lines
+        end = marker_pos
+
+
+def _tail_status(mm):
+    """
+    Gaussian 出错即退出，结束行总在文件末尾：末尾一段中最后一个步骤正常结束时为 normal，
+    有 Error termination 时为 error，否则为 running。
+    """
+    start = max(0, len(mm) - _TAIL_BYTES)
+    if mm.rfind(_step_markers[1], start) > mm.rfind(_step_markers[0], start):
+        return 'normal'
+    if mm.rfind(_step_markers[2], start) >= 0:
+        return 'error'
+    return 'running'
+
+
+def read_final_log_data(log_file_path, geometry=True) -> dict:
+    """
+    不完整读取整个 log，返回生成后续任务所需的数据：
+        keywords / charge / spin_multiplicity / status
+        numbers / labels / coords     最后一帧结构（原子序数、元素符号、坐标元组）
+        coordinates                   "El x y z" 坐标行
+        geometry                      Geometry 对象，geometry=False 时为 None（不导入 numpy）
+    电荷和自旋多重度取最后一帧结构所在步骤的 "Charge =" 行，没有时取文件中的第一个。
+    """
+    result = {'keywords': '', 'charge': None, 'spin_multiplicity': None, 'status': 'running',
+              'numbers': [], 'labels': [], 'coords': [], 'coordinates': [], 'geometry': None}
+    with open(log_file_path, 'rb') as file:
+        result['keywords'] = _read_route(file)
+        if os.fstat(file.fileno()).st_size == 0:
+            return result
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            result['status'] = _tail_status(mm)
+            marker_pos, lines = _last_orientation(mm)
+            charge = None
+            if marker_pos >= 0:
+                charge = _read_charge(mm, _step_start(file.fileno(), marker_pos), marker_pos)
+            if charge is None:
+                charge = _read_charge(mm, 0, len(mm))
+            if charge is not None:
+                result['charge'], result['spin_multiplicity'] = charge
+
+    numbers, coords = orientation_rows(lines)
+    if not numbers:
+        return result
+    result['numbers'] = numbers
+    result['labels'] = [element_symbol(number) for number in numbers]
+    result['coords'] = coords
+    result['coordinates'] = format_coordinates(result['labels'], coords)
+    if geometry:
+        from geom_tools.geometry import Geometry
+        result['geometry'] = Geometry(numbers, coords, result['charge'], result['spin_multiplicity'])
+    return result
+
+
+def load_final_log_data(log_file_path) -> dict:
+    """
+    经解析缓存读取 read_final_log_data 的结果。
+    """
+    return cached_parse(log_file_path, 'gaussian_final', PARSER_VERSION, read_final_log_data)
+
+
+def main():
+    from geom_tools.log_cli import run_cli
+    run_cli('Parse a Gaussian log file.', 'Gaussian .log/.out file',
+            lambda path: read_final_log_data(path, geometry=False), parse_gaussian_log)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,94 @@ atomic_number_to_symbol = {
     '110': 'Ds', '111': 'Rg', '112': 'Cn', '113': 'Nh', '114': 'Fl', '115': 'Mc', '116': 'Lv', '117': 'Ts', '118': 'Og'
 }
 
+_charge_pattern = re.compile(r'Charge\s*=\s*(-?\d+)\s+Multiplicity\s*=\s*(\d+)')
+
+# 原子序数 -> 元素符号（下标即原子序数，0 号为占位的虚原子）
+ELEMENT_SYMBOLS = ['X'] + [atomic_number_to_symbol[str(i)] for i in range(1, 119)]
+SYMBOL_TO_NUMBER = {symbol.upper(): number for number, symbol in enumerate(ELEMENT_SYMBOLS)}
+SYMBOL_TO_NUMBER['BQ'] = 0
+
+_element_pattern = re.compile(r'[A-Za-z]+')
+
+# 不是元素的标签（周期性体系的平移矢量 Tv 等赝原子）与虚原子一样记为 0 号，
+# 原标签保留在 Geometry.labels 中，写出时照写
+PSEUDO_ATOM = 0
+
+
+def element_number(label):
+    """
+    把 gjf/xyz 中的原子标签（C、c、C1、C(Fragment=1)、6 等）转换为原子序数，
+    Bq 和无法识别的标签（Tv 等）为 PSEUDO_ATOM。
+    """
+    if label.isdigit():
+        return int(label)
+    match = _element_pattern.match(label)
+    if not match:
+        return PSEUDO_ATOM
+    symbol = match.group(0).upper()
+    # 与 Gaussian 一样不区分大小写，先尝试双字母元素（CA、Cl 为钙、氯），
+    # 不是元素时再退回首字母（如 CX、HA 这类标签）
+    if symbol[:2] in SYMBOL_TO_NUMBER:
+        return SYMBOL_TO_NUMBER[symbol[:2]]
+    if symbol[:1] in SYMBOL_TO_NUMBER:
+        return SYMBOL_TO_NUMBER[symbol[:1]]
+    return PSEUDO_ATOM
+
+
+def element_symbol(number):
+    return ELEMENT_SYMBOLS[number] if 0 <= number < len(ELEMENT_SYMBOLS) else str(number)
+
+
+def orientation_rows(lines):
+    """
+    解析 log 中 Standard/Input orientation 表格的数据行（Center Atomic Type X Y Z），
+    返回 (原子序数列表, 坐标列表)；不完整的行（正在写入的 log）被跳过。
+    """
+    numbers = []
+    coords = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) != 6:
+            continue
+        try:
+            row = (float(parts[3]), float(parts[4]), float(parts[5]))
+            numbers.append(int(parts[1]))
+        except ValueError:
+            continue
+        coords.append(row)
+    return numbers, coords
+
+
+def coordinate_rows(lines):
+    """
+    解析 "El x y z" 或 "El flag x y z" 形式的坐标行，返回 (原子标签列表, 坐标列表)。
+    """
+    labels = []
+    coords = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 4:
+            values = parts[1:4]
+        elif len(parts) == 5:
+            values = parts[2:5]
+        else:
+            continue
+        try:
+            coords.append(tuple(float(value) for value in values))
+        except ValueError:
+            continue
+        labels.append(parts[0])
+    return labels, coords
+
+
+def format_coordinates(labels, coords, precision=8):
+    """
+    格式化为 "El x y z" 坐标行，Geometry.to_lines 与命令行输出共用。
+    """
+    fmt = f"{{:<2s}} {{:{precision + 6}.{precision}f}} {{:{precision + 6}.{precision}f}} {{:{precision + 6}.{precision}f}}"
+    return [fmt.format(label, x, y, z) for label, (x, y, z) in zip(labels, coords)]
+
+
 def extract_info_from_gfj(gfj_file_path):
     result = {
         'charge': None,
@@ -66,141 +154,88 @@ def extract_info_from_gfj(gfj_file_path):
     
     return result
 
-def extract_final_optimized_coordinates_from_log(log_file_path):
-    result = {
-        'charge': None,
-        'spin_multiplicity': None,
-        'coordinates': [],
-        'keywords': ''
-    }
-
-    with open(log_file_path, 'r') as file:
-        lines = file.readlines()
-
-    # 从上往下搜索包含 # 的行，获取计算关键词
-    # 拼接所有的关键词行
-    keywords = []
-    collecting_keywords = False
-    for line in lines:
-        if line.strip().startswith('#'):
-            collecting_keywords = True
-            keywords.append(line.strip())
-        elif collecting_keywords:
-            # 遇到以 `----` 开头的行终止关键词提取
-            if line.strip().startswith('----'):
-                break
-            # 继续收集从属行
-            elif line.strip():
-                # 将当前行与上一行紧密连接，避免引入不必要的空格
-                keywords[-1] = keywords[-1] + line.strip()
-
-    # 将拼接后的关键词行保存为结果
-    result['keywords'] = ' '.join(keywords)
-
-
-    standard_orientation_found = False
-
-    # 从后往前遍历，寻找最后一个 "Standard orientation"
-    for i in range(len(lines) - 1, -1, -1):
-        if 'Standard orientation' in lines[i]:
-            standard_orientation_found = True
-            j = i + 5  # 坐标数据通常在 "Standard orientation" 行的第五行开始
-            while j < len(lines) and '----' not in lines[j]:
-                parts = lines[j].strip().split()
-                if len(parts) >= 6:
-                    atomic_number = parts[1]
-                    element = atomic_number_to_symbol.get(atomic_number, atomic_number)
-                    x = parts[3]
-                    y = parts[4]
-                    z = parts[5]
-                    result['coordinates'].append("{} {} {} {}".format(element, x, y, z))
-                j += 1
-            break
-
-    if not standard_orientation_found:
-        print("Warning: 'Standard orientation' not found. Using 'Input orientation' coordinates.")
-        for i in range(len(lines) - 1, -1, -1):
-            if 'Input orientation' in lines[i]:
-                j = i + 5  # 坐标数据通常在 "Input orientation" 行的第五行开始
-                while j < len(lines) and '----' not in lines[j]:
-                    parts = lines[j].strip().split()
-                    if len(parts) >= 6:
-                        atomic_number = parts[1]
-                        element = atomic_number_to_symbol.get(atomic_number, atomic_number)
-                        x = parts[3]
-                        y = parts[4]
-                        z = parts[5]
-                        result['coordinates'].append("{} {} {} {}".format(element, x, y, z))
-                    j += 1
-                break
-    
-    # 从前往后遍历，寻找 "Charge =  m Multiplicity = n"
+def _parse_orientation_rows(lines):
+    coordinates = []
     for line in lines:
-        match = re.search(r'Charge\s*=\s*(-?\d+)\s+Multiplicity\s*=\s*(\d+)', line)
-        if match:
-            result['charge'] = int(match.group(1))
-            result['spin_multiplicity'] = int(match.group(2))
-            break
+        parts = line.split()
+        if len(parts) >= 6:
+            atomic_number = parts[1]
+            element = atomic_number_to_symbol.get(atomic_number, atomic_number)
+            coordinates.append("{} {} {} {}".format(element, parts[3], parts[4], parts[5]))
+    return coordinates
 
-    return result
+def iter_scan_points(scan_file_path):
+    """
+    顺序流式读取柔性扫描的 log，逐个产出收敛的扫描点。
+    读取过程中只保留最近一个 "Input orientation" 坐标块（原始行），
+    遇到 "Stationary point found" 时才解析该块，整个文件只读一遍。
+    """
+    charge = spin_multiplicity = None
+    block_lines = None       # 最近一个完整的坐标块
+    block_charge = (None, None)
+    collecting = None        # 正在读取的坐标块
+    skip = 0
+    stationary_point_index = 1
 
+    with open(scan_file_path, 'r', errors='replace') as file:
+        for line_number, line in enumerate(file):
+            if collecting is not None:
+                if skip > 0:
+                    skip -= 1
+                elif '----' in line:
+                    block_lines, collecting = collecting, None
+                else:
+                    collecting.append(line)
+                continue
 
-def extract_scan_coordinates_from_scan(scan_file_path):
-    results = []
-    with open(scan_file_path, 'r') as file:
-        lines = file.readlines()
+            if 'Input orientation' in line:
+                # 坐标数据在 "Input orientation" 行之后第五行开始
+                collecting = []
+                skip = 4
+                block_charge = (charge, spin_multiplicity)
+            elif 'Charge =' in line:
+                match = _charge_pattern.search(line)
+                if match:
+                    charge = int(match.group(1))
+                    spin_multiplicity = int(match.group(2))
+                    if block_lines is None:
+                        block_charge = (charge, spin_multiplicity)
+            elif 'Stationary point found' in line:
+                if block_lines is None:
+                    print("Error: 'Input orientation' not found for 'Stationary point found' at line:", line_number)
+                    continue
+                yield {
+                    'index': stationary_point_index,
+                    'charge': block_charge[0],
+                    'spin_multiplicity': block_charge[1],
+                    'coordinates': _parse_orientation_rows(block_lines)
+                }
+                stationary_point_index += 1
 
-    index = 0
-    stationary_point_index = 1
-    while index < len(lines):
-        if 'Stationary point found' in lines[index]:
-            # 向上查找 "Input orientation"
-            input_orientation_found = False
-            for i in range(index, -1, -1):
-                if 'Input orientation' in lines[i]:
-                    print("Found 'Input orientation' at line:", i)  # 调试信息
-                    # 提取坐标数据
-                    result = {
-                        'index': stationary_point_index,
-                        'charge': None,
-                        'spin_multiplicity': None,
-                        'coordinates': []
-                    }
-                    j = i + 5  # 坐标数据通常在 "Input orientation" 行的第五行开始
-                    while j < len(lines) and '----' not in lines[j]:
-                        parts = lines[j].strip().split()
-                        if len(parts) >= 6:
-                            atomic_number = parts[1]
-                            element = atomic_number_to_symbol.get(atomic_number, atomic_number)
-                            x = parts[3]
-                            y = parts[4]
-                            z = parts[5]
-                            result['coordinates'].append("{} {} {} {}".format(element, x, y, z))
-                        j += 1
-                    # 提取电荷和自旋多重度
-                    for k in range(i, -1, -1):
-                        match = re.search(r'Charge\s*=\s*(-?\d+)\s+Multiplicity\s*=\s*(\d+)', lines[k])
-                        if match:
-                            result['charge'] = int(match.group(1))
-                            result['spin_multiplicity'] = int(match.group(2))
-                            break
-                    input_orientation_found = True
-                    results.append(result)
-                    stationary_point_index += 1
-                    break
-            if not input_orientation_found:
-                print("Error: 'Input orientation' not found for 'Stationary point found' at line:", index)
-        index += 1
-
-    # 将结果写入临时文件
-    with open('scan_results.txt', 'w') as outfile:
-        for result in results:
-            outfile.write("Stationary Point Index: {}\n".format(result['index']))
-            outfile.write("Coordinates:\n")
-            for coord in result['coordinates']:
+def write_scan_xyz(scan_points, output_path):
+    """
+    把扫描点写成多帧 xyz 文件，注释行记录扫描点序号、电荷和自旋多重度。
+    返回写入的帧数。
+    """
+    count = 0
+    with open(output_path, 'w') as outfile:
+        for point in scan_points:
+            outfile.write("{}\n".format(len(point['coordinates'])))
+            outfile.write("Stationary point {} charge={} spin={}\n".format(
+                point['index'], point['charge'], point['spin_multiplicity']))
+            for coord in point['coordinates']:
                 outfile.write(coord + '\n')
-            outfile.write("\n")
+            count += 1
+    return count
 
+def extract_scan_coordinates_from_scan(scan_file_path, output_path=None):
+    """
+    提取扫描中所有收敛点的坐标，返回列表。
+    提供 output_path 时同时写出多帧 xyz 文件。
+    """
+    results = list(iter_scan_points(scan_file_path))
+    if output_path:
+        write_scan_xyz(results, output_path)
     return results
 
 def extract_info_from_xyz(xyz_file_path):
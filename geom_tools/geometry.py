@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+紧凑的几何结构表示：原子序数数组 + (N, 3) float64 坐标数组 + 电荷/自旋多重度。
+各种输入（log 坐标块、gjf/com、xyz、RDKit 构象）统一解析为 Geometry，
+输出 gjf/xyz/ORCA 坐标时再格式化，中间环节不再反复拆分、拼接字符串。
+从 gjf/xyz 读入的原子标签（Bq、C(Fragment=1)、ONIOM 标签等）原样保留，输出时照写。
+"""
+import os
+import re
+import numpy as np
+
+from geom_tools.geom_extract import element_number, element_symbol, orientation_rows, coordinate_rows, format_coordinates
+
+_charge_spin_pattern = re.compile(r'^\s*-?\d+\s+\d+')
+_xyz_comment_pattern = re.compile(r'charge\s*=\s*(-?\d+)\s+spin\s*=\s*(\d+)', re.IGNORECASE)
+
+
+def kabsch_rmsd(references, coords):
+    """
+    最优叠合（Kabsch）后的 RMSD。references: (M, N, 3) 或 (N, 3)，coords: (N, 3)。
+    对 M 个参考结构一次性批量计算，返回 (M,) 数组（或标量）。
+    """
+    references = np.asarray(references, dtype=np.float64)
+    coords = np.asarray(coords, dtype=np.float64)
+    single = references.ndim == 2
+    if single:
+        references = references[None]
+
+    a = references - references.mean(axis=1, keepdims=True)
+    b = coords - coords.mean(axis=0)
+    # 协方差矩阵 H = A^T B，形状 (M, 3, 3)
+    h = np.einsum('mni,nj->mij', a, b)
+    u, s, vt = np.linalg.svd(h)
+    # 修正反射：det(U V^T) < 0 时最小奇异值取负
+    d = np.sign(np.linalg.det(u) * np.linalg.det(vt))
+    s[:, -1] *= d
+    e0 = np.einsum('mni,mni->m', a, a) + np.einsum('ni,ni->', b, b)
+    rmsd = np.sqrt(np.maximum(e0 - 2.0 * s.sum(axis=1), 0.0) / len(coords))
+    return rmsd[0] if single else rmsd
+
+
+class Geometry:
+    """
+    numbers: (N,) int 原子序数；coords: (N, 3) float64 坐标（Å）；
+    labels: 输入文件中的原子标签，没有时（log、SMILES）为 None，输出时使用元素符号。
+    迭代时逐行产出 "El x y z"，可直接替代原先的坐标字符串列表。
+    """
+
+    __slots__ = ('numbers', 'coords', 'charge', 'multiplicity', 'labels')
+
+    def __init__(self, numbers, coords, charge=None, multiplicity=None, labels=None):
+        self.numbers = np.asarray(numbers, dtype=np.int64).reshape(-1)
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        if len(self.numbers) != len(self.coords):
+            raise ValueError("numbers and coords have different lengths")
+        self.charge = charge
+        self.multiplicity = multiplicity
+        self.labels = list(labels) if labels is not None else None
+        if self.labels is not None and len(self.labels) != len(self.numbers):
+            raise ValueError("labels and numbers have different lengths")
+
+    # ---------- 解析 ----------
+
+    @classmethod
+    def from_orientation_lines(cls, lines, charge=None, multiplicity=None):
+        """
+        解析 Gaussian log 中 Standard/Input orientation 表格的数据行：
+        Center  Atomic  Atomic_Type  X  Y  Z
+        不完整的行（正在写入的 log）被跳过。
+        """
+        numbers, coords = orientation_rows(lines)
+        return cls(numbers, coords if coords else np.empty((0, 3)), charge, multiplicity)
+
+    @classmethod
+    def from_lines(cls, lines, charge=None, multiplicity=None):
+        """
+        解析 "El x y z" 或 "El flag x y z" 形式的坐标行，保留原子标签。
+        """
+        labels, coords = coordinate_rows(lines)
+        numbers = [element_number(label) for label in labels]
+        return cls(numbers, coords if coords else np.empty((0, 3)), charge, multiplicity, labels)
+
+    @classmethod
+    def from_gjf(cls, path):
+        """
+        从 Gaussian 输入文件（gjf/com）读取电荷、自旋多重度和坐标。
+        """
+        charge = multiplicity = None
+        atom_lines = []
+        with open(path, 'r') as f:
+            reading = False
+            for line in f:
+                # 跳过以 Lp 开头的行
+                if line.startswith("Lp"):
+                    continue
+                if reading:
+                    if not line.strip():
+                        break
+                    atom_lines.append(line)
+                elif _charge_spin_pattern.match(line):
+                    charge_spin = line.split()
+                    charge, multiplicity = int(charge_spin[0]), int(charge_spin[1])
+                    reading = True
+        return cls.from_lines(atom_lines, charge, multiplicity)
+
+    @classmethod
+    def from_xyz(cls, path):
+        """
+        读取 xyz 文件；第二行可以是 "charge spin" 或 "charge=0 spin=1"。
+        """
+        with open(path, 'r') as f:
+            lines = f.readlines()
+        if len(lines) < 3:
+            raise ValueError("Invalid XYZ file format: file too short")
+
+        charge = multiplicity = None
+        comment = lines[1].split()
+        match = _xyz_comment_pattern.search(lines[1])
+        if match:
+            charge, multiplicity = int(match.group(1)), int(match.group(2))
+        elif len(comment) == 2 and _charge_spin_pattern.match(lines[1]):
+            charge, multiplicity = int(comment[0]), int(comment[1])
+
+        atom_lines = [line for line in lines[2:] if len(line.split()) == 4]
+        return cls.from_lines(atom_lines, charge, multiplicity)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        根据扩展名选择 xyz 或 gjf/com 解析。
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.xyz':
+            return cls.from_xyz(path)
+        if ext in ('.gjf', '.com'):
+            return cls.from_gjf(path)
+        raise ValueError(f"Unsupported file format: {ext}")
+
+    # ---------- 属性与数值检查 ----------
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __iter__(self):
+        return iter(self.to_lines())
+
+    def __repr__(self):
+        return f"Geometry(natoms={len(self)}, charge={self.charge}, multiplicity={self.multiplicity})"
+
+    @property
+    def symbols(self):
+        return [element_symbol(number) for number in self.numbers.tolist()]
+
+    def distance_matrix(self):
+        diff = self.coords[:, None, :] - self.coords[None, :, :]
+        return np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+
+    def min_distance(self):
+        """
+        最近原子对的距离，可用于快速检查原子重叠；少于两个原子时返回 inf。
+        """
+        if len(self) < 2:
+            return float('inf')
+        distances = self.distance_matrix()
+        return float(distances[np.triu_indices(len(self), k=1)].min())
+
+    # ---------- 输出 ----------
+
+    def to_lines(self, precision=8):
+        """
+        返回 "El x y z" 形式的坐标行列表；有原子标签时照写标签。
+        """
+        labels = self.labels if self.labels is not None else self.symbols
+        return format_coordinates(labels, self.coords.tolist(), precision)
+
+    def to_gjf_block(self):
+        """
+        Gaussian 输入中的 "电荷 多重度" 行和坐标行。
+        """
+        return f"{self.charge} {self.multiplicity}\n" + "\n".join(self.to_lines()) + "\n"
+
+    def to_xyz(self, comment=None):
+        if comment is None:
+            comment = f"charge={self.charge} spin={self.multiplicity}"
+        return f"{len(self)}\n{comment}\n" + "\n".join(self.to_lines()) + "\n"
+
+    def to_orca_block(self):
+        """
+        ORCA 输入中的 * xyz 坐标块。
+        """
+        return f"* xyz {self.charge} {self.multiplicity}\n" + "\n".join(self.to_lines()) + "\n*\n"
+
+    def write_xyz(self, path, comment=None):
+        with open(path, 'w') as f:
+            f.write(self.to_xyz(comment))
+        return path
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+解析结果缓存：磁盘上的 SQLite 库 + 进程内 LRU。
+
+缓存键为 (文件真实路径, 大小, mtime, 解析器名, 解析器版本)，同一文件同一解析器
+只保留一条记录，文件变化或解析器升级后自动失效。磁盘缓存总大小超过上限时
+按最近访问时间淘汰。缓存目录、上限和开关见 config.py：
+    AUTOTASKER_CACHE_PATH        缓存目录（默认 ~/.tasker）
+    AUTOTASKER_LOG_CACHE_MB      磁盘缓存上限，单位 MB（默认 512）
+    AUTOTASKER_LOG_CACHE=0       关闭缓存
+"""
+import os
+import time
+import pickle
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from config import AUTOTASKER_CACHE_PATH, AUTOTASKER_LOG_CACHE, AUTOTASKER_LOG_CACHE_MB
+from sqlite_store import Schema, open_database, rebuild
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = Schema(
+    version=1,
+    statements=(
+        "CREATE TABLE IF NOT EXISTS entries ("
+        " path TEXT NOT NULL,"
+        " parser TEXT NOT NULL,"
+        " size INTEGER NOT NULL,"
+        " mtime_ns INTEGER NOT NULL,"
+        " version INTEGER NOT NULL,"
+        " nbytes INTEGER NOT NULL,"
+        " atime REAL NOT NULL,"
+        " payload BLOB NOT NULL,"
+        " PRIMARY KEY (path, parser))",
+        "CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime)",
+    ),
+)
+DEFAULT_MAX_BYTES = int(AUTOTASKER_LOG_CACHE_MB * 1024 * 1024)
+DEFAULT_MEMORY_ENTRIES = 64
+
+
+def default_cache_path():
+    return os.path.join(AUTOTASKER_CACHE_PATH, 'log_cache.db')
+
+
+class LogCache:
+    def __init__(self, db_path=None, max_bytes=DEFAULT_MAX_BYTES, memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.db_path = db_path or default_cache_path()
+        self.pid = os.getpid()
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.conn = None
+        try:
+            self.conn = open_database(self.db_path, SCHEMA, 'Log cache', check_same_thread=False)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Log cache {self.db_path} unavailable ({e}), using in-memory cache only.")
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key):
+        path, parser, size, mtime_ns, version = key
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, version, payload FROM entries WHERE path = ? AND parser = ?",
+            (path, parser)).fetchone()
+        if row is None or tuple(row[:3]) != (size, mtime_ns, version):
+            return None
+        self.conn.execute("UPDATE entries SET atime = ? WHERE path = ? AND parser = ?", (time.time(), path, parser))
+        self.conn.commit()
+        return pickle.loads(row[3])
+
+    def _disk_put(self, key, value):
+        path, parser, size, mtime_ns, version = key
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (path, parser, size, mtime_ns, version, nbytes, atime, payload)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, parser, size, mtime_ns, version, len(payload), time.time(), sqlite3.Binary(payload)))
+        self._evict()
+        self.conn.commit()
+
+    def _evict(self):
+        """
+        总大小超过上限时，按最近访问时间从旧到新删除。
+        """
+        total = self.conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute("SELECT path, parser, nbytes FROM entries ORDER BY atime").fetchall()
+        for path, parser, nbytes in rows:
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM entries WHERE path = ? AND parser = ?", (path, parser))
+            total -= nbytes
+
+    def fetch(self, file_path, parser_name, parser_version, parse_fn):
+        """
+        返回 parse_fn(file_path) 的结果，命中缓存时不再读取文件。
+        """
+        real_path = os.path.realpath(file_path)
+        st = os.stat(real_path)
+        key = (real_path, parser_name, st.st_size, st.st_mtime_ns, parser_version)
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+            if self.conn is not None:
+                try:
+                    value = self._disk_get(key)
+                    if value is not None:
+                        self._remember(key, value)
+                        return value
+                except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+                    logger.warning(f"Log cache read failed for {real_path} ({e}), reparsing.")
+
+        value = parse_fn(file_path)
+
+        with self._lock:
+            self._remember(key, value)
+            if self.conn is not None:
+                try:
+                    self._disk_put(key, value)
+                except sqlite3.DatabaseError as e:
+                    logger.warning(f"Log cache {self.db_path} is corrupt ({e}), rebuilding.")
+                    conn, self.conn = self.conn, None
+                    try:
+                        self.conn = rebuild(conn, self.db_path, SCHEMA, check_same_thread=False)
+                    except (sqlite3.Error, OSError):
+                        pass
+                except (sqlite3.Error, pickle.PicklingError) as e:
+                    logger.warning(f"Log cache write failed for {real_path} ({e}).")
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.conn is not None:
+                self.conn.execute("DELETE FROM entries")
+                self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+_default_cache = None
+
+
+def get_log_cache():
+    """
+    返回进程级共享的缓存实例；AUTOTASKER_LOG_CACHE=0 时返回 None。
+    """
+    global _default_cache
+    if not AUTOTASKER_LOG_CACHE:
+        return None
+    # fork 出的子进程不能复用父进程的 SQLite 连接
+    if _default_cache is None or _default_cache.pid != os.getpid():
+        _default_cache = LogCache()
+    return _default_cache
+
+
+def cached_parse(file_path, parser_name, parser_version, parse_fn):
+    cache = get_log_cache()
+    if cache is None:
+        return parse_fn(file_path)
+    return cache.fetch(file_path, parser_name, parser_version, parse_fn)
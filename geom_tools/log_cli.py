@@ -0,0 +1,42 @@
+"""
+gaussian_log.py / orca_log.py 共用的命令行入口。
+
+--status / --charge / --geom 只用 summarize 返回的摘要（纯 Python，不导入 numpy），
+bash 脚本频繁调用时启动开销与原来的 awk 相当；--json 才完整解析并输出全部记录。
+摘要的格式见 gaussian_log.read_final_log_data。
+"""
+import sys
+import json
+import argparse
+
+
+def run_cli(description, file_help, summarize, parse):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('log_file', help=file_help)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--status', action='store_true', help='Print normal/error/running')
+    group.add_argument('--charge', action='store_true', help='Print "charge multiplicity" of the final geometry')
+    group.add_argument('--geom', action='store_true', help='Print the final geometry, one atom per line')
+    group.add_argument('--json', action='store_true', help='Print the full record as JSON')
+    parser.add_argument('--atomic-numbers', action='store_true', help='With --geom, print atomic numbers instead of symbols')
+    args = parser.parse_args()
+
+    if args.json:
+        print(json.dumps(parse(args.log_file).to_dict(), indent=2))
+        return
+
+    summary = summarize(args.log_file)
+    if args.status:
+        print(summary['status'])
+    elif args.charge:
+        if summary['charge'] is None:
+            sys.exit(1)
+        print(f"{summary['charge']} {summary['spin_multiplicity']}")
+    else:
+        if not summary['coords']:
+            sys.exit(1)
+        if args.atomic_numbers:
+            for number, (x, y, z) in zip(summary['numbers'], summary['coords']):
+                print(f"{number} {x:.8f} {y:.8f} {z:.8f}")
+        else:
+            print("\n".join(summary['coordinates']))
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+单次流式读取 ORCA 输出（.out），提取结束状态、最终结构、能量和 TDDFT/SOC 激发态。
+
+命令行用法与 gaussian_log.py 相同（除 --json 外都不需要 numpy）：
+    python -m geom_tools.orca_log name.out --status          # normal / error / running
+    python -m geom_tools.orca_log name.out --charge          # 电荷 自旋多重度
+    python -m geom_tools.orca_log name.out --geom            # 元素符号 x y z
+    python -m geom_tools.orca_log name.out --geom --atomic-numbers
+    python -m geom_tools.orca_log name.out --json
+"""
+import os
+import re
+from dataclasses import dataclass, field, asdict
+from typing import TYPE_CHECKING, List, Optional
+
+from geom_tools.geom_extract import element_number, coordinate_rows, format_coordinates
+from geom_tools.log_cache import cached_parse
+
+if TYPE_CHECKING:
+    from geom_tools.geometry import Geometry
+
+# 解析结果格式变化时递增，使磁盘缓存失效
+PARSER_VERSION = 3
+
+NORMAL_TERMINATION = 'ORCA TERMINATED NORMALLY'
+
+_charge_pattern = re.compile(r'^\s*Total Charge\s+Charge\s+\.+\s+(-?\d+)')
+_multiplicity_pattern = re.compile(r'^\s*Multiplicity\s+Mult\s+\.+\s+(\d+)')
+_input_star_pattern = re.compile(r'^\*\s*(?:xyz|xyzfile|int|gzmt)\s+(-?\d+)\s+(\d+)', re.IGNORECASE)
+_final_energy_pattern = re.compile(r'FINAL SINGLE POINT ENERGY\s+(-?\d+\.\d+)')
+_td_state_pattern = re.compile(
+    r'^\s*STATE\s+(\d+):\s+E=\s*(-?\d+\.\d+)\s+au\s+(-?\d+\.\d+)\s+eV\s+(-?\d+\.\d+)\s+cm\*\*-1')
+_soc_level_pattern = re.compile(r'^\s*(\d+):\s+(-?\d+\.\d+)\s+(-?\d+\.\d+)')
+_error_markers = ('ORCA finished by error termination', 'aborting the run', 'ORCA TERMINATED ABNORMALLY')
+
+
+@dataclass
+class OrcaState:
+    """
+    TDDFT 激发态（未考虑自旋轨道耦合）。
+    """
+    index: int
+    multiplicity: int
+    energy_ev: float
+    energy_cm: float
+    oscillator_strength: Optional[float] = None
+
+
+@dataclass
+class SocState:
+    """
+    自旋轨道耦合矩阵的本征态，0 号为基态。
+    """
+    index: int
+    energy_cm: float
+    energy_ev: float
+    oscillator_strength: Optional[float] = None
+
+
+@dataclass
+class OrcaLog:
+    path: str
+    route: str = ''
+    charge: Optional[int] = None
+    spin_multiplicity: Optional[int] = None
+    geometry: Optional['Geometry'] = None
+    geometry_source: Optional[str] = None  # 'out' 或 'xyz'
+    final_energies: List[float] = field(default_factory=list)
+    optimization_converged: bool = False
+    excited_states: List[OrcaState] = field(default_factory=list)
+    soc_states: List[SocState] = field(default_factory=list)
+    normal_termination: bool = False
+    error_termination: bool = False
+
+    @property
+    def status(self) -> str:
+        if self.normal_termination:
+            return 'normal'
+        if self.error_termination:
+            return 'error'
+        return 'running'
+
+    @property
+    def final_energy(self) -> Optional[float]:
+        return self.final_energies[-1] if self.final_energies else None
+
+    def to_log_data(self) -> dict:
+        """
+        转换为与 GaussianLog.to_log_data 相同的格式，供生成后续任务的输入使用。
+        """
+        from geom_tools.geometry import Geometry
+
+        geometry = None
+        if self.geometry is not None and len(self.geometry):
+            geometry = Geometry(self.geometry.numbers, self.geometry.coords, self.charge, self.spin_multiplicity,
+                                self.geometry.labels)
+        return {
+            'charge': self.charge,
+            'spin_multiplicity': self.spin_multiplicity,
+            'coordinates': geometry.to_lines() if geometry is not None else [],
+            'geometry': geometry,
+            'keywords': self.route,
+        }
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data['geometry'] = None
+        if self.geometry is not None:
+            data['geometry'] = {
+                'symbols': self.geometry.symbols,
+                'coords': self.geometry.coords.tolist(),
+            }
+        data['status'] = self.status
+        return data
+
+
+def _table_row(tokens, soc):
+    """
+    解析吸收光谱表的一行，返回 (终态序号, 振子强度)；不是数据行时返回 None。
+
+    ORCA 5：   "1  33871.4  295.2  0.0123 ..."，SOC 表前面多一列起始态；
+    ORCA 6：   "0-1A  ->  1-1A  4.200  33871.4  295.2  0.0123 ..."
+    """
+    try:
+        if len(tokens) > 6 and tokens[1] == '->':
+            return int(tokens[2].split('-')[0]), float(tokens[6])
+        if soc:
+            return int(tokens[1]), float(tokens[4])
+        return int(tokens[0]), float(tokens[3])
+    except (ValueError, IndexError):
+        return None
+
+
+class _OrcaParser:
+    """
+    逐行喂入的解析状态机。坐标块只保留最后一块的原始行，结束时才转换为 Geometry。
+    """
+
+    def __init__(self, path):
+        self.record = OrcaLog(path=path)
+        self._route_lines = []
+        self._coord_state = None  # None / 'header' / 'rows'
+        self._coord_lines = []
+        self._last_coords = None
+        self.labels = []
+        self.coords = []
+        self._td_multiplicity = None
+        self._soc_levels = False
+        self._spectrum = None  # None / 'tddft' / 'soc'
+        self._spectrum_rows = 0
+
+    def feed(self, line):
+        record = self.record
+        stripped = line.strip()
+
+        # 坐标块：标题后一行分隔线，之后每行 "El x y z"，空行结束
+        if self._coord_state is not None:
+            if self._coord_state == 'header':
+                self._coord_state = 'rows'
+                if stripped.startswith('---'):
+                    return
+            if stripped:
+                self._coord_lines.append(stripped)
+                return
+            self._last_coords = self._coord_lines
+            self._coord_state = None
+            return
+
+        if self._soc_levels:
+            match = _soc_level_pattern.match(line)
+            if match:
+                record.soc_states.append(SocState(int(match.group(1)), float(match.group(2)),
+                                                  float(match.group(3))))
+                return
+            if record.soc_states and not stripped:
+                self._soc_levels = False
+            return
+
+        if self._spectrum is not None:
+            if (not stripped or stripped.startswith('---')) and self._spectrum_rows:
+                self._spectrum = None
+                return
+            row = _table_row(stripped.split(), self._spectrum == 'soc')
+            if row is not None:
+                self._spectrum_rows += 1
+                self._assign_strength(*row)
+            return
+
+        if stripped.startswith('|') and '> ' in stripped:
+            # 输入文件回显："|  1> ! B3LYP def2-SVP Opt"
+            text = stripped.split('> ', 1)[1].strip()
+            if text.startswith('!'):
+                self._route_lines.append(text[1:].strip())
+            elif record.charge is None:
+                match = _input_star_pattern.match(text)
+                if match:
+                    record.charge = int(match.group(1))
+                    record.spin_multiplicity = int(match.group(2))
+            return
+
+        if stripped == 'CARTESIAN COORDINATES (ANGSTROEM)':
+            self._coord_state = 'header'
+            self._coord_lines = []
+        elif stripped.startswith('FINAL SINGLE POINT ENERGY'):
+            match = _final_energy_pattern.search(stripped)
+            if match:
+                record.final_energies.append(float(match.group(1)))
+        elif stripped.startswith('Total Charge'):
+            match = _charge_pattern.match(line)
+            if match:
+                record.charge = int(match.group(1))
+        elif stripped.startswith('Multiplicity'):
+            match = _multiplicity_pattern.match(line)
+            if match:
+                record.spin_multiplicity = int(match.group(1))
+        elif 'EXCITED STATES' in stripped and ('TD-DFT' in stripped or 'CIS' in stripped):
+            # TD 优化中每一步都会重新打印激发态，只保留每种多重度的最后一组
+            multiplicity = 3 if 'TRIPLETS' in stripped else 1
+            record.excited_states = [state for state in record.excited_states if state.multiplicity != multiplicity]
+            self._td_multiplicity = multiplicity
+        elif stripped.startswith('STATE') and self._td_multiplicity is not None:
+            match = _td_state_pattern.match(line)
+            if match:
+                record.excited_states.append(OrcaState(int(match.group(1)), self._td_multiplicity,
+                                                       float(match.group(3)), float(match.group(4))))
+        elif stripped.startswith('Eigenvalues of the SOC matrix'):
+            record.soc_states = []
+            self._soc_levels = True
+        elif 'ABSORPTION SPECTRUM VIA TRANSITION ELECTRIC DIPOLE MOMENTS' in stripped:
+            self._spectrum = 'soc' if 'SOC' in stripped else 'tddft'
+            self._spectrum_rows = 0
+        elif 'THE OPTIMIZATION HAS CONVERGED' in stripped:
+            record.optimization_converged = True
+        elif NORMAL_TERMINATION in stripped:
+            record.normal_termination = True
+        elif any(marker in stripped for marker in _error_markers):
+            record.error_termination = True
+
+    def _assign_strength(self, index, strength):
+        record = self.record
+        if self._spectrum == 'soc':
+            for state in record.soc_states:
+                if state.index == index:
+                    state.oscillator_strength = strength
+                    return
+            return
+        # 电偶极跃迁光谱只包含单重态
+        for state in record.excited_states:
+            if state.index == index and state.multiplicity == 1:
+                state.oscillator_strength = strength
+                return
+
+    def close(self, geometry=True):
+        """
+        结束解析。最后一帧结构的原子标签和坐标保存在 labels / coords（纯 Python），
+        geometry=False 时不构造 Geometry，不导入 numpy。
+        """
+        record = self.record
+        # 文件末尾未写完的坐标块（正在运行的作业）丢弃，保留之前完整的一块
+        self._coord_state = None
+        if self._route_lines:
+            record.route = ' '.join(self._route_lines)
+        if self._last_coords:
+            self.labels, self.coords = coordinate_rows(self._last_coords)
+            record.geometry_source = 'out'
+        else:
+            # 输出中没有坐标块时（如 PrintLevel 较低），使用 ORCA 写出的同名 .xyz
+            xyz_file = f"{os.path.splitext(record.path)[0]}.xyz"
+            if os.path.exists(xyz_file):
+                with open(xyz_file, 'r') as f:
+                    self.labels, self.coords = coordinate_rows(f.readlines()[2:])
+                record.geometry_source = 'xyz'
+        if geometry and self.coords:
+            from geom_tools.geometry import Geometry
+            record.geometry = Geometry([element_number(label) for label in self.labels], self.coords,
+                                       record.charge, record.spin_multiplicity, self.labels)
+        return record
+
+
+def _read_orca_output(out_file_path, geometry=True) -> _OrcaParser:
+    parser = _OrcaParser(out_file_path)
+    with open(out_file_path, 'r', errors='replace') as file:
+        for line in file:
+            parser.feed(line)
+    parser.close(geometry)
+    return parser
+
+
+def parse_orca_output(out_file_path) -> OrcaLog:
+    """
+    单次顺序读取 ORCA 输出文件，返回 OrcaLog。
+    """
+    return _read_orca_output(out_file_path).record
+
+
+def load_orca_output(out_file_path) -> OrcaLog:
+    """
+    通过解析缓存读取 ORCA 输出：同一个（未变化的）文件只会被完整解析一次。
+    """
+    return cached_parse(out_file_path, 'orca_log', PARSER_VERSION, parse_orca_output)
+
+
+def summarize_orca_output(out_file_path) -> dict:
+    """
+    与 gaussian_log.read_final_log_data(path, geometry=False) 格式相同的摘要，不导入 numpy。
+    """
+    parser = _read_orca_output(out_file_path, geometry=False)
+    record = parser.record
+    return {
+        'keywords': record.route,
+        'charge': record.charge,
+        'spin_multiplicity': record.spin_multiplicity,
+        'status': record.status,
+        'numbers': [element_number(label) for label in parser.labels],
+        'labels': parser.labels,
+        'coords': parser.coords,
+        'coordinates': format_coordinates(parser.labels, parser.coords),
+        'geometry': None,
+    }
+
+
+def main():
+    from geom_tools.log_cli import run_cli
+    run_cli('Parse an ORCA output file in a single pass.', 'ORCA .out file',
+            summarize_orca_output, parse_orca_output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+增量跟踪已提交作业的状态。
+
+    1. 从上次读到的字节偏移继续读取 ~/.sub/submit.log，只解析新追加的完整行；
+       文件被截断或替换（inode 变化）时从头读取，已记录的作业保持原状态。
+    2. 作业表保存在 $AUTOTASKER_CACHE_PATH/jobs.db（AUTOTASKER_JOBS_PATH）。
+    3. 只对尚未结束的作业调用一次批量 sacct：
+           sacct -X -n -P -o JobID,State -j id1,id2,...
+       已结束的作业不再查询；连续 SACCT_MISSING_LIMIT 次查询 sacct 都没有返回的作业
+       （已超出 slurmdbd 的保存期限或提交到了别的集群）记为 UNKNOWN，也不再查询。
+
+状态：PENDING / RUNNING / COMPLETED / FAILED / TIMEOUT / OOM / CANCELLED / UNKNOWN，
+后六种为结束状态。task_module.py 通过 job_state() 只读地读取（不调用 sacct，不修改作业库），
+abort/status_parser.py 负责同步和刷新。
+"""
+import os
+import re
+import time
+import sqlite3
+import logging
+import subprocess
+from urllib.parse import quote
+
+from config import AUTOTASKER_JOBS_PATH
+from sqlite_store import Schema, open_database
+
+logger = logging.getLogger(__name__)
+
+# 作业库结构，version 变化时旧库会被自动重建
+SCHEMA = Schema(
+    version=2,
+    statements=(
+        # missed：sacct 连续没有返回该作业的次数
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        " job_id TEXT PRIMARY KEY,"
+        " input TEXT NOT NULL,"
+        " submitted TEXT NOT NULL,"
+        " state TEXT NOT NULL,"
+        " updated REAL NOT NULL,"
+        " missed INTEGER NOT NULL DEFAULT 0)",
+        "CREATE INDEX IF NOT EXISTS jobs_input ON jobs (input)",
+        "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)",
+        # 每个 submit.log 已读到的位置
+        "CREATE TABLE IF NOT EXISTS logs ("
+        " path TEXT PRIMARY KEY,"
+        " inode INTEGER NOT NULL,"
+        " offset INTEGER NOT NULL)",
+    ),
+    check_table='jobs',
+)
+SUBMIT_LOG_PATH = os.path.expanduser('~/.sub/submit.log')
+
+PENDING = 'PENDING'
+RUNNING = 'RUNNING'
+COMPLETED = 'COMPLETED'
+FAILED = 'FAILED'
+TIMEOUT = 'TIMEOUT'
+OOM = 'OOM'
+CANCELLED = 'CANCELLED'
+# sacct 查不到的作业，不知道是否正常结束
+UNKNOWN = 'UNKNOWN'
+FINAL_STATES = (COMPLETED, FAILED, TIMEOUT, OOM, CANCELLED, UNKNOWN)
+# 已结束但没有正常完成、不会再产生输出的作业
+FAILED_STATES = (FAILED, TIMEOUT, OOM, CANCELLED)
+
+# sacct 状态 -> 跟踪状态；未列出的按 PENDING 处理（继续查询）
+SLURM_STATES = {
+    'PENDING': PENDING, 'REQUEUED': PENDING, 'REQUEUE_FED': PENDING, 'REQUEUE_HOLD': PENDING,
+    'RESV_DEL_HOLD': PENDING, 'SPECIAL_EXIT': PENDING,
+    'RUNNING': RUNNING, 'CONFIGURING': RUNNING, 'COMPLETING': RUNNING, 'SUSPENDED': RUNNING,
+    'RESIZING': RUNNING, 'STAGE_OUT': RUNNING, 'SIGNALING': RUNNING, 'STOPPED': RUNNING,
+    'COMPLETED': COMPLETED,
+    'FAILED': FAILED, 'NODE_FAIL': FAILED, 'BOOT_FAIL': FAILED,
+    'TIMEOUT': TIMEOUT, 'DEADLINE': TIMEOUT,
+    'OUT_OF_MEMORY': OOM,
+    'CANCELLED': CANCELLED, 'PREEMPTED': CANCELLED, 'REVOKED': CANCELLED,
+}
+
+# 每次 sacct 查询的作业数上限，避免命令行过长
+SACCT_BATCH = 1000
+# 连续这么多次刷新 sacct 都没有返回的作业记为 UNKNOWN（刚提交的作业可能暂时查不到）
+SACCT_MISSING_LIMIT = 10
+
+_line_pattern = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) - Job (\d+(?:_\d+)?): (.*\.gjf)$')
+# sacct 中尚未展开的作业数组元素："123_[0-5,7%2]"
+_array_range_pattern = re.compile(r'^(\d+)_\[([^\]]+)\]$')
+
+
+def parse_submit_lines(text):
+    """
+    返回 [(作业号, 输入文件, 提交时间)]；作业号为空（提交失败）的行被跳过。
+    """
+    entries = []
+    for line in text.splitlines():
+        match = _line_pattern.match(line)
+        if match:
+            submitted, job_id, input_file = match.groups()
+            entries.append((job_id, input_file, submitted))
+    return entries
+
+
+def _expand_array_range(spec):
+    """
+    "0-3,5%2" -> {0, 1, 2, 3, 5}
+    """
+    indices = set()
+    for part in spec.split('%', 1)[0].split(','):
+        start, _, end = part.partition('-')
+        try:
+            indices.update(range(int(start), int(end or start) + 1))
+        except ValueError:
+            continue
+    return indices
+
+
+def parse_sacct_output(output, job_ids):
+    """
+    解析 "JobID|State" 行，返回 {作业号: 跟踪状态}，只包含 job_ids 中的作业。
+    作业步（123.batch）被忽略，"123_[0-3]" 展开为各元素。
+    """
+    wanted = set(job_ids)
+    states = {}
+    for line in output.splitlines():
+        job_id, _, raw_state = line.strip().partition('|')
+        if not raw_state or '.' in job_id:
+            continue
+        # "CANCELLED by 1234" 只取第一个词
+        state = SLURM_STATES.get(raw_state.split()[0].rstrip('+'), PENDING)
+        match = _array_range_pattern.match(job_id)
+        if match:
+            base = match.group(1)
+            for index in _expand_array_range(match.group(2)):
+                element = f"{base}_{index}"
+                if element in wanted:
+                    states[element] = state
+        elif job_id in wanted:
+            states[job_id] = state
+    return states
+
+
+class JobTracker:
+    """
+    基于 SQLite 的作业状态表。数据库缺失、损坏或版本不符时自动重建
+    （重建后从 submit.log 开头重新读取）。
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or AUTOTASKER_JOBS_PATH
+        self.pid = os.getpid()
+        self.conn = open_database(self.db_path, SCHEMA, 'Job store')
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def sync_log(self, log_file=SUBMIT_LOG_PATH):
+        """
+        读取 submit.log 中新追加的完整行，新作业记为 PENDING。返回新增的作业数。
+        """
+        try:
+            st = os.stat(log_file)
+        except FileNotFoundError:
+            return 0
+        row = self.conn.execute("SELECT inode, offset FROM logs WHERE path = ?", (log_file,)).fetchone()
+        offset = row[1] if row is not None and row[0] == st.st_ino and row[1] <= st.st_size else 0
+        if offset == st.st_size:
+            return 0
+
+        with open(log_file, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # 只处理到最后一个换行符，写了一半的行留到下次
+        end = data.rfind(b'\n') + 1
+        entries = parse_submit_lines(data[:end].decode('utf-8', errors='replace'))
+        now = time.time()
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO jobs (job_id, input, submitted, state, updated) VALUES (?, ?, ?, ?, ?)",
+            [(job_id, input_file, submitted, PENDING, now) for job_id, input_file, submitted in entries],
+        )
+        added = self.conn.total_changes - before
+        self.conn.execute("INSERT OR REPLACE INTO logs (path, inode, offset) VALUES (?, ?, ?)",
+                          (log_file, st.st_ino, offset + end))
+        self.conn.commit()
+        return added
+
+    def active_jobs(self):
+        placeholders = ','.join('?' * len(FINAL_STATES))
+        rows = self.conn.execute(f"SELECT job_id FROM jobs WHERE state NOT IN ({placeholders})", FINAL_STATES)
+        return [row[0] for row in rows]
+
+    def refresh(self, sacct='sacct'):
+        """
+        用批量 sacct 更新所有未结束作业的状态，返回状态发生变化的作业数。
+        sacct 不可用或出错时保持原状态；sacct 正常返回但没有某个作业时累计一次，
+        达到 SACCT_MISSING_LIMIT 次后记为 UNKNOWN。
+        """
+        active = self.active_jobs()
+        changed = {}
+        missing = []
+        for start in range(0, len(active), SACCT_BATCH):
+            chunk = active[start:start + SACCT_BATCH]
+            try:
+                result = subprocess.run([sacct, '-X', '-n', '-P', '-o', 'JobID,State', '-j', ','.join(chunk)],
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            except OSError as e:
+                logger.warning(f"Cannot run sacct: {e}")
+                break
+            if result.returncode != 0:
+                logger.warning(f"sacct failed: {result.stderr.strip()}")
+                break
+            states = parse_sacct_output(result.stdout, chunk)
+            changed.update(states)
+            missing.extend(job_id for job_id in chunk if job_id not in states)
+
+        if not changed and not missing:
+            return 0
+        now = time.time()
+        self.conn.executemany("UPDATE jobs SET missed = 0 WHERE job_id = ? AND missed != 0",
+                              [(job_id,) for job_id in changed])
+        self.conn.executemany("UPDATE jobs SET missed = missed + 1 WHERE job_id = ?",
+                              [(job_id,) for job_id in missing])
+        before = self.conn.total_changes
+        self.conn.executemany("UPDATE jobs SET state = ?, updated = ? WHERE job_id = ? AND state != ?",
+                              [(state, now, job_id, state) for job_id, state in changed.items()])
+        placeholders = ','.join('?' * len(FINAL_STATES))
+        self.conn.execute(f"UPDATE jobs SET state = ?, updated = ? WHERE missed >= ? AND state NOT IN ({placeholders})",
+                          (UNKNOWN, now, SACCT_MISSING_LIMIT, *FINAL_STATES))
+        updated = self.conn.total_changes - before
+        self.conn.commit()
+        return updated
+
+    def update(self, log_file=SUBMIT_LOG_PATH, sacct='sacct'):
+        """
+        同步 submit.log 并刷新状态，返回 (新增作业数, 状态变化的作业数)。
+        """
+        return self.sync_log(log_file), self.refresh(sacct)
+
+    def states(self):
+        """
+        返回 {作业号: (输入文件, 状态)}，按提交顺序。
+        """
+        rows = self.conn.execute("SELECT job_id, input, state FROM jobs ORDER BY rowid")
+        return {job_id: (input_file, state) for job_id, input_file, state in rows}
+
+    def state_of(self, input_file):
+        return _state_of(self.conn, input_file)
+
+
+def _state_of(conn, input_file):
+    """
+    输入文件最近一次提交的作业状态，从未提交时返回 None。
+    """
+    row = conn.execute("SELECT state FROM jobs WHERE input = ? ORDER BY rowid DESC LIMIT 1",
+                       (input_file,)).fetchone()
+    return row[0] if row is not None else None
+
+
+_default_tracker = None
+
+
+def get_job_tracker():
+    """
+    返回进程级共享的作业表。
+    """
+    global _default_tracker
+    if _default_tracker is None or _default_tracker.pid != os.getpid():
+        _default_tracker = JobTracker()
+    return _default_tracker
+
+
+_reader = None
+_reader_pid = None
+
+
+def job_state(input_file):
+    """
+    供任务引擎读取输入文件的作业状态。以只读方式打开作业库：作业库不存在（从未同步过）、
+    损坏或正在重建时返回 None，不创建、不修改也不重建数据库（由 status_parser.py 负责）。
+    """
+    global _reader, _reader_pid
+    if not os.path.exists(AUTOTASKER_JOBS_PATH):
+        return None
+    try:
+        # fork 出的子进程不能复用父进程的 SQLite 连接
+        if _reader is None or _reader_pid != os.getpid():
+            _reader = sqlite3.connect(f"file:{quote(AUTOTASKER_JOBS_PATH)}?mode=ro", uri=True, timeout=30)
+            _reader_pid = os.getpid()
+        return _state_of(_reader, input_file)
+    except sqlite3.Error as e:
+        logger.warning(f"Cannot read job store {AUTOTASKER_JOBS_PATH}: {e}")
+        _reader = None
+        return None
@@ -0,0 +1,94 @@
+import re
+import itertools
+
+# 关键词中的 {a,b,c} 为一个扫描轴
+AXIS_PATTERN = re.compile(r'\{([^}]+)\}')
+SWEEP_MODES = ('product', 'zip')
+
+# 文件名中不能出现的字符
+_unsafe_name_pattern = re.compile(r'[/\s]+')
+
+
+def _name_part(value):
+    return _unsafe_name_pattern.sub('-', value)
+
+
+class KeywordSweep:
+    """
+    关键词扫描：计算关键词中每个 {a,b,c} 组是一个轴。
+
+    mode='product' 时取各轴的笛卡尔积，mode='zip' 时各轴按位置一一对应（长度必须相同）。
+    excludes 中每条规则是一组取值，同时包含这些取值的组合会被跳过。
+    迭代时按需产出 (文件名前缀, 关键词)，不会一次性生成全部组合。
+    前缀由该组合所有轴的取值依次以 _ 连接而成；只有一个轴时与原先的 "{option}_" 相同，
+    没有轴时为空字符串。
+    """
+
+    def __init__(self, keywords, mode='product', excludes=()):
+        if mode not in SWEEP_MODES:
+            raise ValueError(f"Unknown sweep mode '{mode}', expected one of: {', '.join(SWEEP_MODES)}")
+        parts = AXIS_PATTERN.split(keywords)
+        self.literals = parts[0::2]
+        self.axes = [[option.strip() for option in group.split(',')] for group in parts[1::2]]
+        self.mode = mode
+        self.excludes = [frozenset(rule) for rule in excludes if rule]
+
+        if mode == 'zip' and len({len(axis) for axis in self.axes}) > 1:
+            raise ValueError("sweep = zip requires every {...} group to have the same number of options: " +
+                             ", ".join(str(len(axis)) for axis in self.axes))
+
+    @classmethod
+    def from_task(cls, task_info):
+        return cls(task_info['keywords'], task_info.get('sweep', 'product'), task_info.get('exclude', ()))
+
+    def __len__(self):
+        """
+        组合总数（未扣除 exclude 规则跳过的组合）。
+        """
+        if not self.axes:
+            return 1
+        if self.mode == 'zip':
+            return len(self.axes[0])
+        total = 1
+        for axis in self.axes:
+            total *= len(axis)
+        return total
+
+    def combinations(self):
+        if not self.axes:
+            return iter([()])
+        if self.mode == 'zip':
+            return zip(*self.axes)
+        return itertools.product(*self.axes)
+
+    def render(self, values):
+        pieces = [self.literals[0]]
+        for value, literal in zip(values, self.literals[1:]):
+            pieces.append(value)
+            pieces.append(literal)
+        return ''.join(pieces)
+
+    def is_excluded(self, values):
+        return any(rule.issubset(values) for rule in self.excludes)
+
+    def __iter__(self):
+        seen = set()
+        for values in self.combinations():
+            if self.excludes and self.is_excluded(values):
+                continue
+            prefix = ''.join(f"{_name_part(value)}_" for value in values)
+            # 不同组合的取值经过替换后可能得到相同的前缀，加序号避免互相覆盖
+            if prefix in seen:
+                counter = 2
+                while f"{prefix}{counter}_" in seen:
+                    counter += 1
+                prefix = f"{prefix}{counter}_"
+            seen.add(prefix)
+            yield prefix, self.render(values)
+
+
+def parse_exclude_rule(value):
+    """
+    解析 "exclude = b3lyp & def2tzvp" 中的规则，返回取值列表。
+    """
+    return [part.strip() for part in value.split('&') if part.strip()]
@@ -1,186 +1,351 @@
 import os
 import re
-import sys
+import pickle
 import logging
-from typing import Dict, Optional, Tuple
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
-# 获取当前脚本所在目录
-current_dir = os.path.dirname(os.path.abspath(__file__))
-geom_tools_dir = os.path.join(current_dir, 'geom_tools')
-if geom_tools_dir not in sys.path:
-    sys.path.append(geom_tools_dir)
-
-from geom_extract import extract_final_optimized_coordinates_from_log
+from config import AUTOTASKER_CACHE_PATH
+from geom_tools.calc_output import find_source_output, read_log_data
 
 logger = logging.getLogger(__name__)
 
+# 模板中的占位符：[key]
+PLACEHOLDER_PATTERN = re.compile(r'\[(\w+)\]')
+# 由生成器根据来源结构填写的占位符
+BUILTIN_KEYS = ('charge', 'spin', 'xyz_file')
+# 编译结果格式变化时递增，使磁盘缓存失效
+PLAN_CACHE_VERSION = 1
+
+
+def default_plan_cache_path():
+    return os.path.join(AUTOTASKER_CACHE_PATH, 'orca_templates.pkl')
+
+
+@dataclass
+class TemplatePlan:
+    """
+    编译后的模板：把模板正文按占位符切开，渲染时只需按顺序拼接，不再逐行搜索替换。
+    segments 中偶数下标为原文，奇数下标为占位符名。
+    """
+    name: str
+    path: str
+    size: int
+    mtime_ns: int
+    segments: List[str]
+    defaults: Dict[str, str]
+
+    @property
+    def keys(self) -> List[str]:
+        return list(dict.fromkeys(self.segments[1::2]))
+
+    @property
+    def required(self) -> List[str]:
+        """
+        没有默认值、必须在控制行中给出的参数。
+        """
+        return [key for key in self.keys if key not in self.defaults and key not in BUILTIN_KEYS]
+
+    def missing(self, params: Dict) -> List[str]:
+        return [key for key in self.keys if key not in params]
+
+    def render(self, params: Dict) -> str:
+        missing = self.missing(params)
+        if missing:
+            raise ValueError(f"Missing parameters for ORCA template '{self.name}': {', '.join(missing)}")
+        pieces = list(self.segments)
+        pieces[1::2] = [str(params[key]) for key in self.segments[1::2]]
+        return ''.join(pieces)
+
+
+def compile_template(template_path: str, name: Optional[str] = None) -> TemplatePlan:
+    """
+    解析模板文件：-default- 之前为正文，之后为 key=value 形式的默认值。
+    """
+    content = []
+    defaults = {}
+    reading_defaults = False
+    st = os.stat(template_path)
+
+    with open(template_path, 'r') as f:
+        for line in f:
+            if line.strip() == '-default-':
+                reading_defaults = True
+                continue
+
+            if reading_defaults:
+                if '=' in line:
+                    key, value = line.strip().split('=', 1)
+                    defaults[key.strip()] = value.strip()
+            else:
+                content.append(f"{line.rstrip()}\n")
+
+    return TemplatePlan(
+        name=name or os.path.splitext(os.path.basename(template_path))[0],
+        path=template_path,
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        segments=PLACEHOLDER_PATTERN.split(''.join(content)),
+        defaults=defaults,
+    )
+
+
+class TemplatePlanCache:
+    """
+    编译结果的磁盘缓存（pickle），以模板的真实路径为键，大小或 mtime 变化后重新编译。
+    缓存文件损坏或无法写入时只是退化为每次运行重新编译。
+    """
+
+    def __init__(self, cache_path: Optional[str] = None):
+        self.cache_path = cache_path or default_plan_cache_path()
+        self.pid = os.getpid()
+        self.plans: Dict[str, TemplatePlan] = self._read()
+        self.dirty = False
+
+    def _read(self) -> Dict[str, TemplatePlan]:
+        try:
+            with open(self.cache_path, 'rb') as f:
+                version, plans = pickle.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            logger.warning(f"ORCA template cache {self.cache_path} unreadable ({e}), recompiling templates.")
+            return {}
+        if version != PLAN_CACHE_VERSION or not isinstance(plans, dict):
+            return {}
+        return plans
+
+    def get(self, template_path: str, name: Optional[str] = None) -> TemplatePlan:
+        real_path = os.path.realpath(template_path)
+        st = os.stat(real_path)
+        plan = self.plans.get(real_path)
+        if plan is not None and (plan.size, plan.mtime_ns) == (st.st_size, st.st_mtime_ns):
+            return plan
+        plan = compile_template(real_path, name)
+        self.plans[real_path] = plan
+        self.dirty = True
+        return plan
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        cache_dir = os.path.dirname(self.cache_path) or '.'
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.orca_templates.')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump((PLAN_CACHE_VERSION, self.plans), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.cache_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self.dirty = False
+        except OSError as e:
+            logger.warning(f"ORCA template cache write failed ({e}).")
+
+
+_default_plan_cache = None
+
+
+def get_plan_cache() -> TemplatePlanCache:
+    """
+    返回进程级共享的模板编译缓存。
+    """
+    global _default_plan_cache
+    if _default_plan_cache is None or _default_plan_cache.pid != os.getpid():
+        _default_plan_cache = TemplatePlanCache()
+    return _default_plan_cache
+
+
 class OrcaInputGenerator:
-    def __init__(self, templates_dir: str):
+    def __init__(self, templates_dir: str, plan_cache: Optional[TemplatePlanCache] = None):
         """
         初始化 ORCA 输入文件生成器
-        
+
         Args:
             templates_dir: ORCA 模板文件所在目录
+            plan_cache: 模板编译缓存，默认使用进程级共享的缓存
         """
         self.templates_dir = templates_dir
-        self.templates_cache: Dict[str, Dict] = {}  # 缓存已加载的模板
-        
-    def _load_template(self, template_name: str) -> Dict:
+        self.plan_cache = plan_cache or get_plan_cache()
+        self.templates_cache: Dict[str, TemplatePlan] = {}  # 本实例已加载的模板
+        self._original_names: Dict[str, str] = {}  # 任务目录 -> 原始文件名
+
+    def _load_template(self, template_name: str) -> TemplatePlan:
         """
-        加载并解析模板文件
-        
+        加载编译后的模板
+
         Returns:
-            Dict 包含模板内容和默认值
+            TemplatePlan 包含切分后的模板正文和默认值
         """
+        plan = self.templates_cache.get(template_name)
+        if plan is not None:
+            return plan
         template_path = os.path.join(self.templates_dir, f"{template_name}.inp")
         if not os.path.exists(template_path):
             raise FileNotFoundError(f"Template file not found: {template_path}")
-            
-        template_content = []
-        defaults = {}
-        reading_defaults = False
-        
-        with open(template_path, 'r') as f:
-            for line in f:
-                if line.strip() == '-default-':
-                    reading_defaults = True
-                    continue
-                    
-                if reading_defaults:
-                    if '=' in line:
-                        key, value = line.strip().split('=', 1)
-                        defaults[key.strip()] = value.strip()
-                else:
-                    template_content.append(line.rstrip())
-        
-        return {
-            'content': template_content,
-            'defaults': defaults
-        }
-    
+        plan = self.plan_cache.get(template_path, template_name)
+        self.templates_cache[template_name] = plan
+        return plan
+
     def _parse_control_line(self, control_line: str) -> Dict:
         """
         解析模板控制行
-        
+
         Args:
             control_line: 以 # 开头的控制行
-            
+
         Returns:
             Dict 包含解析后的参数
         """
         params = {}
         # 移除开头的 #
         control_line = control_line.lstrip('#').strip()
-        
+
         # 使用正则表达式匹配 key=value 对
         for match in re.finditer(r'(\w+)=([^\s]+)', control_line):
             key, value = match.groups()
             params[key] = value
-            
+
         return params
-    
+
+    def _parse_orca_block(self, task_info: Dict) -> Tuple[str, Dict]:
+        """
+        解析 ORCA 块内容
+
+        Returns:
+            Tuple[str, Dict]: (源任务名, 控制行参数)
+        """
+        source_task = None
+        control_params = {}
+
+        for line in task_info['orca_block'].split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+
+            if line.startswith('%'):
+                # 提取源任务名
+                source_task = line.lstrip('%').strip()
+            elif line.startswith('#'):
+                # 解析控制行
+                control_params = self._parse_control_line(line)
+
+        if not source_task:
+            raise ValueError("Source task not specified in ORCA block")
+        if 'job' not in control_params:
+            raise ValueError("Job type not specified in control line")
+        return source_task, control_params
+
+    def _original_file_name(self, task_dir: str) -> str:
+        """
+        原始文件名（.task 文件名去掉扩展名），每个任务目录只列一次目录
+        """
+        name = self._original_names.get(task_dir)
+        if name is None:
+            task_files = [f for f in os.listdir(task_dir) if f.endswith('.task')]
+            if not task_files:
+                raise ValueError(f"No task file found in {task_dir}")
+            name = os.path.splitext(task_files[0])[0]
+            self._original_names[task_dir] = name
+        return name
+
     def _convert_log_to_xyz(self, log_file: str, output_dir: str) -> Tuple[str, int, int]:
         """
-        将 Gaussian log 文件转换为 xyz 格式
-        
+        将来源任务的 Gaussian log 或 ORCA 输出转换为 xyz 格式
+
         Returns:
             Tuple[str, int, int]: (xyz文件路径, 电荷, 自旋多重度)
         """
         # 提取几何信息
-        log_data = extract_final_optimized_coordinates_from_log(log_file)
-        if not log_data['coordinates']:
+        geometry = read_log_data(log_file)['geometry']
+        if geometry is None or not len(geometry):
             raise ValueError(f"Failed to extract coordinates from {log_file}")
-            
+
         # 构建 xyz 文件路径
-        xyz_file = os.path.join(output_dir, 
+        xyz_file = os.path.join(output_dir,
                                f"{os.path.splitext(os.path.basename(log_file))[0]}.xyz")
-        
-        # 写入 xyz 文件
-        with open(xyz_file, 'w') as f:
-            # 第一行：原子数
-            f.write(f"{len(log_data['coordinates'])}\n")
-            # 第二行：注释（这里用电荷和自旋）
-            f.write(f"charge={log_data['charge']} spin={log_data['spin_multiplicity']}\n")
-            # 坐标
-            for coord in log_data['coordinates']:
-                f.write(f"{coord}\n")
-                
-        return xyz_file, log_data['charge'], log_data['spin_multiplicity']
-    
-    def generate_input(self, task_info: Dict, task_dir: str, output_dir: str) -> None:
+
+        # 写入 xyz 文件，注释行为电荷和自旋
+        geometry.write_xyz(xyz_file)
+
+        return xyz_file, geometry.charge, geometry.multiplicity
+
+    def _plan_job(self, task_info: Dict, task_dir: str, output_dir: str,
+                  original_file_name: Optional[str] = None) -> Dict:
         """
-        生成 ORCA 输入文件
+        解析控制行、加载模板并检查参数和来源输出，不写任何文件
         """
-        try:
+        source_task, control_params = self._parse_orca_block(task_info)
+        plan = self._load_template(control_params['job'])
+
+        # 准备参数替换：默认值 < 控制行；电荷、自旋和 xyz 文件名稍后由来源结构填写
+        params = plan.defaults.copy()
+        params.update(control_params)
+        missing = [key for key in plan.missing(params) if key not in BUILTIN_KEYS]
+        if missing:
+            raise ValueError(f"Missing parameters for ORCA template '{plan.name}' in task "
+                             f"'{task_info['job_title']}': {', '.join(missing)}")
+
+        if original_file_name is None:
+            original_file_name = self._original_file_name(task_dir)
+        # 获取源任务的输出文件（Gaussian .log 或 ORCA .out）
+        source_log = find_source_output(task_dir, source_task, original_file_name)
+        if not os.path.exists(source_log):
+            raise FileNotFoundError(f"Source log file not found: {source_log}")
+
+        return {
+            'plan': plan,
+            'params': params,
+            'source_log': source_log,
+            'output_dir': output_dir,
+            'output_inp': os.path.join(output_dir, f"{task_info['job_title']}.inp"),
+        }
+
+    def render_many(self, jobs: List[Tuple]) -> List[str]:
+        """
+        批量生成 ORCA 输入文件
+
+        Args:
+            jobs: [(task_info, task_dir, output_dir[, original_file_name])]
+
+        Returns:
+            List[str]: 生成的 .inp 文件路径
+
+        先检查所有任务的模板参数和来源输出，有任何问题时不写入任何文件。
+        """
+        planned = [self._plan_job(*job) for job in jobs]
+        outputs = []
+        for job in planned:
             # 确保输出目录存在
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # 解析 ORCA 块内容
-            orca_lines = task_info['orca_block'].split('\n')
-            source_task = None
-            control_params = {}
-            
-            for line in orca_lines:
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                if line.startswith('%'):
-                    # 提取源任务名
-                    source_task = line.lstrip('%').strip()
-                elif line.startswith('#'):
-                    # 解析控制行
-                    control_params = self._parse_control_line(line)
-            
-            if not source_task:
-                raise ValueError("Source task not specified in ORCA block")
-            if 'job' not in control_params:
-                raise ValueError("Job type not specified in control line")
-                
-            # 加载模板
-            template_name = control_params['job']
-            if template_name not in self.templates_cache:
-                self.templates_cache[template_name] = self._load_template(template_name)
-            template = self.templates_cache[template_name]
-            
-            # 获取原始文件名（不包含路径和扩展名）
-            task_files = [f for f in os.listdir(task_dir) if f.endswith('.task')]
-            if not task_files:
-                raise ValueError(f"No task file found in {task_dir}")
-            original_file_name = os.path.splitext(task_files[0])[0]
-            
-            # 获取源任务的 log 文件，使用正确的命名格式
-            source_log = os.path.join(
-                task_dir, 
-                source_task, 
-                f"{source_task}_{original_file_name}.log"
-            )
-            
-            if not os.path.exists(source_log):
-                raise FileNotFoundError(f"Source log file not found: {source_log}")
-                
+            os.makedirs(job['output_dir'], exist_ok=True)
+
             # 转换为 xyz 格式
-            xyz_file, charge, spin = self._convert_log_to_xyz(source_log, output_dir)
-            
-            # 准备参数替换
-            params = template['defaults'].copy()
-            params.update(control_params)
+            xyz_file, charge, spin = self._convert_log_to_xyz(job['source_log'], job['output_dir'])
+            params = job['params']
             params['xyz_file'] = os.path.basename(xyz_file)
-            
+            params.setdefault('charge', charge)
+            params.setdefault('spin', spin)
+
             # 生成输入文件
-            output_inp = os.path.join(output_dir, f"{task_info['job_title']}.inp")
-            with open(output_inp, 'w') as f:
-                for line in template['content']:
-                    # 替换所有占位符
-                    for key, value in params.items():
-                        line = line.replace(f"[{key}]", value)
-                    # 替换电荷和自旋
-                    line = line.replace("[charge]", str(charge))
-                    line = line.replace("[spin]", str(spin))
-                    f.write(f"{line}\n")
-            
-            logger.info(f"Generated ORCA input file: {output_inp}")
-            
+            with open(job['output_inp'], 'w') as f:
+                f.write(job['plan'].render(params))
+            logger.info(f"Generated ORCA input file: {job['output_inp']}")
+            outputs.append(job['output_inp'])
+
+        self.plan_cache.save()
+        return outputs
+
+    def generate_input(self, task_info: Dict, task_dir: str, output_dir: str,
+                       original_file_name: Optional[str] = None) -> str:
+        """
+        生成 ORCA 输入文件
+        """
+        try:
+            return self.render_many([(task_info, task_dir, output_dir, original_file_name)])[0]
         except Exception as e:
             logger.error(f"Error generating ORCA input: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
@@ -0,0 +1,220 @@
+"""
+根据分子大小和计算方法估算 Gaussian 作业的资源：核数、内存和时限。
+
+规则按顺序匹配，第一条满足所有条件的规则生效；条件都可省略：
+    min_atoms / max_atoms   原子数范围（含端点）
+    basis                   基组类别列表：minimal / dz / tz / qz / custom / unknown
+    jobs                    作业类型列表：opt / freq / td / scrf / sp，包含其中任一类型即匹配
+资源字段：
+    cores                   %nprocshared，同时作为 SLURM --ntasks
+    mem                     Gaussian %mem（如 "16GB"）；SLURM 申请的内存再加 MEM_OVERHEAD 的余量
+    time                    SLURM 时限（如 "24:00:00"），可省略
+
+AUTOTASKER_RESOURCE_RULES 指向 JSON 文件（规则列表，或 {"rules": [...]}）时替换内置规则；
+没有规则匹配时使用最后一条内置规则（与原先固定的 32 核相同）。
+时限不是 Link 0 命令，以注释行 "! walltime=..." 写在 gjf 开头，由 slurm_submit.py 读取。
+"""
+import os
+import re
+import json
+import math
+import logging
+from functools import lru_cache
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from config import AUTOTASKER_RESOURCE_RULES
+from checkpoint_chain import route_basis, route_option
+
+logger = logging.getLogger(__name__)
+
+# SLURM 申请的内存 = %mem × MEM_OVERHEAD，Gaussian 实际占用会略高于 %mem
+MEM_OVERHEAD = 1.2
+JOB_TYPES = ('opt', 'freq', 'td', 'scrf')
+BASIS_FAMILIES = ('minimal', 'dz', 'tz', 'qz', 'custom', 'unknown')
+
+DEFAULT_RULES = [
+    {'max_atoms': 12, 'jobs': ['td', 'freq'], 'cores': 8, 'mem': '16GB', 'time': '24:00:00'},
+    {'max_atoms': 12, 'cores': 4, 'mem': '8GB', 'time': '12:00:00'},
+    {'max_atoms': 40, 'basis': ['minimal', 'dz'], 'jobs': ['td', 'freq'], 'cores': 16, 'mem': '40GB',
+     'time': '72:00:00'},
+    {'max_atoms': 40, 'basis': ['minimal', 'dz'], 'cores': 16, 'mem': '32GB', 'time': '48:00:00'},
+    {'cores': 32, 'mem': '80GB'},
+]
+
+_walltime_pattern = re.compile(r'^!\s*walltime\s*=\s*(\S+)', re.IGNORECASE)
+_mem_pattern = re.compile(r'^(\d+(?:\.\d+)?)\s*([kmg]?[bw])?$', re.IGNORECASE)
+_mem_units_mb = {'kb': 1 / 1024, 'mb': 1, 'gb': 1024, 'kw': 8 / 1024, 'mw': 8, 'gw': 8 * 1024, 'b': 1 / 1024 ** 2,
+                 'w': 8 / 1024 ** 2}
+# 基组名 -> 类别，按顺序匹配
+_basis_families = [
+    ('custom', re.compile(r'^gen(ecp)?$')),
+    ('minimal', re.compile(r'^(sto-3g|3-21g|minix)')),
+    ('qz', re.compile(r'qz|pv5z')),
+    ('tz', re.compile(r'tz|6-311')),
+    ('dz', re.compile(r'dz|sv|6-31|d95|lanl2')),
+]
+
+
+def mem_to_mb(mem: str) -> float:
+    """
+    Gaussian 内存写法（"16GB"、"800MW"、不带单位时为字）换算为 MB。
+    """
+    match = _mem_pattern.match(mem.strip())
+    if not match:
+        raise ValueError(f"Invalid memory size: {mem}")
+    return float(match.group(1)) * _mem_units_mb[(match.group(2) or 'w').lower()]
+
+
+@dataclass
+class Resources:
+    cores: int
+    mem: Optional[str]
+    time: Optional[str] = None
+
+    @property
+    def slurm_mem(self) -> str:
+        return f"{math.ceil(mem_to_mb(self.mem) * MEM_OVERHEAD)}M"
+
+    def header_lines(self) -> List[str]:
+        """
+        写在 gjf 开头的行：时限注释和 Link 0 命令。
+        """
+        lines = [f"! walltime={self.time}"] if self.time else []
+        lines.append(f"%nprocshared={self.cores}")
+        return lines + [f"%mem={self.mem}"] if self.mem else lines
+
+    def slurm(self) -> Dict[str, str]:
+        """
+        SLURM 资源；没有 %mem 时不含 mem，由提交脚本使用默认值。
+        """
+        resources = {'ntasks': str(self.cores)}
+        if self.mem:
+            resources['mem'] = self.slurm_mem
+        if self.time:
+            resources['time'] = self.time
+        return resources
+
+
+def basis_family(route: str) -> str:
+    basis = route_basis(route)
+    if basis is None:
+        return 'unknown'
+    for family, pattern in _basis_families:
+        if pattern.search(basis):
+            return family
+    return 'unknown'
+
+
+def job_types(route: str) -> List[str]:
+    types = [name for name in JOB_TYPES if route_option(route, name) is not None]
+    return types or ['sp']
+
+
+# 相对代价估计：各作业类型的权重相加（都没有时为 sp），scrf 再乘系数；按基组类别缩放
+_job_weights = {'opt': 5.0, 'freq': 4.0, 'td': 3.0}
+_scrf_factor = 1.3
+_basis_factors = {'minimal': 0.3, 'dz': 1.0, 'tz': 3.0, 'qz': 10.0, 'custom': 2.0, 'unknown': 1.0}
+
+
+@lru_cache(maxsize=4096)
+def route_weight(route: str) -> float:
+    """
+    关键词行的代价系数；同一批输入的关键词行大量重复，按关键词行缓存。
+    """
+    types = job_types(route)
+    weight = sum(_job_weights.get(name, 0.0) for name in types) or 1.0
+    if 'scrf' in types:
+        weight *= _scrf_factor
+    return weight * _basis_factors[basis_family(route)]
+
+
+def estimate_cost(natoms: int, route: str) -> float:
+    """
+    作业的相对计算代价（无量纲），按原子数三次方估算，只用于比较先后。
+    """
+    return max(natoms, 1) ** 3 / 1000 * route_weight(route)
+
+
+def validate_rules(rules) -> List[Dict]:
+    if isinstance(rules, dict):
+        rules = rules.get('rules')
+    if not isinstance(rules, list) or not rules:
+        raise ValueError("resource rules must be a non-empty list")
+    for index, rule in enumerate(rules):
+        if not isinstance(rule, dict) or 'cores' not in rule or 'mem' not in rule:
+            raise ValueError(f"resource rule {index} must give cores and mem")
+        unknown = [family for family in rule.get('basis', ()) if family not in BASIS_FAMILIES]
+        if unknown:
+            raise ValueError(f"resource rule {index}: unknown basis families {', '.join(unknown)}")
+        mem_to_mb(rule['mem'])
+        int(rule['cores'])
+    return rules
+
+
+_rules_cache = {}
+
+
+def load_rules(path: Optional[str] = None) -> List[Dict]:
+    """
+    读取规则文件，按路径和 mtime 缓存；未设置时使用内置规则。
+    """
+    path = AUTOTASKER_RESOURCE_RULES if path is None else path
+    if not path:
+        return DEFAULT_RULES
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _rules_cache.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    with open(path, 'r') as f:
+        rules = validate_rules(json.load(f))
+    _rules_cache[path] = (mtime_ns, rules)
+    return rules
+
+
+def match_rule(rules: List[Dict], natoms: int, family: str, types: List[str]) -> Dict:
+    for rule in rules:
+        if natoms < rule.get('min_atoms', 0) or natoms > rule.get('max_atoms', natoms):
+            continue
+        if 'basis' in rule and family not in rule['basis']:
+            continue
+        if 'jobs' in rule and not set(rule['jobs']).intersection(types):
+            continue
+        return rule
+    return DEFAULT_RULES[-1]
+
+
+def size_job(natoms: int, route: str, rules: Optional[List[Dict]] = None) -> Resources:
+    """
+    按原子数、基组类别和作业类型选择资源。
+    """
+    rule = match_rule(rules if rules is not None else load_rules(), natoms, basis_family(route), job_types(route))
+    return Resources(int(rule['cores']), rule['mem'], rule.get('time'))
+
+
+def read_input_resources(input_file: str) -> Optional[Resources]:
+    """
+    从 gjf 开头（关键词行之前）读取 %nprocshared、%mem 和时限注释；没有 %nprocshared 时返回 None，
+    没有 %mem 时 mem 为 None。
+    """
+    cores = None
+    mem = None
+    walltime = None
+    with open(input_file, 'r', errors='replace') as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped.startswith('#'):
+                break
+            key, _, value = stripped.partition('=')
+            key = key.lower()
+            if key in ('%nprocshared', '%nproc'):
+                cores = int(value)
+            elif key == '%mem':
+                mem = value.strip()
+            else:
+                match = _walltime_pattern.match(stripped)
+                if match:
+                    walltime = match.group(1)
+    if cores is None:
+        return None
+    return Resources(cores, mem, walltime)
@@ -35,41 +35,9 @@ fi
 # 创建临时文件
 temp_coord_file=$(mktemp)
 
-# 提取最后一个Standard orientation的坐标
-awk '
-/Standard orientation:/ {
-    delete coords
-    count = 0
-    for(i=1; i<=4; i++) getline
-    while(getline && !/-{10,}/) {
-        count++
-        coords[count] = $2 " " $4 " " $5 " " $6
-    }
-}
-END {
-    if (count > 0) {
-        for(i=1; i<=count; i++) print coords[i]
-    }
-}' "$log_file" > "$temp_coord_file"
-
-# 如果没有找到Standard orientation，尝试Input orientation
-if [ ! -s "$temp_coord_file" ]; then
-    awk '
-    /Input orientation:/ {
-        delete coords
-        count = 0
-        for(i=1; i<=4; i++) getline
-        while(getline && !/-{10,}/) {
-            count++
-            coords[count] = $2 " " $4 " " $5 " " $6
-        }
-    }
-    END {
-        if (count > 0) {
-            for(i=1; i<=count; i++) print coords[i]
-        }
-    }' "$log_file" > "$temp_coord_file"
-fi
+# 提取最后一帧坐标（原子序数 x y z），优先 Standard orientation，没有时使用 Input orientation
+GEOM_TOOLS_DIR="${AUTOTASKER_GEOMTOOLS_PATH:-$(dirname $SCRIPT_DIR)/geom_tools}"
+PYTHONPATH="$(dirname "$GEOM_TOOLS_DIR")${PYTHONPATH:+:$PYTHONPATH}" python3 -m geom_tools.gaussian_log "$log_file" --geom --atomic-numbers > "$temp_coord_file"
 
 # 确定输出文件名
 if [ -f "$target_dir/geom" ]; then
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+把计算目录下尚未运行的 gjf 提交到 SLURM，代替 slurms.sh 中的 find/grep 循环。
+
+每轮：
+    1. 遍历提交目录，找出没有同名 .log 的 .gjf（跳过 template.gjf）。目录清单缓存在
+       扫描状态库中，目录 mtime 不变时不再列目录，只 stat 一次。
+    2. 调用一次 squeue 得到当前用户所有作业名，已在队列中的输入文件不再提交。
+    3. 按依赖图的关键路径和项目轮转排序（见 submit_priority.py；AUTOTASKER_SUBMIT_ORDER=path
+       时按路径排序），--dry-run 时列出提交顺序和各项目的预计完成先后。
+    4. 一次性提交到目标队列深度（AUTOTASKER_QUEUE_DEPTH，默认 20），不再逐个 sleep。
+       AUTOTASKER_ARRAY_SIZE 大于 1 时，资源需求相同的输入最多这么多个打包成一个作业数组，
+       一个数组只占一个队列名额。
+提交记录追加到 ~/.sub/submit.log，格式与 slurms.sh 相同，作业数组的每个元素一行：
+    2026-10-18 12:00:00 - Job 12345: /path/to/input.gjf
+    2026-10-18 12:00:00 - Job 12346_0: /path/to/other.gjf
+
+作业数组的清单（第 N+1 行为第 N 个元素的输入文件）、各元素 comd 的副本和输出
+都在 ~/.sub/arrays 下。
+
+用法：
+    python slurm_submit.py [--root DIR] [--depth N] [--array-size N] [--order priority|path] [--dry-run]
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import getpass
+import logging
+import argparse
+import subprocess
+
+from config import (AUTOTASKER_SUBMIT_PATH, AUTOTASKER_QUEUE_DEPTH, AUTOTASKER_ARRAY_SIZE, AUTOTASKER_SUBMIT_ORDER,
+                    AUTOTASKER_STATE_PATH)
+from task_state import open_state_store
+from resource_policy import read_input_resources
+from submit_priority import prioritize, expected_completion
+
+logger = logging.getLogger(__name__)
+
+SUBMIT_LOG_PATH = os.path.expanduser('~/.sub/submit.log')
+LOG_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+ARRAYS_DIR = os.path.expanduser('~/.sub/arrays')
+ARRAY_NAME_PREFIX = 'tasker_array_'
+# 不在队列中的作业数组的清单、comd 副本和输出保留的时间
+ARRAY_FILE_TTL = 30 * 24 * 3600
+
+# gjf 中没有 %nprocshared（或 %mem）时申请的资源，与原 slurms.sh 相同
+DEFAULT_RESOURCES = {'ntasks': '32', 'mem': '100000M'}
+
+JOB_SCRIPT = """#!/bin/bash
+#SBATCH -J {name}
+{directives}#SBATCH -p {partition}
+source {home}/apprepo/gaussian/16-hy/scripts/env.sh  # 确保这条路径是正确的
+export PGI_FASTMATH_CPU=sandybridge
+g16 "{input_file}" > "{log_file}"
+"""
+
+ARRAY_SCRIPT = """#!/bin/bash
+#SBATCH -J {name}
+#SBATCH --array=0-{last}
+{directives}#SBATCH -p {partition}
+#SBATCH -o {arrays_dir}/%A_%a.out
+source {home}/apprepo/gaussian/16-hy/scripts/env.sh  # 确保这条路径是正确的
+export PGI_FASTMATH_CPU=sandybridge
+input_file=$(sed -n "$((SLURM_ARRAY_TASK_ID + 1))p" "{manifest}")
+cd "$(dirname "$input_file")" || exit 1
+g16 "$input_file" > "${{input_file%.gjf}}.log"
+# 提交时该输入文件所在目录 comd 文件的副本
+comd_file="{arrays_dir}/{name}_${{SLURM_ARRAY_TASK_ID}}.comd"
+if [ -f "$comd_file" ]; then
+    source "$comd_file"
+fi
+"""
+
+# mtime 在这段时间内的目录不写入缓存：粗粒度 mtime 的文件系统上，同一时刻之后的修改可能不改变 mtime
+RACY_WINDOW_NS = 2 * 10**9
+
+_chk_pattern = re.compile(r'%chk=.*')
+_job_id_pattern = re.compile(r'Submitted batch job (\S+)')
+
+
+def _scan_directory(path):
+    """
+    列出一个目录：返回清单 {'dirs': [子目录名], 'pending': [没有 .log 的 .gjf 名]}。
+    """
+    dirs = []
+    gjfs = []
+    logs = set()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            name = entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(name)
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+            except OSError:
+                continue
+            if name.endswith('.gjf'):
+                gjfs.append(name)
+            elif name.endswith('.log'):
+                logs.add(name)
+    pending = [name for name in gjfs
+               if name != 'template.gjf' and f"{name[:-4]}.log" not in logs]
+    return {'dirs': sorted(dirs), 'pending': sorted(pending)}
+
+
+def find_pending_inputs(root, store=None):
+    """
+    返回 root 下所有待提交的 .gjf 路径（排序后）。
+
+    store 为 TaskStateStore 时复用其中的目录清单：目录 mtime 未变的直接使用缓存，
+    变化的重新列目录，最后一次性写回。
+    """
+    cached = store.load_listings() if store is not None else {}
+    changed = {}
+    racy_after = time.time_ns() - RACY_WINDOW_NS
+    visited = set()
+    pending = []
+
+    stack = [os.path.abspath(root)]
+    while stack:
+        path = stack.pop()
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        visited.add(path)
+
+        entry = cached.get(path)
+        if entry is not None and entry[0] == mtime_ns:
+            listing = entry[1]
+        else:
+            try:
+                listing = _scan_directory(path)
+            except OSError as e:
+                logger.warning(f"Cannot list {path}: {e}")
+                continue
+            if mtime_ns < racy_after:
+                changed[path] = (mtime_ns, listing)
+
+        pending.extend(os.path.join(path, name) for name in listing['pending'])
+        stack.extend(os.path.join(path, name) for name in listing['dirs'])
+
+    if store is not None:
+        store.save_listings(changed, [path for path in cached if path not in visited])
+    return sorted(pending)
+
+
+def queued_jobs(user=None):
+    """
+    一次 squeue 调用，返回当前用户所有作业的 [(作业数组号, 作业名)]。
+    %F 对普通作业为作业号，对作业数组的各元素为同一个数组作业号。
+    """
+    user = user or getpass.getuser()
+    output = subprocess.run(['squeue', '-u', user, '-h', '-o', '%F|%j'],
+                            stdout=subprocess.PIPE, text=True, check=True).stdout
+    jobs = []
+    for line in output.splitlines():
+        job_id, _, name = line.strip().partition('|')
+        if job_id:
+            jobs.append((job_id, name))
+    return jobs
+
+
+def default_partition():
+    """
+    sinfo 列出的第一个分区；默认分区名后的 * 去掉。
+    """
+    output = subprocess.run(['sinfo', '-h', '-o', '%P'], stdout=subprocess.PIPE, text=True, check=True).stdout
+    for line in output.splitlines():
+        if line.strip():
+            return line.strip().rstrip('*')
+    return None
+
+
+def rewrite_chk_path(input_file):
+    """
+    把 gjf 中的 %chk= 改为与输入文件同目录、同名的 .chk（不影响 %oldchk=）。
+    """
+    with open(input_file, 'r') as f:
+        content = f.read()
+    if '%chk' not in content:
+        return
+    chk_file = f"{os.path.splitext(input_file)[0]}.chk"
+    updated = _chk_pattern.sub(lambda match: f"%chk={chk_file}", content)
+    if updated != content:
+        with open(input_file, 'w') as f:
+            f.write(updated)
+
+
+def job_resources(input_file):
+    """
+    输入文件申请的资源，取自 gjf 开头的 %nprocshared、%mem 和时限注释（见 resource_policy.py）；
+    资源相同的输入文件才能打包进同一个作业数组。
+    """
+    try:
+        resources = read_input_resources(input_file)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Cannot read resources from {input_file} ({e}), using the defaults.")
+        resources = None
+    return dict(DEFAULT_RESOURCES, **resources.slurm()) if resources is not None else dict(DEFAULT_RESOURCES)
+
+
+def resource_directives(resources):
+    """
+    资源对应的 #SBATCH 行。
+    """
+    lines = [f"#SBATCH --ntasks={resources['ntasks']}", "#SBATCH -N 1", f"#SBATCH --mem={resources['mem']}"]
+    if resources.get('time'):
+        lines.append(f"#SBATCH -t {resources['time']}")
+    return ''.join(f"{line}\n" for line in lines)
+
+
+def build_job_script(input_file, partition, resources=None):
+    """
+    生成作业脚本内容；输入文件所在目录有 comd 文件时把其内容追加到末尾。
+    """
+    base = os.path.splitext(input_file)[0]
+    resources = resources or job_resources(input_file)
+    script = JOB_SCRIPT.format(name=os.path.basename(base), partition=partition, home=os.path.expanduser('~'),
+                               input_file=input_file, log_file=f"{base}.log",
+                               directives=resource_directives(resources))
+    comd_file = os.path.join(os.path.dirname(input_file), 'comd')
+    if os.path.isfile(comd_file):
+        with open(comd_file, 'r') as f:
+            script += "\n# Commands from comd file\n" + f.read()
+    return script
+
+
+def _sbatch(job_script, cwd, description):
+    """
+    提交作业脚本（提交后删除），返回作业号；sbatch 失败时返回 None。
+    """
+    try:
+        result = subprocess.run(['sbatch', job_script], cwd=cwd,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    finally:
+        os.remove(job_script)
+
+    match = _job_id_pattern.search(result.stdout)
+    if result.returncode != 0 or not match:
+        logger.error(f"sbatch failed for {description}: {(result.stderr or result.stdout).strip()}")
+        return None
+    return match.group(1)
+
+
+def submit_job(input_file, partition, submit_log=SUBMIT_LOG_PATH, resources=None):
+    """
+    提交一个 gjf，返回作业号；sbatch 失败时返回 None。
+    """
+    rewrite_chk_path(input_file)
+
+    job_script = f"{os.path.splitext(input_file)[0]}.sh"
+    with open(job_script, 'w') as f:
+        f.write(build_job_script(input_file, partition, resources))
+    job_id = _sbatch(job_script, os.path.dirname(input_file), input_file)
+    if job_id is None:
+        return None
+
+    with open(submit_log, 'a') as f:
+        f.write(f"{time.strftime(LOG_TIME_FORMAT)} - Job {job_id}: {input_file}\n")
+    return job_id
+
+
+def array_manifest_path(name):
+    return os.path.join(ARRAYS_DIR, f"{name}.txt")
+
+
+def submit_array(input_files, partition, name, submit_log=SUBMIT_LOG_PATH, resources=None):
+    """
+    把多个 gjf 作为一个作业数组提交，返回作业号；sbatch 失败时返回 None。
+    每个元素在 submit.log 中记为 "Job <作业号>_<序号>: <输入文件>"。
+    """
+    os.makedirs(ARRAYS_DIR, exist_ok=True)
+    resources = resources or job_resources(input_files[0])
+    manifest = array_manifest_path(name)
+    with open(manifest, 'w') as f:
+        f.writelines(f"{input_file}\n" for input_file in input_files)
+    for index, input_file in enumerate(input_files):
+        rewrite_chk_path(input_file)
+        comd_file = os.path.join(os.path.dirname(input_file), 'comd')
+        if os.path.isfile(comd_file):
+            shutil.copyfile(comd_file, os.path.join(ARRAYS_DIR, f"{name}_{index}.comd"))
+
+    job_script = os.path.join(ARRAYS_DIR, f"{name}.sh")
+    with open(job_script, 'w') as f:
+        f.write(ARRAY_SCRIPT.format(name=name, last=len(input_files) - 1, partition=partition,
+                                    home=os.path.expanduser('~'), arrays_dir=ARRAYS_DIR, manifest=manifest,
+                                    directives=resource_directives(resources)))
+    job_id = _sbatch(job_script, ARRAYS_DIR, f"array {name}")
+    if job_id is None:
+        return None
+
+    now = time.strftime(LOG_TIME_FORMAT)
+    with open(submit_log, 'a') as f:
+        f.writelines(f"{now} - Job {job_id}_{index}: {input_file}\n" for index, input_file in enumerate(input_files))
+    return job_id
+
+
+def queued_array_inputs(queued_names):
+    """
+    仍在队列中的作业数组所包含的输入文件（从清单读取）。
+    """
+    inputs = set()
+    for name in set(queued_names):
+        if not name.startswith(ARRAY_NAME_PREFIX):
+            continue
+        try:
+            with open(array_manifest_path(name), 'r') as f:
+                inputs.update(line.strip() for line in f if line.strip())
+        except OSError:
+            continue
+    return inputs
+
+
+def prune_array_files(queued_names, ttl=ARRAY_FILE_TTL):
+    """
+    删除不在队列中、且超过 ttl 秒未修改的作业数组文件。
+    """
+    queued = [name for name in set(queued_names) if name.startswith(ARRAY_NAME_PREFIX)]
+    cutoff = time.time() - ttl
+    try:
+        entries = list(os.scandir(ARRAYS_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime >= cutoff or any(entry.name.startswith(name) for name in queued):
+                continue
+            os.remove(entry.path)
+        except OSError:
+            continue
+
+
+def select_inputs(pending, queued_names):
+    """
+    去掉已在队列中的输入文件：单独提交的作业名即 gjf 文件名，作业数组按清单判断。
+    """
+    queued = set(queued_names)
+    in_arrays = queued_array_inputs(queued)
+    return [path for path in pending
+            if os.path.splitext(os.path.basename(path))[0] not in queued and path not in in_arrays]
+
+
+def plan_batches(input_files, array_size, limit=None):
+    """
+    把输入文件分批：资源相同的最多 array_size 个一批（作业数组），只有一个文件的批照常提交。
+    按每批第一个文件的顺序返回 [(资源, [输入文件])]。
+    limit 为最多提交的批数：不逐个提交时只读取前 limit 个文件的资源；打包时不再新开
+    第 limit 批之后的批，limit 批都装满后不再读取剩余的文件。
+    """
+    if array_size <= 1:
+        return [(job_resources(path), [path]) for path in input_files[:limit]]
+    batches = []
+    open_batches = {}
+    full = 0
+    for path in input_files:
+        if limit is not None and full >= limit:
+            break
+        resources = job_resources(path)
+        key = tuple(sorted(resources.items()))
+        batch = open_batches.get(key)
+        if batch is None or len(batch[1]) >= array_size:
+            if limit is not None and len(batches) >= limit:
+                continue
+            batch = (resources, [])
+            open_batches[key] = batch
+            batches.append(batch)
+        batch[1].append(path)
+        if len(batch[1]) == array_size:
+            full += 1
+    return batches
+
+
+def print_priority_report(ordered, depth):
+    """
+    列出所有待提交输入的提交顺序及其依赖层数、后代输入数和关键路径代价，
+    以及按 depth 个作业并行估计的各项目完成先后。
+    """
+    print("\nSubmission order (depth, dependents, critical path cost):")
+    for position, item in enumerate(ordered, 1):
+        print(f"{position:5d}  {item.project}  {item.depth}  {item.dependents}  {item.path_cost:.1f}  {item.path}")
+    print("\nExpected completion order:")
+    for position, (project, finish) in enumerate(expected_completion(ordered, depth), 1):
+        print(f"{position:5d}  {project}  {finish:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Submit pending Gaussian inputs to SLURM.')
+    parser.add_argument('--root', default=AUTOTASKER_SUBMIT_PATH,
+                        help='Directory tree to scan for .gjf files (default: $AUTOTASKER_SUBMIT_PATH)')
+    parser.add_argument('--depth', type=int, default=AUTOTASKER_QUEUE_DEPTH,
+                        help='Number of jobs to keep in the queue (default: $AUTOTASKER_QUEUE_DEPTH)')
+    parser.add_argument('--array-size', type=int, default=AUTOTASKER_ARRAY_SIZE,
+                        help='Pack up to N inputs with the same resources into one job array; '
+                             '0 or 1 submits every input separately (default: $AUTOTASKER_ARRAY_SIZE)')
+    parser.add_argument('--order', choices=('priority', 'path'), default=AUTOTASKER_SUBMIT_ORDER,
+                        help='priority: critical path first with per-project round robin; path: sorted paths '
+                             '(default: $AUTOTASKER_SUBMIT_ORDER)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='List the files that would be submitted, in order, and the expected completion order')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore the cached directory listings')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    store = None if args.no_cache else open_state_store(AUTOTASKER_STATE_PATH)
+    try:
+        pending = find_pending_inputs(args.root, store)
+    finally:
+        if store is not None:
+            store.close()
+
+    queued = queued_jobs()
+    queued_names = [name for _, name in queued]
+    candidates = select_inputs(pending, queued_names)
+    # 运行中的数组元素在 squeue 中各占一行，按作业数组号去重，一个作业数组只算一个队列名额；
+    # 同名的不同作业分别计数
+    queued_count = len({job_id for job_id, _ in queued})
+    slots = max(args.depth - queued_count, 0)
+    ordered = []
+    # 队列已满时不需要排序，也就不读取 gjf 和 .task
+    if args.order == 'priority' and candidates and (slots or args.dry_run):
+        ordered = prioritize(candidates, args.root)
+        candidates = [item.path for item in ordered]
+    batches = plan_batches(candidates, args.array_size, slots)
+    print(f"Pending inputs: {len(candidates)}. Current jobs in queue: {queued_count}. "
+          f"Submitting {len(batches)} jobs ({sum(len(inputs) for _, inputs in batches)} inputs).")
+
+    if args.dry_run:
+        for index, (_, inputs) in enumerate(batches):
+            prefix = f"[array {index}] " if len(inputs) > 1 else ''
+            print("\n".join(f"{prefix}{path}" for path in inputs))
+        if ordered:
+            print_priority_report(ordered, args.depth)
+        return
+    prune_array_files(queued_names)
+    if not batches:
+        print("No more input files to submit.")
+        return
+
+    partition = default_partition()
+    if not partition:
+        print("Error: No partitions available.")
+        sys.exit(1)
+    print(f"Using partition: {partition}")
+
+    os.makedirs(os.path.dirname(SUBMIT_LOG_PATH), exist_ok=True)
+    submitted = 0
+    stamp = f"{time.strftime('%Y%m%d%H%M%S')}_{os.getpid()}"
+    for index, (resources, inputs) in enumerate(batches):
+        if len(inputs) == 1:
+            job_id = submit_job(inputs[0], partition, resources=resources)
+            description = inputs[0]
+        else:
+            name = f"{ARRAY_NAME_PREFIX}{stamp}_{index}"
+            job_id = submit_array(inputs, partition, name, resources=resources)
+            description = f"{len(inputs)} inputs (array {name})"
+        if job_id is not None:
+            submitted += 1
+            print(f"Submitted batch job {job_id} for {description}")
+
+    print(f"Submission process completed: {submitted} of {len(batches)} jobs submitted.")
+    if submitted < len(batches):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+
+import numpy as np
+
+from config import AUTOTASKER_CACHE_PATH
+from sqlite_store import Schema, open_database, rebuild
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = Schema(
+    version=1,
+    statements=(
+        "CREATE TABLE IF NOT EXISTS geometries ("
+        " key TEXT PRIMARY KEY,"
+        " smiles TEXT NOT NULL,"
+        " charge INTEGER NOT NULL,"
+        " multiplicity INTEGER NOT NULL,"
+        " numbers BLOB NOT NULL,"
+        " coords BLOB NOT NULL,"
+        " created REAL NOT NULL)",
+        # 构象系综：coords 为 (K, N, 3)，energies 为 (K,)
+        "CREATE TABLE IF NOT EXISTS ensembles ("
+        " key TEXT PRIMARY KEY,"
+        " smiles TEXT NOT NULL,"
+        " charge INTEGER NOT NULL,"
+        " multiplicity INTEGER NOT NULL,"
+        " numbers BLOB NOT NULL,"
+        " coords BLOB NOT NULL,"
+        " energies BLOB NOT NULL,"
+        " created REAL NOT NULL)",
+    ),
+    check_table='geometries',
+)
+
+
+def default_cache_path():
+    return os.path.join(AUTOTASKER_CACHE_PATH, 'smiles_cache.db')
+
+
+def cache_key(canonical_smiles, params):
+    """
+    缓存键：规范化 SMILES + 生成构象所用的参数（参数变化后旧结果不再命中）。
+    """
+    return f"{canonical_smiles}|{json.dumps(params, sort_keys=True)}"
+
+
+class SmilesGeometryCache:
+    """
+    SMILES -> 3D 几何结构的持久化缓存（SQLite）。
+    坐标以 float64 字节串保存，读出时直接还原为 numpy 数组。
+    数据库损坏时自动重建；无法打开时 get/put 退化为空操作。
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or default_cache_path()
+        self.conn = None
+        try:
+            self.conn = open_database(self.db_path, SCHEMA, 'SMILES cache')
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"SMILES cache {self.db_path} unavailable ({e}), geometries will not be cached.")
+
+    def _rebuild(self, error):
+        """
+        读取时发现库损坏：重建，重建失败时退化为不缓存。缓存出错不影响生成结构。
+        """
+        logger.warning(f"SMILES cache {self.db_path} is corrupt ({error}), rebuilding.")
+        conn, self.conn = self.conn, None
+        try:
+            self.conn = rebuild(conn, self.db_path, SCHEMA)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"SMILES cache {self.db_path} unavailable ({e}), geometries will not be cached.")
+
+    def get_many(self, keys):
+        """
+        返回 {key: (numbers, coords, charge, multiplicity)}，只包含命中的键。
+        """
+        if self.conn is None or not keys:
+            return {}
+        found = {}
+        keys = list(keys)
+        try:
+            # SQLite 对单条语句的参数个数有限制，分批查询
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, charge, multiplicity, numbers, coords FROM geometries"
+                    f" WHERE key IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+                for key, charge, multiplicity, numbers, coords in rows:
+                    found[key] = (np.frombuffer(numbers, dtype=np.int64).copy(),
+                                  np.frombuffer(coords, dtype=np.float64).reshape(-1, 3).copy(),
+                                  charge, multiplicity)
+        except sqlite3.DatabaseError as e:
+            self._rebuild(e)
+            return {}
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, entries):
+        """
+        entries: [(key, smiles, numbers, coords, charge, multiplicity)]
+        """
+        if self.conn is None or not entries:
+            return
+        now = time.time()
+        rows = [(key, smiles, int(charge), int(multiplicity),
+                 sqlite3.Binary(np.asarray(numbers, dtype=np.int64).tobytes()),
+                 sqlite3.Binary(np.asarray(coords, dtype=np.float64).tobytes()), now)
+                for key, smiles, numbers, coords, charge, multiplicity in entries]
+        try:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO geometries (key, smiles, charge, multiplicity, numbers, coords, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"SMILES cache write failed ({e}).")
+
+    def get_ensemble(self, key):
+        """
+        返回 (numbers, coords (K, N, 3), energies, charge, multiplicity)，未命中时返回 None。
+        """
+        if self.conn is None:
+            return None
+        try:
+            row = self.conn.execute(
+                "SELECT charge, multiplicity, numbers, coords, energies FROM ensembles WHERE key = ?",
+                (key,)).fetchone()
+        except sqlite3.DatabaseError as e:
+            self._rebuild(e)
+            return None
+        if row is None:
+            return None
+        charge, multiplicity, numbers, coords, energies = row
+        numbers = np.frombuffer(numbers, dtype=np.int64).copy()
+        coords = np.frombuffer(coords, dtype=np.float64).reshape(-1, len(numbers), 3).copy()
+        return numbers, coords, np.frombuffer(energies, dtype=np.float64).copy(), charge, multiplicity
+
+    def put_ensemble(self, key, smiles, numbers, coords, energies, charge, multiplicity):
+        if self.conn is None:
+            return
+        try:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ensembles"
+                " (key, smiles, charge, multiplicity, numbers, coords, energies, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, smiles, int(charge), int(multiplicity),
+                 sqlite3.Binary(np.asarray(numbers, dtype=np.int64).tobytes()),
+                 sqlite3.Binary(np.asarray(coords, dtype=np.float64).tobytes()),
+                 sqlite3.Binary(np.asarray(energies, dtype=np.float64).tobytes()), time.time()))
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"SMILES cache write failed ({e}).")
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -1,8 +1,12 @@
+import os
 import re
-import requests
+import numpy as np
 from rdkit import Chem
 from rdkit.Chem import AllChem
 
+from geom_tools.geometry import Geometry, kabsch_rmsd
+from smiles_cache import SmilesGeometryCache, cache_key
+
 # A utility function to convert atomic number to element symbol using RDKit
 def get_element_symbol(atomic_num):
     return Chem.GetPeriodicTable().GetElementSymbol(atomic_num)
@@ -25,34 +29,63 @@ def is_cas_number(string):
 # 通过 CAS 号获取 SMILES 字符串
 def get_smiles_from_cas(cas_number):
     """
-    Fetch SMILES from PubChem using CAS number.
+    Resolve a CAS number to SMILES: local cache/table first, PubChem only if enabled (see cas_resolver).
     """
-    url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{cas_number}/property/CanonicalSMILES/JSON"
-    response = requests.get(url)
-    
-    if response.status_code == 200:
-        data = response.json()
-        try:
-            smiles = data['PropertyTable']['Properties'][0]['CanonicalSMILES']
-            return smiles
-        except KeyError:
-            raise ValueError(f"SMILES not found for CAS number: {cas_number}")
-    else:
-        raise ValueError(f"Unable to fetch data for CAS number: {cas_number}")
+    from cas_resolver import get_cas_resolver
+    return get_cas_resolver().resolve(cas_number)
 
-# 主函数：将 SMILES 或 CAS 号转化为 3D 几何结构
-def smiles_to_geometry(input_string):
+# 生成 3D 结构所用的参数；修改后缓存中的旧结构自动失效
+EMBED_PARAMS = {
+    'random_seed': 42,
+    'mmff_variant': 'MMFF94',
+    'mmff_max_iters': 2000,
+    'uff_max_iters': 1000,
+    'version': 1,
+}
+
+_cache = None
+_cache_pid = None
+
+
+def get_smiles_cache():
     """
-    Convert a SMILES string or CAS number into 3D geometry, charge, and spin multiplicity.
-    Returns a dictionary with the atomic coordinates, charge, and spin multiplicity.
+    返回进程级共享的几何结构缓存；AUTOTASKER_SMILES_CACHE=0 时返回 None。
+    """
+    global _cache, _cache_pid
+    if os.getenv('AUTOTASKER_SMILES_CACHE', '1') == '0':
+        return None
+    if _cache is None or _cache_pid != os.getpid():
+        _cache = SmilesGeometryCache()
+        _cache_pid = os.getpid()
+    return _cache
+
+
+def canonicalize_smiles(smiles):
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        raise ValueError("Invalid SMILES string")
+    return Chem.MolToSmiles(mol)
+
+
+def input_atom_order(smiles, canonical):
+    """
+    结构按 canonical SMILES（加氢后）的原子顺序生成和缓存。返回下标列表 order，
+    numbers[order] / coords[order] 即为输入 SMILES（加氢后）的原子顺序；顺序相同时返回 None。
+    """
+    if smiles == canonical:
+        return None
+    query = Chem.AddHs(Chem.MolFromSmiles(smiles))
+    match = Chem.AddHs(Chem.MolFromSmiles(canonical)).GetSubstructMatch(query)
+    if len(match) != query.GetNumAtoms():
+        return None
+    return list(match)
+
+
+def embed_smiles(smiles, params=EMBED_PARAMS):
+    """
+    生成单个分子的 3D 结构并用力场优化（MMFF94，不可用时退回 UFF）。
+    返回 (原子序数列表, 坐标数组, 电荷, 自旋多重度)，可以在工作进程中调用。
     """
-    # 如果输入是 CAS 号，先将其转换为 SMILES
-    if is_cas_number(input_string):
-        smiles = get_smiles_from_cas(input_string)
-        print(f"CAS number {input_string} converted to SMILES: {smiles}")
-    else:
-        smiles = input_string
-    
     # Create a molecule object from the SMILES string
     mol = Chem.MolFromSmiles(smiles)
     if mol is None:
@@ -62,23 +95,28 @@ def smiles_to_geometry(input_string):
     mol = Chem.AddHs(mol)
     
     # Generate 3D coordinates
-    AllChem.EmbedMolecule(mol, randomSeed=42)  # Fixed seed for reproducibility
+    if AllChem.EmbedMolecule(mol, randomSeed=params['random_seed']) == -1:  # Fixed seed for reproducibility
+        # 距离几何失败时（如较大的环体系）改用随机初始坐标重试
+        if AllChem.EmbedMolecule(mol, randomSeed=params['random_seed'], useRandomCoords=True) == -1:
+            raise ValueError(f"Failed to embed 3D coordinates for SMILES: {smiles}")
     
     # Try to optimize the molecule using MMFF94 force field first
     try:
-        mmff_props = AllChem.MMFFGetMoleculeProperties(mol, mmffVariant="MMFF94")
+        mmff_props = AllChem.MMFFGetMoleculeProperties(mol, mmffVariant=params['mmff_variant'])
         if mmff_props is None:
             raise ValueError("MMFF94 parameters are not available for this molecule.")
         
-        converged = AllChem.MMFFOptimizeMolecule(mol, maxIters=2000)  # Try MMFF94 optimization
-        if not converged:
+        # 返回 0 表示收敛
+        not_converged = AllChem.MMFFOptimizeMolecule(mol, mmffVariant=params['mmff_variant'],
+                                                     maxIters=params['mmff_max_iters'])
+        if not_converged:
             print("Warning: MMFF94 optimization did not converge within the limit.")
     except Exception as e:
         print(f"MMFF94 optimization failed: {e}. Switching to UFF force field.")
         
         # Fall back to UFF optimization if MMFF94 is not available
-        converged = AllChem.UFFOptimizeMolecule(mol, maxIters=1000)
-        if not converged:
+        not_converged = AllChem.UFFOptimizeMolecule(mol, maxIters=params['uff_max_iters'])
+        if not_converged:
             print("Warning: UFF optimization did not converge within the limit.")
     
     # Get the total charge of the molecule
@@ -87,17 +125,216 @@ def smiles_to_geometry(input_string):
     # Set default spin multiplicity (assuming all closed-shell singlets unless otherwise specified)
     spin_multiplicity = 1
     
-    # Extract 3D coordinates and element symbols
-    atom_info = []
-    conf = mol.GetConformer()
-    for atom in mol.GetAtoms():
-        atomic_num = atom.GetAtomicNum()
-        element_symbol = get_element_symbol(atomic_num)
-        pos = conf.GetAtomPosition(atom.GetIdx())
-        atom_info.append(f"{element_symbol} {pos.x: .6f} {pos.y: .6f} {pos.z: .6f}")
-    
-    return {
+    numbers = [atom.GetAtomicNum() for atom in mol.GetAtoms()]
+    return numbers, mol.GetConformer().GetPositions(), charge, spin_multiplicity
+
+
+def _embed_many(smiles_list, jobs):
+    """
+    返回 {smiles: (numbers, coords, charge, multiplicity) 或异常}。
+    jobs > 1 且待生成的分子不止一个时使用进程池并行。
+    """
+    results = {}
+    if jobs <= 1 or len(smiles_list) <= 1:
+        for smiles in smiles_list:
+            try:
+                results[smiles] = embed_smiles(smiles)
+            except Exception as e:
+                results[smiles] = e
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(jobs, len(smiles_list))) as executor:
+        futures = {smiles: executor.submit(embed_smiles, smiles) for smiles in smiles_list}
+        for smiles, future in futures.items():
+            try:
+                results[smiles] = future.result()
+            except Exception as e:
+                results[smiles] = e
+    return results
+
+
+def smiles_to_geometries(inputs, jobs=1, use_cache=True):
+    """
+    批量将 SMILES 或 CAS 号转化为 3D 几何结构。
+
+    输入先规范化为 canonical SMILES，以 (canonical SMILES, EMBED_PARAMS) 为键查询持久化缓存，
+    只为未命中的分子生成结构（jobs > 1 时并行），结果写回缓存。返回的结构按输入 SMILES
+    的原子顺序排列（氢原子在重原子之后），同一分子的不同写法共用一条缓存。
+    返回 {输入: 与 smiles_to_geometry 相同格式的字典，或失败时的异常}。
+    """
+    results = {}
+    written = {}
+    canonical = {}
+    inputs = list(dict.fromkeys(inputs))
+
+    # 所有 CAS 号一次性批量解析
+    cas_numbers = [input_string for input_string in inputs if is_cas_number(input_string)]
+    cas_smiles = {}
+    if cas_numbers:
+        from cas_resolver import get_cas_resolver
+        cas_smiles = get_cas_resolver().resolve_many(cas_numbers)
+
+    for input_string in inputs:
+        try:
+            if input_string in cas_smiles:
+                smiles = cas_smiles[input_string]
+                if smiles is None:
+                    raise ValueError(f"SMILES not found for CAS number: {input_string}")
+                print(f"CAS number {input_string} converted to SMILES: {smiles}")
+            else:
+                smiles = input_string
+            canonical[input_string] = canonicalize_smiles(smiles)
+            written[input_string] = smiles
+        except Exception as e:
+            results[input_string] = e
+
+    keys = {smiles: cache_key(smiles, EMBED_PARAMS) for smiles in set(canonical.values())}
+    cache = get_smiles_cache() if use_cache else None
+    hits = cache.get_many(keys.values()) if cache is not None else {}
+
+    structures = {smiles: hits[key] for smiles, key in keys.items() if key in hits}
+    missing = sorted(smiles for smiles, key in keys.items() if key not in hits)
+    if missing:
+        embedded = _embed_many(missing, jobs)
+        structures.update(embedded)
+        if cache is not None:
+            cache.put_many([(keys[smiles], smiles, *structure) for smiles, structure in embedded.items()
+                            if not isinstance(structure, Exception)])
+
+    for input_string, smiles in canonical.items():
+        structure = structures[smiles]
+        if isinstance(structure, Exception):
+            results[input_string] = structure
+            continue
+        numbers, coords, charge, spin_multiplicity = structure
+        order = input_atom_order(written[input_string], smiles)
+        if order is not None:
+            numbers, coords = np.asarray(numbers)[order], coords[order]
+        results[input_string] = {
+            "charge": charge,
+            "spin_multiplicity": spin_multiplicity,
+            "geometry": Geometry(numbers, coords, charge, spin_multiplicity)
+        }
+    return results
+
+
+# 主函数：将 SMILES 或 CAS 号转化为 3D 几何结构
+def smiles_to_geometry(input_string):
+    """
+    Convert a SMILES string or CAS number into 3D geometry, charge, and spin multiplicity.
+    Returns a dictionary with the atomic coordinates, charge, and spin multiplicity.
+    """
+    result = smiles_to_geometries([input_string])[input_string]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+# 构象系综的默认参数：构象数、去重 RMSD 阈值（Å，重原子）、能量窗口（kcal/mol）
+CONFORMER_DEFAULTS = {'nconf': 10, 'rmsd': 0.5, 'window': 5.0, 'keep': 0}
+
+
+def parse_conformer_options(tokens):
+    """
+    解析 "%smiles=CCCC nconf=20 rmsd=0.5 window=5 keep=5" 中 SMILES 之后的选项。
+    """
+    options = dict(CONFORMER_DEFAULTS)
+    for token in tokens:
+        key, sep, value = token.partition('=')
+        if not sep or key not in CONFORMER_DEFAULTS:
+            raise ValueError(f"Unknown conformer option '{token}', expected: {', '.join(CONFORMER_DEFAULTS)}")
+        options[key] = type(CONFORMER_DEFAULTS[key])(value)
+    return options
+
+
+def embed_conformers(smiles, nconf, params=EMBED_PARAMS):
+    """
+    用 ETKDG 生成 nconf 个构象并用力场优化（RDKit 内部多线程，numThreads=0 使用全部核）。
+    返回 (原子序数, 坐标 (K, N, 3), 能量 (K,) kcal/mol, 电荷, 自旋多重度)。
+    """
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        raise ValueError("Invalid SMILES string")
+    mol = Chem.AddHs(mol)
+
+    embed_params = AllChem.ETKDGv3()
+    embed_params.randomSeed = params['random_seed']
+    embed_params.numThreads = 0
+    conf_ids = list(AllChem.EmbedMultipleConfs(mol, numConfs=nconf, params=embed_params))
+    if not conf_ids:
+        embed_params.useRandomCoords = True
+        conf_ids = list(AllChem.EmbedMultipleConfs(mol, numConfs=nconf, params=embed_params))
+    if not conf_ids:
+        raise ValueError(f"Failed to embed 3D coordinates for SMILES: {smiles}")
+
+    if AllChem.MMFFHasAllMoleculeParams(mol):
+        results = AllChem.MMFFOptimizeMoleculeConfs(mol, numThreads=0, mmffVariant=params['mmff_variant'],
+                                                    maxIters=params['mmff_max_iters'])
+    else:
+        print("MMFF94 parameters are not available for this molecule. Switching to UFF force field.")
+        results = AllChem.UFFOptimizeMoleculeConfs(mol, numThreads=0, maxIters=params['uff_max_iters'])
+    not_converged = sum(1 for flag, _ in results if flag)
+    if not_converged:
+        print(f"Warning: {not_converged} of {len(results)} conformers did not converge within the limit.")
+
+    numbers = [atom.GetAtomicNum() for atom in mol.GetAtoms()]
+    coords = np.array([mol.GetConformer(conf_id).GetPositions() for conf_id in conf_ids])
+    energies = np.array([energy for _, energy in results], dtype=np.float64)
+    return numbers, coords, energies, get_molecule_charge(mol), 1
+
+
+def prune_conformers(numbers, coords, energies, rmsd=0.5, window=5.0, keep=0):
+    """
+    按能量从低到高筛选构象：去掉能量高于最低值 window 以上的构象，以及与已保留构象的
+    重原子 RMSD（Kabsch 叠合后）小于 rmsd 的构象；keep > 0 时最多保留 keep 个。
+    返回保留构象的下标（按能量排序）。
+    """
+    order = np.argsort(energies)
+    order = order[energies[order] - energies[order[0]] <= window]
+    heavy = np.asarray(numbers) > 1
+    if not heavy.any():
+        heavy[:] = True
+    heavy_coords = coords[:, heavy, :]
+
+    kept = []
+    for index in order:
+        if kept and kabsch_rmsd(heavy_coords[kept], heavy_coords[index]).min() < rmsd:
+            continue
+        kept.append(index)
+        if keep and len(kept) >= keep:
+            break
+    return kept
+
+
+def smiles_to_conformers(input_string, nconf=10, rmsd=0.5, window=5.0, keep=0, use_cache=True):
+    """
+    将 SMILES 或 CAS 号转化为去重后的低能构象列表（按 MMFF 能量从低到高）。
+    每个元素与 smiles_to_geometry 的返回格式相同，另含 'energy'（相对能量，kcal/mol）。
+    力场优化后的全部构象按 (canonical SMILES, 参数) 缓存，修改 rmsd/window/keep 不需要重新生成；
+    返回的构象按输入 SMILES 的原子顺序排列。
+    """
+    written = get_smiles_from_cas(input_string) if is_cas_number(input_string) else input_string
+    smiles = canonicalize_smiles(written)
+    key = cache_key(smiles, dict(EMBED_PARAMS, nconf=nconf, method='ETKDGv3'))
+
+    cache = get_smiles_cache() if use_cache else None
+    ensemble = cache.get_ensemble(key) if cache is not None else None
+    if ensemble is None:
+        numbers, coords, energies, charge, spin_multiplicity = embed_conformers(smiles, nconf)
+        if cache is not None:
+            cache.put_ensemble(key, smiles, numbers, coords, energies, charge, spin_multiplicity)
+    else:
+        numbers, coords, energies, charge, spin_multiplicity = ensemble
+    order = input_atom_order(written, smiles)
+    if order is not None:
+        numbers, coords = np.asarray(numbers)[order], coords[:, order, :]
+
+    kept = prune_conformers(numbers, coords, energies, rmsd, window, keep)
+    lowest = energies[kept[0]]
+    return [{
         "charge": charge,
         "spin_multiplicity": spin_multiplicity,
-        "geometry": atom_info
-    }
+        "geometry": Geometry(numbers, coords[index], charge, spin_multiplicity),
+        "energy": float(energies[index] - lowest),
+    } for index in kept]
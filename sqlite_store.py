@@ -0,0 +1,84 @@
+"""
+SQLite 缓存与状态库（smiles_cache、cas_resolver、job_tracker、task_state、geom_tools/log_cache）
+共用的打开与重建：连接后检查 PRAGMA user_version 并建表；库损坏或版本不符时删除数据库
+及其 -journal/-wal/-shm 文件，再重新创建。
+"""
+import os
+import sqlite3
+import logging
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SUFFIXES = ('', '-journal', '-wal', '-shm')
+
+
+@dataclass(frozen=True)
+class Schema:
+    """
+    version:      写入 PRAGMA user_version 的结构版本，结构变化时递增
+    statements:   建表、建索引语句（IF NOT EXISTS）
+    check_table:  打开时读取一次的表，尽早发现损坏的数据页
+    """
+    version: int
+    statements: Tuple[str, ...]
+    check_table: Optional[str] = None
+
+
+def connect(db_path, schema, **kwargs):
+    """
+    连接并建表。库的版本既不是 0（新库）也不是 schema.version 时抛出 sqlite3.DatabaseError。
+    kwargs 传给 sqlite3.connect（如 check_same_thread=False）。
+    """
+    conn = sqlite3.connect(db_path, timeout=30, **kwargs)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, schema.version):
+            raise sqlite3.DatabaseError(f"unexpected schema version {version}")
+        for statement in schema.statements:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {schema.version}")
+        if schema.check_table:
+            conn.execute(f"SELECT count(*) FROM {schema.check_table}").fetchone()
+        conn.commit()
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn
+
+
+def remove_database(db_path):
+    for suffix in _SUFFIXES:
+        try:
+            os.remove(db_path + suffix)
+        except OSError:
+            pass
+
+
+def rebuild(conn, db_path, schema, **kwargs):
+    """
+    关闭 conn（可以为 None），删除数据库文件后重新创建，返回新连接。
+    """
+    if conn is not None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    remove_database(db_path)
+    return connect(db_path, schema, **kwargs)
+
+
+def open_database(db_path, schema, label, **kwargs):
+    """
+    创建所在目录并连接，库损坏或版本不符时重建；label 用于日志（如 "SMILES cache"）。
+    目录无法创建或重建后仍无法打开时抛出 OSError / sqlite3.Error，退化方式由调用方决定。
+    """
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    try:
+        return connect(db_path, schema, **kwargs)
+    except sqlite3.DatabaseError as e:
+        logger.warning(f"{label} {db_path} is corrupt ({e}), rebuilding.")
+        return rebuild(None, db_path, schema, **kwargs)
@@ -0,0 +1,239 @@
+"""
+提交顺序：按任务依赖图的关键路径排序，并在项目之间轮转。
+
+每个待提交的 gjf 位于 <任务目录>/<任务名>/ 下，任务目录中的 .task 文件给出依赖图。
+对每个输入估计：
+    depth       剩余依赖链的层数（含自身）
+    dependents  后代任务将生成的输入数（关键词扫描按组合数计）
+    path_cost   关键路径代价：自身代价加上代价最大的一条后代链（resource_policy.estimate_cost）
+同一项目（AUTOTASKER_CALC_PATH 下包含 .task 文件的任务目录；计算目录之外的输入取提交根目录下的
+第一级目录）内按 path_cost、dependents 从大到小排序；
+项目之间轮转，每轮各取一个，避免大规模筛选占满队列。
+不属于任何 .task 的 gjf 只按自身代价排序。
+"""
+import os
+import heapq
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config import AUTOTASKER_CALC_PATH
+from task_graph import TaskGraph
+from task_files import find_task_file, parse_task_file
+from keyword_sweep import KeywordSweep
+from resource_policy import estimate_cost
+
+logger = logging.getLogger(__name__)
+
+# 沿 %oldchk 查找坐标的最大层数（geom=check 的 gjf 中没有坐标）
+MAX_CHK_HOPS = 5
+
+
+@dataclass
+class InputPriority:
+    path: str
+    project: str
+    title: Optional[str] = None
+    depth: int = 1
+    dependents: int = 0
+    cost: float = 0.0
+    path_cost: float = 0.0
+
+
+def read_gjf(input_file: str) -> Tuple[str, int, Optional[str]]:
+    """
+    返回 gjf 的 (关键词行, 原子数, %oldchk 路径)。
+    """
+    route_lines = []
+    oldchk = None
+    natoms = 0
+    section = 'link0'  # link0 -> route -> title -> charge -> atoms
+    with open(input_file, 'r', errors='replace') as f:
+        for line in f:
+            stripped = line.strip()
+            if section == 'link0':
+                if stripped.lower().startswith('%oldchk='):
+                    oldchk = stripped.split('=', 1)[1].strip()
+                elif stripped.startswith('#'):
+                    section = 'route'
+                    route_lines.append(stripped)
+            elif section == 'route':
+                if not stripped:
+                    section = 'title'
+                else:
+                    route_lines.append(stripped)
+            elif section == 'title':
+                if not stripped:
+                    section = 'charge'
+            elif section == 'charge':
+                section = 'atoms'
+            elif not stripped:
+                break
+            else:
+                natoms += 1
+    return ' '.join(route_lines).lstrip('#'), natoms, oldchk
+
+
+def count_atoms(input_file: str, natoms: int, oldchk: Optional[str]) -> int:
+    """
+    gjf 中没有坐标（geom=check）时，沿 %oldchk 找到来源任务的 gjf 计数。
+    """
+    for _ in range(MAX_CHK_HOPS):
+        if natoms or not oldchk:
+            break
+        source = f"{os.path.splitext(oldchk)[0]}.gjf"
+        if not os.path.exists(source):
+            break
+        _, natoms, oldchk = read_gjf(source)
+    return natoms
+
+
+def _task_route(task_info: Dict) -> Tuple[str, int]:
+    """
+    任务块的代表关键词（扫描取第一个组合）和将生成的输入数。
+    """
+    keywords = task_info.get('keywords', '')
+    try:
+        sweep = KeywordSweep.from_task(task_info) if keywords else None
+    except ValueError:
+        sweep = None
+    if sweep is None or not sweep.axes:
+        return keywords, 1
+    return sweep.render(next(iter(sweep.combinations()))), max(len(sweep), 1)
+
+
+class GraphIndex:
+    """
+    一次提交中按 .task 文件缓存解析结果和依赖图。
+    """
+
+    def __init__(self):
+        self.graphs: Dict[str, Optional[TaskGraph]] = {}
+
+    def task_file(self, task_dir: str) -> Optional[str]:
+        try:
+            return find_task_file(task_dir)
+        except OSError:
+            return None
+
+    def graph(self, task_dir: str) -> Optional[TaskGraph]:
+        if task_dir not in self.graphs:
+            graph = None
+            task_file = self.task_file(task_dir)
+            if task_file is not None:
+                try:
+                    graph = TaskGraph(parse_task_file(task_file))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Cannot parse {task_file} for submit priority: {e}")
+            self.graphs[task_dir] = graph
+        return self.graphs[task_dir]
+
+
+def _chain(graph: TaskGraph, title: str, natoms: int, memo: Dict) -> Tuple[int, int, float]:
+    """
+    返回 title 以下（不含自身）的 (层数, 输入数, 最大链代价)。
+    """
+    if title in memo:
+        return memo[title]
+    memo[title] = (0, 0, 0.0)  # 依赖环时不再递归
+    depth = dependents = 0
+    cost = 0.0
+    for child in graph.children.get(title, []):
+        route, count = _task_route(graph.tasks[child])
+        child_depth, child_dependents, child_cost = _chain(graph, child, natoms, memo)
+        depth = max(depth, child_depth + 1)
+        dependents += count + child_dependents
+        cost = max(cost, estimate_cost(natoms, route) + child_cost)
+    memo[title] = (depth, dependents, cost)
+    return memo[title]
+
+
+def _first_level(path: str, prefix: str) -> Optional[str]:
+    """
+    path 在 prefix（绝对路径加分隔符）之下时返回其第一级目录名。
+    """
+    if not path.startswith(prefix):
+        return None
+    return path[len(prefix):].split(os.sep, 1)[0]
+
+
+def project_of(input_file: str, calc_prefix: str, root_prefix: str, task_dir: Optional[str] = None) -> str:
+    """
+    输入所属的项目：计算目录（AUTOTASKER_CALC_PATH）下的任务目录名；有 .task 文件但不在计算目录下时
+    为该任务目录；其余输入取提交根目录下的第一级目录。
+    """
+    project = _first_level(input_file, calc_prefix)
+    if project is not None:
+        return project
+    if task_dir is not None:
+        return task_dir
+    project = _first_level(input_file, root_prefix)
+    return project if project is not None else os.path.dirname(input_file)
+
+
+def score_inputs(input_files: List[str], root: str, index: Optional[GraphIndex] = None,
+                 calc_path: str = AUTOTASKER_CALC_PATH) -> List[InputPriority]:
+    index = index or GraphIndex()
+    root_prefix = os.path.join(os.path.abspath(root), '')
+    calc_prefix = os.path.join(os.path.abspath(calc_path), '')
+    memos: Dict[int, Dict] = {}
+    scored = []
+    for path in input_files:
+        output_dir = os.path.dirname(path)
+        task_dir = os.path.dirname(output_dir)
+        graph = index.graph(task_dir)
+        item = InputPriority(path=path, project=project_of(path, calc_prefix, root_prefix,
+                                                           task_dir if graph is not None else None))
+        try:
+            route, natoms, oldchk = read_gjf(path)
+            natoms = count_atoms(path, natoms, oldchk)
+        except OSError as e:
+            logger.warning(f"Cannot read {path} for submit priority: {e}")
+            route, natoms = '', 0
+        item.cost = item.path_cost = estimate_cost(natoms, route)
+
+        title = os.path.basename(output_dir)
+        if graph is not None and title in graph.tasks:
+            depth, dependents, chain_cost = _chain(graph, title, natoms, memos.setdefault(id(graph), {}))
+            item.title = title
+            item.depth = depth + 1
+            item.dependents = dependents
+            item.path_cost = item.cost + chain_cost
+        scored.append(item)
+    return scored
+
+
+def fair_share_order(items: List[InputPriority]) -> List[InputPriority]:
+    """
+    项目内按关键路径代价、后代数排序；项目之间轮转，每轮内同样按优先级排序。
+    """
+    projects: Dict[str, List[InputPriority]] = {}
+    for item in items:
+        projects.setdefault(item.project, []).append(item)
+    queues = [sorted(group, key=lambda item: (-item.path_cost, -item.dependents, item.path))
+              for group in projects.values()]
+
+    ordered = []
+    for round_index in range(max((len(queue) for queue in queues), default=0)):
+        current = [queue[round_index] for queue in queues if round_index < len(queue)]
+        ordered.extend(sorted(current, key=lambda item: (-item.path_cost, -item.dependents, item.path)))
+    return ordered
+
+
+def expected_completion(ordered: List[InputPriority], slots: int) -> List[Tuple[str, float]]:
+    """
+    估计各项目的完成先后：slots 个作业并行按顺序运行，每个输入结束后其剩余链立即接着运行。
+    返回按预计完成时间排序的 [(项目, 相对时间)]。
+    """
+    workers = [0.0] * max(slots, 1)
+    finish: Dict[str, float] = {}
+    for item in ordered:
+        start = heapq.heappop(workers)
+        end = start + item.cost
+        heapq.heappush(workers, end)
+        finish[item.project] = max(finish.get(item.project, 0.0), end + item.path_cost - item.cost)
+    return sorted(finish.items(), key=lambda entry: (entry[1], entry[0]))
+
+
+def prioritize(input_files: List[str], root: str) -> List[InputPriority]:
+    return fair_share_order(score_inputs(input_files, root))
@@ -0,0 +1,131 @@
+"""
+.task 文件的查找与解析，task_module.py 和 submit_priority.py 共用，保证两处选中同一个 .task 文件。
+"""
+import os
+
+from keyword_sweep import parse_exclude_rule
+from task_metrics import metrics
+
+
+def task_journal_path(task_file_path):
+    """
+    旁路日志文件：AUTOTASKER_TASK_JOURNAL=1 时已处理的任务名记录在这里，而不改写 .task 文件。
+    """
+    return f"{task_file_path}.done"
+
+
+def read_task_journal(task_file_path):
+    try:
+        with open(task_journal_path(task_file_path), 'r') as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def parse_task_file(task_file):
+    """
+    解析 .task 文件，提取任务信息并解析命令词。支持 ORCA 任务块。
+    """
+    tasks = []
+    current_task = {}
+    in_orca_block = False
+    orca_content = []
+
+    with open(task_file, 'r') as f:
+        lines = f.readlines()
+        
+    for line in lines:
+        line = line.rstrip()
+        
+        if not line:  # 空行标志着新任务块的开始
+            if current_task.get('job_title'):
+                if orca_content:
+                    current_task['orca_block'] = '\n'.join(orca_content)
+                    orca_content = []
+                tasks.append(current_task)
+            current_task = {}
+            in_orca_block = False
+            continue
+            
+        if line.startswith('$'):  # 任务名称
+            if line.startswith('$"') and line.endswith('"'):
+                current_task['job_title'] = line.strip('$').strip().strip('"')
+                current_task['quoted'] = True
+            else:
+                current_task['job_title'] = line.strip('$').strip()
+                current_task['quoted'] = False
+        elif line == '-orca-':
+            in_orca_block = True
+            current_task['type'] = 'orca'
+        elif in_orca_block:
+            if line.startswith('%'):  # 在 ORCA 块中处理源任务
+                current_task['source'] = line.strip('%').strip()
+            orca_content.append(line)
+        else:
+            # 现有的 Gaussian 任务解析逻辑
+            if line.startswith('%smiles='):
+                # SMILES 之后可以跟构象系综选项：nconf=20 rmsd=0.5 window=5
+                smiles_fields = line.split('=', 1)[1].split()
+                current_task['smiles'] = smiles_fields[0] if smiles_fields else ''
+                if len(smiles_fields) > 1:
+                    current_task['conformer_options'] = smiles_fields[1:]
+            elif line.startswith('%'):
+                current_task['source'] = line.strip('%').strip()
+            elif line.startswith('!'):
+                current_task['command_words'] = line.strip('!').strip().split()
+            elif line.startswith('#'):
+                current_task['keywords'] = line[1:]
+            elif line.startswith('add ='):
+                current_task['extra_keywords'] = line.split('=')[1].strip()
+            elif line.startswith('sweep ='):
+                current_task['sweep'] = line.split('=', 1)[1].strip()
+            elif line.startswith('exclude ='):
+                current_task.setdefault('exclude', []).append(parse_exclude_rule(line.split('=', 1)[1]))
+            elif line.startswith('chain ='):
+                current_task['chain'] = line.split('=', 1)[1].strip()
+
+    # 处理最后一个任务
+    if current_task.get('job_title'):
+        if orca_content:
+            current_task['orca_block'] = '\n'.join(orca_content)
+        tasks.append(current_task)
+
+    # 旁路日志中记录的任务同样视为已处理
+    done = read_task_journal(task_file)
+    if done:
+        for task in tasks:
+            if task['job_title'] in done:
+                task['quoted'] = True
+
+    return tasks
+
+
+def find_task_file(task_dir):
+    """
+    任务文件夹中按文件名排序的第一个 .task 文件，没有时返回 None；无法列目录时抛出 OSError。
+    """
+    names = sorted(name for name in os.listdir(task_dir) if name.endswith('.task'))
+    return os.path.join(task_dir, names[0]) if names else None
+
+
+def find_task_files(task_dir):
+    """
+    在任务文件夹中查找 .task 文件（find_task_file）和与之同名的输入文件。
+    返回 (task_file_path, input_file)，找不到时对应项为 None。
+    """
+    with metrics.phase('listdir'):
+        task_file_path = find_task_file(task_dir)
+    if task_file_path is None:
+        return None, None
+
+    # Find input file with the same base name as the .task file
+    task_base_name = os.path.splitext(task_file_path)[0]
+    possible_extensions = ['.com', '.gjf', '.xyz']
+
+    # 按优先级顺序查找输入文件
+    for ext in possible_extensions:
+        possible_file = task_base_name + ext
+        if os.path.exists(possible_file):
+            return task_file_path, possible_file
+
+    return task_file_path, None
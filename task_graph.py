@@ -0,0 +1,161 @@
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# 不依赖其他任务结果的结构来源
+ROOT_SOURCES = ('origin', 'restart')
+
+
+def dependency_of(task_info):
+    """
+    返回任务所依赖的任务名；%origin、%restart 和 %smiles 任务返回 None。
+    """
+    if task_info.get('smiles'):
+        return None
+    source = task_info.get('source')
+    if not source or source in ROOT_SOURCES:
+        return None
+    return source
+
+
+class TaskGraph:
+    """
+    由 parse_task_file 的结果构建的任务依赖图。
+
+    每个任务至多有一个来源任务，边从来源指向依赖它的任务。构建时检测
+    重复的任务名、未定义的来源、以构象搜索任务为来源的任务和依赖环；iter_ready 按拓扑顺序一次性
+    放行所有祖先已满足的任务。
+    """
+
+    def __init__(self, tasks):
+        self.tasks = {}
+        self.duplicates = []
+        for task_info in tasks:
+            title = task_info['job_title']
+            if title in self.tasks:
+                self.duplicates.append(title)
+                continue
+            self.tasks[title] = task_info
+
+        self.children = {title: [] for title in self.tasks}
+        self.missing = {}
+        # 构象搜索任务生成多个带 cNN_ 前缀的输入，没有唯一的 log 可作为来源
+        self.conformer_sources = {}
+        for title, task_info in self.tasks.items():
+            parent = dependency_of(task_info)
+            if parent is None:
+                continue
+            if parent not in self.tasks:
+                self.missing[title] = parent
+                continue
+            if self.tasks[parent].get('smiles') and self.tasks[parent].get('conformer_options'):
+                self.conformer_sources[title] = parent
+                continue
+            self.children[parent].append(title)
+
+        self.order, self.cyclic = self._toposort()
+
+    def _toposort(self):
+        """
+        Kahn 算法，同一层内保持文件中的顺序。返回 (拓扑序, 处于环上或依赖环的任务)。
+        """
+        indegree = {title: 0 for title in self.tasks}
+        for title in self.tasks:
+            for child in self.children[title]:
+                indegree[child] += 1
+
+        queue = deque(title for title in self.tasks if indegree[title] == 0)
+        order = []
+        while queue:
+            title = queue.popleft()
+            order.append(title)
+            for child in self.children[title]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    queue.append(child)
+
+        cyclic = [title for title in self.tasks if indegree[title] > 0]
+        return order, cyclic
+
+    def parent_of(self, title):
+        parent = dependency_of(self.tasks[title])
+        return parent if parent in self.tasks else None
+
+    def descendants(self, title):
+        """
+        返回 title 的所有后代任务名（不含自身），按广度优先顺序。
+        """
+        result = []
+        queue = deque(self.children.get(title, []))
+        while queue:
+            child = queue.popleft()
+            result.append(child)
+            queue.extend(self.children[child])
+        return result
+
+    def report_problems(self, task_file_path):
+        """
+        把重复任务名、未定义来源、构象搜索来源和依赖环写入日志。
+        """
+        for title in self.duplicates:
+            logger.error(f"Duplicate task '{title}' in {task_file_path}, only the first block is used.")
+        for title, source in self.missing.items():
+            logger.error(f"Task '{title}' depends on undefined task '{source}' in {task_file_path}.")
+        for title, source in self.conformer_sources.items():
+            logger.error(f"Task '{title}' uses conformer search task '{source}' as its source in "
+                         f"{task_file_path}; this is not supported, the task will not be processed.")
+        if self.cyclic:
+            logger.error(f"Dependency cycle in {task_file_path}: " + ", ".join(self.cyclic))
+
+    def iter_ready(self, is_finished):
+        """
+        按拓扑顺序产出本轮可以生成输入的任务。
+
+        is_finished(title) 判断已处理任务的计算是否正常结束，每个来源最多调用一次。
+        未处理的任务在其来源已处理且正常结束时放行；根任务（%origin、%smiles、
+        %restart）直接放行。来源未满足时整棵子树都不再检查。
+        """
+        finished_cache = {}
+        state = {}  # title -> 'done' | 'released' | 'blocked'
+
+        for title in self.order:
+            task_info = self.tasks[title]
+            if title in self.missing or title in self.conformer_sources:
+                state[title] = 'blocked'
+                continue
+            if task_info.get('quoted', False):
+                state[title] = 'done'
+                continue
+
+            parent = self.parent_of(title)
+            if parent is not None:
+                if state.get(parent) != 'done':
+                    state[title] = 'blocked'
+                    continue
+                if parent not in finished_cache:
+                    finished_cache[parent] = is_finished(parent)
+                if not finished_cache[parent]:
+                    state[title] = 'blocked'
+                    continue
+
+            state[title] = 'released'
+            yield task_info
+
+    def waiting_sources(self):
+        """
+        返回决定待处理任务何时可以放行的任务名：已处理、且有未处理子任务的来源，
+        以及 %restart 任务自身。
+        """
+        sources = set()
+        for title in self.order:
+            task_info = self.tasks[title]
+            if task_info.get('quoted', False) or title in self.missing or title in self.conformer_sources:
+                continue
+            if task_info.get('source') == 'restart' and not task_info.get('smiles'):
+                sources.add(title)
+                continue
+            parent = self.parent_of(title)
+            if parent is not None and self.tasks[parent].get('quoted', False):
+                sources.add(parent)
+        return sorted(sources)
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import functools
+from collections import defaultdict
+from contextlib import contextmanager
+
+# runs.jsonl 超过这个大小后改名为 runs.jsonl.1（覆盖上一份），守护模式下历史记录不会无限增长
+RUNS_MAX_BYTES = 8 * 1024 * 1024
+
+
+class RunMetrics:
+    """
+    记录一次运行中各阶段的耗时和调用次数（总计与按文件夹）。
+    工作进程中的记录通过 snapshot()/merge() 汇总到主进程。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self.phases = defaultdict(lambda: [0, 0.0])                          # phase -> [count, seconds]
+        self.folders = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))    # folder -> phase -> [count, seconds]
+        self.counters = defaultdict(int)
+        self.folder = None
+
+    @contextmanager
+    def phase(self, name, folder=None):
+        """
+        计时一个阶段。给出 folder 时，嵌套在其中的阶段也计入该文件夹。
+        """
+        outer_folder = self.folder
+        if folder is not None:
+            self.folder = folder
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, self.folder)
+            self.folder = outer_folder
+
+    def timed(self, name):
+        """
+        装饰器形式的 phase()。
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add(self, name, seconds, folder=None, count=1):
+        entry = self.phases[name]
+        entry[0] += count
+        entry[1] += seconds
+        if folder is not None:
+            entry = self.folders[folder][name]
+            entry[0] += count
+            entry[1] += seconds
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def snapshot(self):
+        return {
+            'phases': {name: list(entry) for name, entry in self.phases.items()},
+            'folders': {folder: {name: list(entry) for name, entry in phases.items()}
+                        for folder, phases in self.folders.items()},
+            'counters': dict(self.counters),
+        }
+
+    def merge(self, snapshot):
+        for name, (count, seconds) in snapshot['phases'].items():
+            entry = self.phases[name]
+            entry[0] += count
+            entry[1] += seconds
+        for folder, phases in snapshot['folders'].items():
+            for name, (count, seconds) in phases.items():
+                entry = self.folders[folder][name]
+                entry[0] += count
+                entry[1] += seconds
+        for name, value in snapshot['counters'].items():
+            self.counters[name] += value
+
+    def summary(self):
+        return {
+            'started': self.started,
+            'finished': time.time(),
+            'phases': {name: {'count': count, 'seconds': round(seconds, 6)}
+                       for name, (count, seconds) in sorted(self.phases.items())},
+            'counters': dict(sorted(self.counters.items())),
+            'folders': {folder: {name: {'count': count, 'seconds': round(seconds, 6)}
+                                 for name, (count, seconds) in sorted(phases.items())}
+                        for folder, phases in sorted(self.folders.items())},
+        }
+
+    def to_prometheus(self):
+        """
+        node_exporter textfile collector 格式，只包含按阶段汇总的指标。
+        """
+        lines = [
+            "# HELP tasker_phase_seconds Wall time spent in each phase during the last run.",
+            "# TYPE tasker_phase_seconds gauge",
+        ]
+        for name, (count, seconds) in sorted(self.phases.items()):
+            lines.append(f'tasker_phase_seconds{{phase="{name}"}} {seconds:.6f}')
+        lines += [
+            "# HELP tasker_phase_calls Number of calls of each phase during the last run.",
+            "# TYPE tasker_phase_calls gauge",
+        ]
+        for name, (count, seconds) in sorted(self.phases.items()):
+            lines.append(f'tasker_phase_calls{{phase="{name}"}} {count}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE tasker_{name} gauge")
+            lines.append(f"tasker_{name} {value}")
+        lines.append("# TYPE tasker_last_run_timestamp_seconds gauge")
+        lines.append(f"tasker_last_run_timestamp_seconds {self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_dir):
+        """
+        写出本次运行的 last_run.json 和 tasker.prom，并在 runs.jsonl 中追加一行按阶段汇总的历史记录；
+        runs.jsonl 超过 RUNS_MAX_BYTES 时先轮转，最多保留两份。
+        """
+        os.makedirs(metrics_dir, exist_ok=True)
+        summary = self.summary()
+        _atomic_write(os.path.join(metrics_dir, 'last_run.json'), json.dumps(summary, indent=2))
+        _atomic_write(os.path.join(metrics_dir, 'tasker.prom'), self.to_prometheus())
+        history = {key: summary[key] for key in ('started', 'finished', 'phases', 'counters')}
+        runs_path = os.path.join(metrics_dir, 'runs.jsonl')
+        try:
+            if os.path.getsize(runs_path) >= RUNS_MAX_BYTES:
+                os.replace(runs_path, f"{runs_path}.1")
+        except OSError:
+            pass
+        with open(runs_path, 'a') as f:
+            f.write(json.dumps(history) + "\n")
+
+
+def _atomic_write(path, content):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+# 进程内共享的实例
+metrics = RunMetrics()
@@ -1,28 +1,30 @@
 import os
-import re
-import sys
+import signal
+import argparse
 import logging
 import shutil
+import tempfile
 from task_generator import check_and_expand_task_file
-from config import AUTOTASKER_GEOMTOOLS_PATH, AUTOTASKER_CALC_PATH, AUTOTASKER_LOG_PATH, AUTOTASKER_BASE_PATH, AUTOTASKER_TEMPLATES_PATH
-
-# 获取当前脚本所在目录
-current_dir = os.path.dirname(os.path.abspath(__file__))
-if current_dir not in sys.path:
-    sys.path.append(current_dir)
+from config import AUTOTASKER_CALC_PATH, AUTOTASKER_LOG_PATH, AUTOTASKER_STATE_PATH, AUTOTASKER_CACHE_PATH, AUTOTASKER_METRICS_PATH, AUTOTASKER_TASK_JOURNAL, AUTOTASKER_RESOURCE_POLICY
+
+from task_state import open_state_store
+from task_graph import TaskGraph
+from task_files import find_task_files, parse_task_file, read_task_journal, task_journal_path
+from task_metrics import metrics
+from keyword_sweep import KeywordSweep
+from checkpoint_chain import CHAIN_MODES, chain_route, incompatibility
+from resource_policy import size_job
+from commands_words import parse_and_write_commands
 
-from orca_generator import OrcaInputGenerator
+# geom_tools 下的解析器（gaussian_log、geometry 等）在真正需要时才导入，
+# 没有任务需要处理时不加载 numpy、RDKit 和 ORCA 相关模块
+from geom_tools.calc_output import output_candidates, find_source_output, is_orca_output, orca_terminated_normally, read_log_data
 
-script_path1 = AUTOTASKER_GEOMTOOLS_PATH
-script_path2 = AUTOTASKER_BASE_PATH
-sys.path.append(script_path1)
-sys.path.append(script_path2)
 # 定义任务路径
 TASKS_DIR = AUTOTASKER_CALC_PATH
 ORCA_TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ORCA')
-
-from geom_extract import extract_info_from_gfj, extract_final_optimized_coordinates_from_log, extract_info_from_input
-from commands_words import parse_and_write_commands
+# 守护模式的 pid 文件，slurms.sh 据此跳过 cron 中的扫描
+WATCH_PID_FILE = os.path.join(AUTOTASKER_CACHE_PATH, 'watch.pid')
 
 # 定义新的日志级别 'skip'，设定为比 'info' 低
 SKIP_LEVEL_NUM = 15  # 比 info (20) 低，介于 DEBUG (10) 和 INFO (20) 之间
@@ -41,12 +43,15 @@ logger = logging.getLogger(__name__)
 # 使用之前的日志路径
 log_file_path = AUTOTASKER_LOG_PATH
 
-# 配置日志，指定输出到日志文件
-logging.basicConfig(
-    filename=log_file_path,  # 使用原先的日志文件路径
-    level=logging.INFO,  # 设置日志级别
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+def configure_logging(log_path=log_file_path):
+    """
+    配置日志，指定输出到日志文件。由 main() 调用，导入本模块时不再修改全局日志配置。
+    """
+    logging.basicConfig(
+        filename=log_path,  # 使用原先的日志文件路径
+        level=logging.INFO,  # 设置日志级别
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
 
 # 检查是否有 %smiles= 字段
 def process_smiles_field(task_info, task_dir):
@@ -63,7 +68,8 @@ def process_smiles_field(task_info, task_dir):
         # 只有在检测到 SMILES 时才导入 RDKit 库
         try:
             import smiles_parser
-            geometry_data = smiles_parser.smiles_to_geometry(smiles)
+            with metrics.phase('smiles_to_geometry'):
+                geometry_data = smiles_parser.smiles_to_geometry(smiles)
             logging.info(f"Geometry data generated for SMILES: {compound_name}")
             return geometry_data
         except ImportError:
@@ -73,125 +79,106 @@ def process_smiles_field(task_info, task_dir):
             logging.error(f"Failed to process SMILES: {e}")
             raise
     return None
-  
-def parse_task_file(task_file):
+
+def process_smiles_conformers(task_info):
     """
-    解析 .task 文件，提取任务信息并解析命令词。支持 ORCA 任务块。
+    处理带构象选项的 %smiles= 字段（如 %smiles=CCCCO nconf=20 rmsd=0.5 window=5），
+    返回 [(文件名前缀, 几何信息)]，每个去重后的低能构象一项，前缀为 c01_、c02_ ...
     """
-    tasks = []
-    current_task = {}
-    in_orca_block = False
-    orca_content = []
-
-    with open(task_file, 'r') as f:
-        lines = f.readlines()
-        
-    for line in lines:
-        line = line.rstrip()
-        
-        if not line:  # 空行标志着新任务块的开始
-            if current_task.get('job_title'):
-                if orca_content:
-                    current_task['orca_block'] = '\n'.join(orca_content)
-                    orca_content = []
-                tasks.append(current_task)
-            current_task = {}
-            in_orca_block = False
-            continue
-            
-        if line.startswith('$'):  # 任务名称
-            current_task['job_title'] = line.strip('$').strip()
-            if line.startswith('$"') and line.endswith('"'):
-                current_task['quoted'] = True
-            else:
-                current_task['quoted'] = False
-        elif line == '-orca-':
-            in_orca_block = True
-            current_task['type'] = 'orca'
-        elif in_orca_block:
-            if line.startswith('%'):  # 在 ORCA 块中处理源任务
-                current_task['source'] = line.strip('%').strip()
-            orca_content.append(line)
-        else:
-            # 现有的 Gaussian 任务解析逻辑
-            if line.startswith('%smiles='):
-                current_task['smiles'] = line.split('=', 1)[1].strip()
-            elif line.startswith('%'):
-                current_task['source'] = line.strip('%').strip()
-            elif line.startswith('!'):
-                current_task['command_words'] = line.strip('!').strip().split()
-            elif line.startswith('#'):
-                current_task['keywords'] = line[1:]
-            elif line.startswith('add ='):
-                current_task['extra_keywords'] = line.split('=')[1].strip()
-
-    # 处理最后一个任务
-    if current_task.get('job_title'):
-        if orca_content:
-            current_task['orca_block'] = '\n'.join(orca_content)
-        tasks.append(current_task)
-
-    return tasks
-
-def expand_keyword_sets(keywords):
+    import smiles_parser
+    options = smiles_parser.parse_conformer_options(task_info['conformer_options'])
+    with metrics.phase('smiles_to_conformers'):
+        conformers = smiles_parser.smiles_to_conformers(task_info['smiles'], **options)
+    logging.info(f"{len(conformers)} conformers kept for SMILES: {task_info['job_title']} "
+                 f"(nconf={options['nconf']}, rmsd={options['rmsd']}, window={options['window']})")
+    width = max(2, len(str(len(conformers))))
+    return [(f"c{index:0{width}d}_", geometry_data) for index, geometry_data in enumerate(conformers, 1)]
+  
+def expand_keyword_sets(keywords, mode='product', excludes=()):
     """
     Expands keyword sets in the format {a,b,c} to multiple keyword strings.
     """
-    pattern = r'\{([^}]+)\}'
-    matches = re.findall(pattern, keywords)
-    
-    if not matches:
-        return [keywords]
-    
-    expanded_keywords = []
-    base_keywords = re.sub(pattern, '{}', keywords)
-    
-    for match in matches:
-        options = [option.strip() for option in match.split(',')]
-        if not expanded_keywords:
-            expanded_keywords = [base_keywords.format(option) for option in options]
-        else:
-            new_expanded = []
-            for existing in expanded_keywords:
-                for option in options:
-                    new_expanded.append(existing.format(option))
-            expanded_keywords = new_expanded
-    
-    return expanded_keywords
+    return [keyword for _, keyword in KeywordSweep(keywords, mode, excludes)]
   
-def update_task_title_with_quotes(task_file_path, task_info):
+def _atomic_write_lines(path, lines):
     """
-    将任务块的标题加引号，并更新到 .task 文件。确保只对匹配的任务块名进行修改。
+    写入同目录下的临时文件后 rename 覆盖，中途失败不会留下写了一半的文件。
     """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+@metrics.timed('update_task_title_with_quotes')
+def mark_tasks_processed(task_file_path, job_titles, use_journal=AUTOTASKER_TASK_JOURNAL):
+    """
+    把一个文件夹中本轮处理过的任务一次性标记为已处理：给 .task 文件中对应的
+    任务块名加引号，或者（use_journal 时）追加到旁路日志，.task 文件保持不变。
+    """
+    titles = list(dict.fromkeys(job_titles))
+    if not titles:
+        return
+
+    if use_journal:
+        done = read_task_journal(task_file_path)
+        new_titles = [title for title in titles if title not in done]
+        if new_titles:
+            journal = task_journal_path(task_file_path)
+            existing = []
+            if os.path.exists(journal):
+                with open(journal, 'r') as f:
+                    existing = f.readlines()
+                if existing and not existing[-1].endswith('\n'):
+                    existing[-1] += '\n'
+            _atomic_write_lines(journal, existing + [f"{title}\n" for title in new_titles])
+        return
+
     with open(task_file_path, 'r') as f:
         lines = f.readlines()
 
+    # 只修改与任务名完全匹配的 $任务名 行
+    pending = {f"${title}": f'$"{title}"' for title in titles}
+    changed = False
     updated_lines = []
-    task_title = f'$"{task_info["job_title"]}"'  # 为任务标题加引号
-
-    # 正则，确保严格匹配任务块名
-    task_title_pattern = rf'^\${re.escape(task_info["job_title"])}$'
-
     for line in lines:
-        # 确保只修改完全匹配的任务块名称
-        if re.match(task_title_pattern, line.strip()):
-            updated_lines.append(line.replace(f"${task_info['job_title']}", task_title))
+        stripped = line.strip()
+        if stripped in pending:
+            updated_lines.append(line.replace(stripped, pending[stripped], 1))
+            changed = True
         else:
             updated_lines.append(line)
 
-    # 写回文件
-    with open(task_file_path, 'w') as f:
-        f.writelines(updated_lines)
+    if changed:
+        _atomic_write_lines(task_file_path, updated_lines)
+
+def update_task_title_with_quotes(task_file_path, task_info):
+    """
+    将单个任务块的标题加引号，并更新到 .task 文件。
+    """
+    mark_tasks_processed(task_file_path, [task_info["job_title"]])
 
 def check_log_file_for_normal_termination(log_file):
     """
-    检查 .log 文件的最后一行是否包含 'Normal termination' 标记
+    检查 .log 文件的最后一行是否包含 'Normal termination' 标记；
+    ORCA 的 .out 文件检查末尾的 'ORCA TERMINATED NORMALLY'
     """
     if not os.path.exists(log_file):
         logging.warning(f"Log file {log_file} does not exist.")
         return False
 
     try:
+        if is_orca_output(log_file):
+            return orca_terminated_normally(log_file)
+
         # 只读取最后一行
         with open(log_file, 'rb') as f:
             f.seek(-2, os.SEEK_END)  # 倒数第二个字节开始向前找换行符
@@ -207,6 +194,64 @@ def check_log_file_for_normal_termination(log_file):
     return False
 
 
+def source_log_path(task_dir, source, original_file_name):
+    """
+    来源任务的输出路径：<task_dir>/<source>/<source>_<原始文件名>.log，
+    来源是 ORCA 任务时为对应的 .out（见 calc_output.output_candidates）
+    """
+    return find_source_output(task_dir, source, original_file_name)
+
+
+def source_job_note(log_file):
+    """
+    来源任务未正常结束时附在日志中的作业状态（见 job_tracker.py），如 " (job TIMEOUT)"；
+    作业失败、超时、内存不足或被取消时另记一条警告，因为它不会再自行结束。
+    """
+    from job_tracker import job_state, FAILED_STATES
+    input_file = f"{os.path.splitext(log_file)[0]}.gjf"
+    state = job_state(input_file)
+    if state is None:
+        return ''
+    if state in FAILED_STATES:
+        logging.warning(f"Job for {os.path.basename(input_file)} ended {state}, its dependents stay blocked.")
+    return f" (job {state})"
+
+
+def load_log_data(log_file):
+    """
+    读取（经缓存的）Gaussian log 或 ORCA 输出的解析结果，转换为 create_gjf_from_task 使用的 log_data。
+    输出中没有结构时记录错误并返回 None。
+    """
+    with metrics.phase('log_extraction'):
+        log_data = read_log_data(log_file)
+    if log_data['geometry'] is None:
+        logging.error(f"No geometry in {log_file}.")
+        return None
+    return log_data
+
+
+def source_checkpoint(task_info, prev_task_log):
+    """
+    任务设置了 chain = chk 时返回来源任务的 .chk 路径（与 log 同名）；
+    未开启、来源不是 Gaussian 任务或 chk 不存在时返回 None。
+    """
+    mode = task_info.get('chain')
+    if not mode:
+        return None
+    if mode not in CHAIN_MODES:
+        logging.warning(f"Unknown chain mode '{mode}' in task {task_info['job_title']}, expected one of: "
+                        f"{', '.join(CHAIN_MODES)}")
+        return None
+    if is_orca_output(prev_task_log):
+        logger.skip(f"{task_info['job_title']} not chained: source is an ORCA task")
+        return None
+    chk_file = f"{os.path.splitext(prev_task_log)[0]}.chk"
+    if not os.path.exists(chk_file):
+        logger.skip(f"{task_info['job_title']} not chained: {chk_file} not found")
+        return None
+    return chk_file
+
+
 def process_redo(task_info, task_dir, original_file_name):
     task_output_dir = os.path.join(task_dir, task_info['job_title'])
     fail_dir = os.path.join(task_output_dir, "fail")
@@ -231,9 +276,16 @@ def process_redo(task_info, task_dir, original_file_name):
     return True
 
 
-def create_gjf_from_task(task_info, input_file, output_dir, log_data=None, geometry_data=None):
+@metrics.timed('create_gjf_from_task')
+def create_gjf_from_task(task_info, input_file, output_dir, log_data=None, geometry_data=None, name_prefix='',
+                         parent_chk=None):
     """
     Generate .gjf file(s) based on task information.
+    name_prefix is prepended to every generated file name (e.g. c01_ for conformers).
+    parent_chk: checkpoint of the source task; each keyword combination that is compatible
+    with the source route reads the guess (and geometry) from it via %oldchk.
+    With AUTOTASKER_RESOURCE_POLICY=1 (off by default), %nprocshared/%mem (and a walltime comment read by
+    slurm_submit.py) are sized per keyword combination from the atom count and route.
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -242,46 +294,56 @@ def create_gjf_from_task(task_info, input_file, output_dir, log_data=None, geome
     logging.info(f"Processing {task_info['job_title']}")
 
     try:
-        # 获取几何信息
+        # 获取几何信息（Geometry 对象，写入时才格式化为坐标行）
         if geometry_data:
             geometry = geometry_data['geometry']
-            charge = geometry_data['charge']
-            spin_multiplicity = geometry_data['spin_multiplicity']
         elif log_data:
-            geometry = log_data['coordinates']
-            charge = log_data['charge']
-            spin_multiplicity = log_data['spin_multiplicity']
-        else:
-            input_data = extract_info_from_input(input_file)
-            geometry = input_data['coordinates']
-            charge = input_data['charge']
-            spin_multiplicity = input_data['spin_multiplicity']
-
-        # 展开关键词集
-        expanded_keywords = expand_keyword_sets(task_info['keywords'])
-        logging.info(f"Expanded keywords: {expanded_keywords}")
-        
-        # 处理关键词映射
-        if '{' in task_info['keywords']:
-            options = [opt.strip() for opt in re.findall(r'\{([^}]+)\}', task_info['keywords'])[0].split(',')]
+            geometry = log_data['geometry']
         else:
-            options = expanded_keywords
+            from geom_tools.geometry import Geometry
+            geometry = Geometry.from_file(input_file)
+        geometry_block = geometry.to_gjf_block()
 
-        # 为每个展开的关键词生成文件
-        for keyword, option in zip(expanded_keywords, options):
-            # 确定文件标识符
-            keyword_identifier = f"{option}_" if '{' in task_info['keywords'] else ''
+        # 关键词扫描：按需逐个生成组合，文件名前缀包含该组合所有轴的取值
+        sweep = KeywordSweep.from_task(task_info)
+        if sweep.axes:
+            logging.info(f"Keyword sweep ({sweep.mode}) over {len(sweep.axes)} groups: {len(sweep)} combinations")
 
+        # 为每个展开的关键词生成文件
+        for keyword_identifier, keyword in sweep:
             # 生成文件名
-            output_basename = f"{keyword_identifier}{task_info['job_title']}_{os.path.splitext(os.path.basename(input_file))[0]}"
+            output_basename = f"{name_prefix}{keyword_identifier}{task_info['job_title']}_{os.path.splitext(os.path.basename(input_file))[0]}"
             output_gjf = os.path.join(output_dir, f"{output_basename}.gjf")
             chk_path = os.path.join(output_dir, f"{output_basename}.chk")
             
             logging.info(f"Generating file: {os.path.basename(output_gjf)}")
+
+            # 检查点续算：基组与来源一致时才使用（电荷、自旋多重度取自来源的 log）
+            old_chk = None
+            geom_check = False
+            if parent_chk:
+                reason = incompatibility(keyword, log_data['keywords'])
+                if reason is None:
+                    old_chk = parent_chk
+                    keyword, geom_check = chain_route(keyword, log_data['keywords'])
+                    logging.info(f"Chaining {os.path.basename(output_gjf)} from {parent_chk}")
+                else:
+                    logger.skip(f"{os.path.basename(output_gjf)} not chained: {reason}")
+
+            header_lines = []
+            if AUTOTASKER_RESOURCE_POLICY:
+                resources = size_job(len(geometry), keyword)
+                header_lines = resources.header_lines()
+                logging.info(f"Resources for {os.path.basename(output_gjf)}: {resources.cores} cores, "
+                             f"{resources.mem}, walltime {resources.time or 'unlimited'}")
             
             # 写入 gjf 文件
             with open(output_gjf, 'w') as f:
-                # 写入 Link 0 命令
+                # 写入资源（时限注释和 %nprocshared/%mem）及 Link 0 命令
+                for line in header_lines:
+                    f.write(f"{line}\n")
+                if old_chk:
+                    f.write(f"%oldchk={old_chk}\n")
                 f.write(f"%chk={chk_path}\n")
                 
                 # 写入计算关键词
@@ -290,12 +352,11 @@ def create_gjf_from_task(task_info, input_file, output_dir, log_data=None, geome
                 # 写入标题
                 f.write(f"{task_info['job_title']}\n\n")
                 
-                # 写入电荷和自旋多重度
-                f.write(f"{charge} {spin_multiplicity}\n")
-                
-                # 写入几何坐标
-                for coord in geometry:
-                    f.write(f"{coord}\n")
+                # 写入电荷、自旋多重度和几何坐标（geom=check 时坐标从 chk 读取）
+                if geom_check:
+                    f.write(f"{geometry.charge} {geometry.multiplicity}\n")
+                else:
+                    f.write(geometry_block)
                 
                 # 写入额外关键词（如果有）
                 if task_info.get('extra_keywords'):
@@ -310,136 +371,428 @@ def create_gjf_from_task(task_info, input_file, output_dir, log_data=None, geome
         logging.error(f"Error in create_gjf_from_task: {str(e)}")
         raise
 
+def create_orca_generator():
+    from orca_generator import OrcaInputGenerator
+    return OrcaInputGenerator(ORCA_TEMPLATES_PATH)
+
 def process_task_folder(task_dir, output_base_dir):
     """
     Process each task folder, parse tasks and generate corresponding gjf files, and handle commands.
+    Returns False if the folder could not be processed and should be retried.
     """
+    with metrics.phase('process_task_folder', task_dir):
+        return _process_task_folder(task_dir, output_base_dir)
+
+def _process_task_folder(task_dir, output_base_dir):
     try:
-        # Find .task files
-        task_files = [f for f in os.listdir(task_dir) if f.endswith(".task")]
-        
-        if not task_files:
+        task_file_path, input_file = find_task_files(task_dir)
+
+        if not task_file_path:
             logging.info(f"No .task files found in {task_dir}")
-            return
-        
-        task_file_path = os.path.join(task_dir, task_files[0])
+            return True
 
-        if not check_and_expand_task_file(task_file_path):
+        with metrics.phase('check_and_expand_task_file'):
+            expanded = check_and_expand_task_file(task_file_path)
+        if not expanded:
             logging.error(f"Failed to process task template in {task_file_path}")
-            return
+            return False
 
-        # Parse .task file first to check if we need ORCA generator
-        tasks = parse_task_file(task_file_path)
+        with metrics.phase('parse_task_file'):
+            tasks = parse_task_file(task_file_path)
         
-        # 只在有 ORCA 任务时才创建生成器
-        orca_generator = None
-        if any(task.get('type') == 'orca' for task in tasks):
-            orca_generator = OrcaInputGenerator(ORCA_TEMPLATES_PATH)
-
-        # Find input file with the same base name as the .task file
-        task_base_name = os.path.splitext(task_files[0])[0]
-        possible_extensions = ['.com', '.gjf', '.xyz']
-        input_file = None
-        
-        # 按优先级顺序查找输入文件
-        for ext in possible_extensions:
-            possible_file = os.path.join(task_dir, task_base_name + ext)
-            if os.path.exists(possible_file):
-                input_file = possible_file
-                break
-
         if not input_file:
             logging.error(f"No input file (.com, .gjf, or .xyz) found for {task_file_path}")
-            return
+            return False
 
         # Get original file name (without path and extension)
         original_file_name = os.path.splitext(os.path.basename(input_file))[0]
         
         logging.info(f"Starting task: {os.path.basename(task_file_path)}")
         
-        for task_info in tasks:
-            task_output_dir = os.path.join(task_dir, task_info['job_title'])
-
-            # 首先检查是否是已处理过的任务
-            if task_info.get('quoted', False):
-                logger.skip(f"{task_info['job_title']} already processed.")
-                continue
-
-            # 检查任务类型并分别处理
-            if task_info.get('type') == 'orca':
-                if orca_generator is None:
-                    orca_generator = OrcaInputGenerator(ORCA_TEMPLATES_PATH)
-                # ORCA 任务处理
-                orca_generator.generate_input(task_info, task_dir, task_output_dir)
-                update_task_title_with_quotes(task_file_path, task_info)
-                continue
+        # 构建依赖图，检查未定义的来源和依赖环
+        graph = TaskGraph(tasks)
+        graph.report_problems(task_file_path)
+
+        def source_finished(source):
+            prev_task_log = source_log_path(task_dir, source, original_file_name)
+            if not os.path.exists(prev_task_log):
+                logger.skip(f"Previous task log file not found: {prev_task_log}{source_job_note(prev_task_log)}")
+                return False
+            with metrics.phase('check_log_termination'):
+                finished = check_log_file_for_normal_termination(prev_task_log)
+            if not finished:
+                logger.skip(f"{os.path.basename(prev_task_log)} unfinished{source_job_note(prev_task_log)}.")
+                return False
+            return True
 
-            # Gaussian 任务处理
-            geometry_data = process_smiles_field(task_info, task_dir)
-            if geometry_data:
-                create_gjf_from_task(task_info, input_file, task_output_dir, geometry_data=geometry_data)
-                update_task_title_with_quotes(task_file_path, task_info)
-                logger.skip(f"{task_info['job_title']} is based on SMILES and does not need log file processing.")
-                continue
+        # 按拓扑顺序一次性放行所有来源已满足的任务；已处理的任务名先收集起来，
+        # 结束时（包括中途出错时）一次性写回 .task 文件
+        processed = []
+        # ORCA 任务在循环结束后一次性渲染（其来源在本轮开始前已经确认结束）
+        orca_jobs = []
+        try:
+            for task_info in graph.iter_ready(source_finished):
+                task_output_dir = os.path.join(task_dir, task_info['job_title'])
 
-            # 处理 %restart 的逻辑
-            if task_info['source'] == "restart":
-                log_file = os.path.join(task_output_dir, f"{task_info['job_title']}_{original_file_name}.log")
-                if os.path.exists(log_file):
-                    log_data = extract_final_optimized_coordinates_from_log(log_file)
-                    create_gjf_from_task(task_info, input_file, task_output_dir, log_data=log_data)
-                    process_redo(task_info, task_dir, original_file_name)
-                else:
-                    logging.error(f"Log file {log_file} not found for restart.")
+                # 检查任务类型并分别处理
+                if task_info.get('type') == 'orca':
+                    orca_jobs.append((task_info, task_dir, task_output_dir, original_file_name))
                     continue
-            
-            # 处理依赖于其他任务的情况
-            elif task_info['source'] != "origin":
-                # 构建前一个任务的日志文件路径
-                prev_task_log = os.path.join(
-                    task_dir, 
-                    task_info['source'], 
-                    f"{task_info['source']}_{original_file_name}.log"
-                )
-
-                if not os.path.exists(prev_task_log):
-                    logger.skip(f"Previous task log file not found: {prev_task_log}")
+
+                # Gaussian 任务处理
+                if task_info.get('smiles') and task_info.get('conformer_options'):
+                    for name_prefix, geometry_data in process_smiles_conformers(task_info):
+                        create_gjf_from_task(task_info, input_file, task_output_dir,
+                                             geometry_data=geometry_data, name_prefix=name_prefix)
+                    processed.append(task_info['job_title'])
                     continue
 
-                if not check_log_file_for_normal_termination(prev_task_log):
-                    logger.skip(f"{os.path.basename(prev_task_log)} unfinished.")
+                geometry_data = process_smiles_field(task_info, task_dir)
+                if geometry_data:
+                    create_gjf_from_task(task_info, input_file, task_output_dir, geometry_data=geometry_data)
+                    processed.append(task_info['job_title'])
+                    logger.skip(f"{task_info['job_title']} is based on SMILES and does not need log file processing.")
                     continue
 
-                log_data = extract_final_optimized_coordinates_from_log(prev_task_log)
-                create_gjf_from_task(task_info, input_file, task_output_dir, log_data=log_data)
+                # 处理 %restart 的逻辑
+                if task_info['source'] == "restart":
+                    log_file = os.path.join(task_output_dir, f"{task_info['job_title']}_{original_file_name}.log")
+                    if os.path.exists(log_file):
+                        log_data = load_log_data(log_file)
+                        if log_data is None:
+                            continue
+                        create_gjf_from_task(task_info, input_file, task_output_dir, log_data=log_data)
+                        process_redo(task_info, task_dir, original_file_name)
+                    else:
+                        logging.error(f"Log file {log_file} not found for restart.")
+                        continue
             
-            else:
-                create_gjf_from_task(task_info, input_file, task_output_dir)
+                # 处理依赖于其他任务的情况（来源的 log 已由依赖图确认正常结束）
+                elif task_info['source'] != "origin":
+                    prev_task_log = source_log_path(task_dir, task_info['source'], original_file_name)
+                    log_data = load_log_data(prev_task_log)
+                    if log_data is None:
+                        continue
+                    create_gjf_from_task(task_info, input_file, task_output_dir, log_data=log_data,
+                                         parent_chk=source_checkpoint(task_info, prev_task_log))
+            
+                else:
+                    create_gjf_from_task(task_info, input_file, task_output_dir)
 
-            update_task_title_with_quotes(task_file_path, task_info)
+                processed.append(task_info['job_title'])
 
-            if task_info.get('command_words'):
-                logging.info(f"Processing command words for task: {task_info['job_title']}")
-                parse_and_write_commands(task_info['command_words'], task_output_dir)
+                if task_info.get('command_words'):
+                    logging.info(f"Processing command words for task: {task_info['job_title']}")
+                    parse_and_write_commands(task_info['command_words'], task_output_dir)
+
+            if orca_jobs:
+                # 只在真正要生成 ORCA 输入时才创建生成器（并导入相关模块）
+                with metrics.phase('orca_generate_input'):
+                    create_orca_generator().render_many(orca_jobs)
+                processed.extend(task_info['job_title'] for task_info, *_ in orca_jobs)
+        finally:
+            mark_tasks_processed(task_file_path, processed)
 
         logging.info(f"Leaving task: {os.path.basename(task_file_path)}\n")
+        return True
 
     except Exception as e:
         logging.error(f"Error processing task folder {task_dir}: {str(e)}")
+        return False
+
+def collect_watched_paths(task_dir):
+    """
+    列出决定该文件夹是否需要重新处理的文件：.task 文件、输入文件，
+    以及所有未处理任务所依赖的 log 文件（包括尚不存在的）。
+    """
+    task_file_path, input_file = find_task_files(task_dir)
+    if not task_file_path:
+        return []
+
+    watched = [task_file_path, task_journal_path(task_file_path)]
+    if not input_file:
+        return watched
+    watched.append(input_file)
+
+    original_file_name = os.path.splitext(os.path.basename(input_file))[0]
+    try:
+        graph = TaskGraph(parse_task_file(task_file_path))
+    except Exception:
+        return watched
+
+    # 来源的输出可能是 Gaussian 的 .log 或 ORCA 的 .out，尚不存在的也要记录
+    for source in graph.waiting_sources():
+        watched.extend(output_candidates(task_dir, source, original_file_name))
+
+    return sorted(set(watched))
+
+class _BufferedLogHandler(logging.Handler):
+    """
+    在工作进程中缓存日志记录，交由主进程按文件夹整体输出。
+    """
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        # 预先格式化消息，保证记录可以跨进程传递
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        self.records.append(record)
+
+def _init_worker(log_level):
+    """
+    工作进程初始化：去掉继承来的日志输出，日志统一由主进程写入。
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(log_level)
+
+def _process_folder_in_worker(task_dir):
+    handler = _BufferedLogHandler()
+    root = logging.getLogger()
+    root.addHandler(handler)
+    # 每个文件夹单独计时，结果随日志一起交回主进程合并
+    metrics.reset()
+    try:
+        ok = process_task_folder(task_dir, task_dir)
+    except Exception as e:
+        logging.error(f"Error processing task folder {task_dir}: {str(e)}")
+        ok = False
+    finally:
+        root.removeHandler(handler)
+    return task_dir, ok, handler.records, metrics.snapshot()
 
-def process_all_tasks(base_dir):
+def _run_task_folders(task_dirs, jobs):
     """
-    遍历所有任务文件夹，逐个处理
+    依次产出 (task_dir, ok)。jobs > 1 时使用进程池并行处理，
+    每个文件夹的日志在其完成后连续输出，不会与其他文件夹交错。
     """
+    if jobs <= 1 or len(task_dirs) <= 1:
+        for task_dir in task_dirs:
+            yield task_dir, process_task_folder(task_dir, task_dir)  # 任务的输出文件夹为当前目录下
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    root = logging.getLogger()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(root.getEffectiveLevel(),)) as executor:
+        futures = {executor.submit(_process_folder_in_worker, task_dir): task_dir for task_dir in task_dirs}
+        for future in as_completed(futures):
+            try:
+                task_dir, ok, records, snapshot = future.result()
+            except Exception as e:
+                task_dir = futures[future]
+                logging.error(f"Worker failed on task folder {task_dir}: {str(e)}")
+                yield task_dir, False
+                continue
+            for record in records:
+                root.handle(record)
+            metrics.merge(snapshot)
+            yield task_dir, ok
+
+@metrics.timed('list_task_dirs')
+def list_task_dirs(base_dir):
+    task_dirs = []
     for subdir in os.listdir(base_dir):
         task_dir = os.path.join(base_dir, subdir)
         if os.path.isdir(task_dir):
-            process_task_folder(task_dir, task_dir)  # 任务的输出文件夹为当前目录下
+            task_dirs.append(task_dir)
+    return task_dirs
 
-if __name__ == "__main__":
+def prewarm_smiles(task_dirs, jobs=1):
+    """
+    处理文件夹之前，一次性（jobs > 1 时并行）为其中尚未处理的 %smiles 任务生成
+    3D 结构并写入缓存，之后各文件夹中的 SMILES 任务直接命中缓存。
+    """
+    smiles = []
+    ensembles = []
+    for task_dir in task_dirs:
+        task_file_path, _ = find_task_files(task_dir)
+        if not task_file_path:
+            continue
+        try:
+            tasks = parse_task_file(task_file_path)
+        except Exception:
+            continue
+        for task in tasks:
+            if not task.get('smiles') or task.get('quoted'):
+                continue
+            if task.get('conformer_options'):
+                ensembles.append(task)
+            else:
+                smiles.append(task['smiles'])
+    if not smiles and not ensembles:
+        return
+
+    try:
+        import smiles_parser
+    except ImportError as e:
+        logging.warning(f"SMILES prewarm skipped: {e}")
+        return
+
+    with metrics.phase('smiles_prewarm'):
+        results = smiles_parser.smiles_to_geometries(smiles, jobs=jobs)
+        # 构象系综的生成本身已由 RDKit 多线程并行，逐个处理
+        for task in ensembles:
+            label = ' '.join([task['smiles']] + task['conformer_options'])
+            try:
+                options = smiles_parser.parse_conformer_options(task['conformer_options'])
+                smiles_parser.smiles_to_conformers(task['smiles'], **options)
+                results[label] = None
+            except Exception as e:
+                results[label] = e
+    failed = [input_string for input_string, result in results.items() if isinstance(result, Exception)]
+    logging.info(f"Prepared geometries for {len(results) - len(failed)} SMILES.")
+    for input_string in failed:
+        logging.warning(f"Failed to prepare geometry for SMILES {input_string}: {results[input_string]}")
+
+def process_task_dirs(task_dirs, state_store=None, jobs=1, prewarm=True):
+    """
+    处理给定的任务文件夹，返回处理失败的文件夹列表。
+    提供 state_store 时跳过自上次以来没有相关变化的文件夹；
+    jobs > 1 时在进程池中并行处理各文件夹；prewarm 时先批量生成 SMILES 结构。
+    """
+    metrics.count('folders_scanned', len(task_dirs))
+    if state_store is not None:
+        with metrics.phase('state_check'):
+            task_dirs = [task_dir for task_dir in task_dirs
+                         if os.path.isdir(task_dir) and not state_store.is_unchanged(task_dir)]
+    metrics.count('folders_processed', len(task_dirs))
+    if prewarm:
+        prewarm_smiles(task_dirs, jobs)
+
+    failed = []
+    for task_dir, ok in _run_task_folders(task_dirs, jobs):
+        if not ok:
+            failed.append(task_dir)
+        if state_store is not None:
+            # 处理失败的文件夹不记录指纹，下一轮重试
+            with metrics.phase('state_record', task_dir):
+                if ok:
+                    state_store.record(task_dir, collect_watched_paths(task_dir))
+                else:
+                    state_store.forget(task_dir)
+    metrics.count('folders_failed', len(failed))
+
+    if failed:
+        logging.warning(f"{len(failed)} of {len(task_dirs)} task folders failed: " +
+                        ", ".join(os.path.basename(task_dir) for task_dir in sorted(failed)))
+    elif task_dirs:
+        logging.info(f"{len(task_dirs)} task folders processed.")
+    return failed
+
+def process_all_tasks(base_dir, state_store=None, jobs=1):
+    """
+    遍历所有任务文件夹并处理，返回处理失败的文件夹列表。
+    """
+    task_dirs = list_task_dirs(base_dir)
+    if state_store is not None:
+        state_store.prune(task_dirs)
+    return process_task_dirs(task_dirs, state_store, jobs)
+
+def run_with_metrics(func, *args, metrics_dir=AUTOTASKER_METRICS_PATH):
+    """
+    运行一轮扫描（func 返回失败文件夹列表），并把本轮各阶段耗时写到 metrics_dir：
+    last_run.json（含按文件夹的明细）、tasker.prom（node_exporter textfile 格式）、
+    runs.jsonl（每轮追加一行汇总，便于比较不同版本的性能；超过 RUNS_MAX_BYTES 时轮转）。
+    """
+    metrics.reset()
+    with metrics.phase('run'):
+        failed = func(*args)
+    if metrics_dir:
+        try:
+            metrics.write(metrics_dir)
+        except OSError as e:
+            logging.warning(f"Failed to write run metrics to {metrics_dir}: {e}")
+    return failed
+
+def watch_tasks(base_dir, state_store=None, jobs=1, poll_interval=30, force_poll=False):
+    """
+    守护模式：启动时做一次全量扫描，此后用 inotify（网络文件系统上退化为
+    stat 轮询）监视计算目录，只重新处理发生变化的文件夹。
+    """
+    from task_watcher import create_watcher
+
+    watcher = create_watcher(base_dir, poll_interval=poll_interval, force_poll=force_poll)
+    try:
+        run_with_metrics(process_all_tasks, base_dir, state_store, jobs)
+        while True:
+            changed = watcher.wait_for_changes()
+            if changed is None:
+                run_with_metrics(process_all_tasks, base_dir, state_store, jobs)
+            elif changed:
+                run_with_metrics(process_task_dirs, sorted(changed), state_store, jobs)
+    finally:
+        watcher.close()
+
+def _write_pid_file(pid_file):
+    os.makedirs(os.path.dirname(pid_file), exist_ok=True)
+    with open(pid_file, 'w') as f:
+        f.write(f"{os.getpid()}\n")
+
+def _dump_profile(profiler, profile_path):
+    import pstats
+    os.makedirs(os.path.dirname(os.path.abspath(profile_path)), exist_ok=True)
+    profiler.dump_stats(profile_path)
+    print(f"Profile written to {profile_path}")
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate Gaussian/ORCA inputs from .task files.')
+    parser.add_argument('--full', action='store_true', help='Ignore the scan state store and process every folder')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes (default: 1)')
+    parser.add_argument('--watch', action='store_true', help='Run as a daemon and react to changes in the calc tree')
+    parser.add_argument('--poll', action='store_true', help='In --watch mode, always use stat polling instead of inotify')
+    parser.add_argument('--poll-interval', type=float, default=30, help='Polling interval in seconds (default: 30)')
+    parser.add_argument('--profile', nargs='?', const=os.path.join(AUTOTASKER_METRICS_PATH, 'profile.pstats'),
+                        metavar='FILE', help='Dump cProfile statistics of the main process to FILE '
+                                             '(default: $AUTOTASKER_METRICS_PATH/profile.pstats); use with -j 1')
+    args = parser.parse_args()
+
+    configure_logging()
     print("----Starting TASKER----")
     print(f"Processing : {TASKS_DIR}")
-    
-    # 处理所有任务
-    process_all_tasks(TASKS_DIR)
-    print("----TASKER complete----")
\ No newline at end of file
+
+    state_store = None if args.full else open_state_store(AUTOTASKER_STATE_PATH)
+    failed = []
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if args.watch:
+            # SIGTERM 按 KeyboardInterrupt 处理，保证状态库正常关闭
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+            _write_pid_file(WATCH_PID_FILE)
+            try:
+                watch_tasks(TASKS_DIR, state_store, jobs=args.jobs,
+                            poll_interval=args.poll_interval, force_poll=args.poll)
+            except KeyboardInterrupt:
+                logging.info("Watch daemon stopped.")
+            finally:
+                if os.path.exists(WATCH_PID_FILE):
+                    os.remove(WATCH_PID_FILE)
+        else:
+            # 处理所有任务
+            failed = run_with_metrics(process_all_tasks, TASKS_DIR, state_store, args.jobs)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _dump_profile(profiler, args.profile)
+        if state_store is not None:
+            state_store.close()
+    if failed:
+        print(f"Failed folders ({len(failed)}):")
+        for task_dir in sorted(failed):
+            print(f"  {task_dir}")
+    print("----TASKER complete----")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,178 @@
+import os
+import json
+import sqlite3
+import logging
+
+from sqlite_store import Schema, open_database, rebuild
+
+logger = logging.getLogger(__name__)
+
+# 状态库结构，version 变化时旧库会被自动重建
+SCHEMA = Schema(
+    version=1,
+    statements=(
+        "CREATE TABLE IF NOT EXISTS folders ("
+        " path TEXT PRIMARY KEY,"
+        " fingerprint TEXT NOT NULL)",
+        # 提交脚本的目录清单缓存：目录 mtime 不变时直接复用上次的子目录和待提交输入文件
+        "CREATE TABLE IF NOT EXISTS listings ("
+        " path TEXT PRIMARY KEY,"
+        " mtime_ns INTEGER NOT NULL,"
+        " listing TEXT NOT NULL)",
+    ),
+    check_table='folders',
+)
+
+
+def stat_signature(path):
+    """
+    返回文件的 (size, mtime_ns) 签名，文件不存在时返回 None。
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def folder_fingerprint(task_dir, watched_paths):
+    """
+    计算任务文件夹的指纹：文件夹本身的 mtime 加上所有被监视文件的签名。
+    文件夹 mtime 能捕获新建/删除的 .task 和输入文件，被监视文件覆盖
+    .task 内容修改、输入文件修改以及依赖任务 log 的出现和增长。
+    """
+    try:
+        dir_mtime = os.stat(task_dir).st_mtime_ns
+    except OSError:
+        return None
+    return {
+        'dir': dir_mtime,
+        'files': {path: stat_signature(path) for path in watched_paths},
+    }
+
+
+class TaskStateStore:
+    """
+    基于 SQLite 的增量扫描状态库。
+
+    为每个任务文件夹记录上一次处理后的指纹（被监视文件列表及其签名），
+    process_all_tasks 只对指纹发生变化的文件夹调用 process_task_folder。
+    数据库缺失、损坏或版本不符时自动重建。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = None
+        self._open()
+
+    def _open(self):
+        self.conn = open_database(self.db_path, SCHEMA, 'Task state store')
+
+    def _rebuild(self):
+        conn, self.conn = self.conn, None
+        self.conn = rebuild(conn, self.db_path, SCHEMA)
+
+    def _execute(self, sql, params=()):
+        try:
+            return self.conn.execute(sql, params)
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"Task state store {self.db_path} is corrupt ({e}), rebuilding.")
+            self._rebuild()
+            return self.conn.execute(sql, params)
+
+    def _executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        try:
+            return self.conn.executemany(sql, seq_of_params)
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"Task state store {self.db_path} is corrupt ({e}), rebuilding.")
+            self._rebuild()
+            return self.conn.executemany(sql, seq_of_params)
+
+    def get_fingerprint(self, task_dir):
+        row = self._execute("SELECT fingerprint FROM folders WHERE path = ?", (task_dir,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def is_unchanged(self, task_dir):
+        """
+        判断任务文件夹自上次处理后是否没有任何相关变化。
+        """
+        stored = self.get_fingerprint(task_dir)
+        if stored is None:
+            return False
+        current = folder_fingerprint(task_dir, stored.get('files', {}).keys())
+        return current == stored
+
+    def record(self, task_dir, watched_paths):
+        """
+        处理完文件夹后记录新的指纹。
+        """
+        fingerprint = folder_fingerprint(task_dir, watched_paths)
+        if fingerprint is None:
+            self.forget(task_dir)
+            return
+        self._execute(
+            "INSERT OR REPLACE INTO folders (path, fingerprint) VALUES (?, ?)",
+            (task_dir, json.dumps(fingerprint)),
+        )
+        self.conn.commit()
+
+    def forget(self, task_dir):
+        self._execute("DELETE FROM folders WHERE path = ?", (task_dir,))
+        self.conn.commit()
+
+    def prune(self, existing_dirs):
+        """
+        删除已不存在的文件夹记录。
+        """
+        existing = set(existing_dirs)
+        stale = [row[0] for row in self._execute("SELECT path FROM folders") if row[0] not in existing]
+        for path in stale:
+            self._execute("DELETE FROM folders WHERE path = ?", (path,))
+        self.conn.commit()
+
+    def load_listings(self):
+        """
+        返回 {目录: (mtime_ns, 清单)}。
+        """
+        listings = {}
+        for path, mtime_ns, listing in self._execute("SELECT path, mtime_ns, listing FROM listings"):
+            try:
+                listings[path] = (mtime_ns, json.loads(listing))
+            except ValueError:
+                continue
+        return listings
+
+    def save_listings(self, changed, stale=()):
+        """
+        changed: {目录: (mtime_ns, 清单)}，stale: 已不存在的目录。一次事务写入。
+        """
+        if not changed and not stale:
+            return
+        self._executemany(
+            "INSERT OR REPLACE INTO listings (path, mtime_ns, listing) VALUES (?, ?, ?)",
+            [(path, mtime_ns, json.dumps(listing)) for path, (mtime_ns, listing) in changed.items()])
+        self._executemany("DELETE FROM listings WHERE path = ?", [(path,) for path in stale])
+        self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def open_state_store(db_path):
+    """
+    打开状态库；目录不可写或重建后仍无法打开时记一条警告并返回 None，
+    调用方不使用状态库继续（任务扫描退化为全量扫描，提交脚本不使用目录清单缓存）。
+    """
+    try:
+        return TaskStateStore(db_path)
+    except Exception as e:
+        logger.warning(f"Task state store {db_path} unavailable ({e}), continuing without it.")
+        return None
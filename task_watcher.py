@@ -0,0 +1,241 @@
+import os
+import time
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+import logging
+
+logger = logging.getLogger(__name__)
+
+# inotify 事件掩码，见 <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+# 计算树下只关心的文件后缀：任务文件、输入文件和依赖的 log
+_PROJECT_SUFFIXES = ('.task', '.com', '.gjf', '.xyz')
+_OUTPUT_SUFFIXES = ('.log', '.out')
+
+# inotify 无法感知其他节点写入的网络文件系统
+_REMOTE_FS_TYPES = {'nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'lustre', 'gpfs', 'beegfs', 'fuse.sshfs', 'panfs'}
+
+
+def filesystem_type(path):
+    """
+    从 /proc/mounts 查找 path 所在挂载点的文件系统类型，找不到时返回 None。
+    """
+    path = os.path.realpath(path)
+    best_mount, best_type = '', None
+    try:
+        with open('/proc/mounts', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point = parts[1].replace('\\040', ' ')
+                if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) \
+                        and len(mount_point) >= len(best_mount):
+                    best_mount, best_type = mount_point, parts[2]
+    except OSError:
+        return None
+    return best_type
+
+
+def is_remote_filesystem(path):
+    fs_type = filesystem_type(path)
+    return fs_type is not None and fs_type in _REMOTE_FS_TYPES
+
+
+class PollWatcher:
+    """
+    轮询模式：每隔 interval 秒报告一次全量扫描。
+    是否真正需要处理由扫描状态库的 stat 指纹判断，因此每轮的开销只是若干次 stat。
+    """
+
+    def __init__(self, base_dir, interval=30):
+        self.base_dir = base_dir
+        self.interval = interval
+
+    def wait_for_changes(self):
+        """
+        阻塞直到下一轮，返回 None 表示需要全量（增量）扫描。
+        """
+        time.sleep(self.interval)
+        return None
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    基于 inotify 的监视器，通过 ctypes 直接调用 libc，不依赖第三方库。
+
+    监视计算根目录、每个项目文件夹以及项目下的任务输出文件夹，
+    把新的 .task/输入文件和写完（close_write）的 .log 映射回所属项目文件夹。
+    """
+
+    ROOT_MASK = IN_CREATE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM | IN_ONLYDIR
+    PROJECT_MASK = IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM | IN_ONLYDIR
+    OUTPUT_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_ONLYDIR
+
+    def __init__(self, base_dir, settle=2.0, rescan_interval=600):
+        self.base_dir = os.path.abspath(base_dir)
+        self.settle = settle
+        self.rescan_interval = rescan_interval
+        self.watches = {}  # wd -> (path, level)，level 0=根目录 1=项目 2=任务输出
+        self._last_rescan = time.monotonic()
+
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError("libc not found, inotify unavailable")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("inotify is not supported on this platform")
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+
+        try:
+            self._add_watch(self.base_dir, 0)
+            for entry in os.scandir(self.base_dir):
+                if entry.is_dir(follow_symlinks=False):
+                    self._add_project(entry.path)
+        except Exception:
+            self.close()
+            raise
+
+    def _add_watch(self, path, level):
+        mask = (self.ROOT_MASK, self.PROJECT_MASK, self.OUTPUT_MASK)[level]
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(err, f"inotify_add_watch failed for {path}: {os.strerror(err)}")
+        self.watches[wd] = (path, level)
+
+    def _add_project(self, project_dir):
+        self._add_watch(project_dir, 1)
+        try:
+            for entry in os.scandir(project_dir):
+                if entry.is_dir(follow_symlinks=False):
+                    self._add_watch(entry.path, 2)
+        except OSError:
+            pass
+
+    def _read_events(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode(errors='replace')
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def _handle_event(self, wd, mask, name, changed):
+        """
+        处理单个事件，返回 False 表示需要全量扫描（事件队列溢出）。
+        """
+        if mask & IN_Q_OVERFLOW:
+            return False
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)
+            return True
+        if wd not in self.watches:
+            return True
+
+        path, level = self.watches[wd]
+        full_path = os.path.join(path, name)
+        is_dir = bool(mask & IN_ISDIR)
+
+        if level == 0:
+            if is_dir:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_project(full_path)
+                changed.add(full_path)
+        elif level == 1:
+            if is_dir:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_watch(full_path, 2)
+            elif name.endswith(_PROJECT_SUFFIXES):
+                changed.add(path)
+        elif not is_dir and name.endswith(_OUTPUT_SUFFIXES):
+            changed.add(os.path.dirname(path))
+        return True
+
+    def wait_for_changes(self):
+        """
+        阻塞直到有相关变化，返回发生变化的项目文件夹集合；
+        返回 None 表示需要全量（增量）扫描，例如事件队列溢出或到达定期重扫时间。
+        第一个事件到达后再等待 settle 秒，合并同一批写入产生的事件。
+        """
+        changed = set()
+        deadline = None
+        while True:
+            now = time.monotonic()
+            if now - self._last_rescan >= self.rescan_interval:
+                self._last_rescan = now
+                return None
+
+            if deadline is None:
+                timeout = self.rescan_interval - (now - self._last_rescan)
+            else:
+                timeout = deadline - now
+                if timeout <= 0:
+                    return changed
+
+            ready, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+            if not ready:
+                continue
+            for wd, mask, name in self._read_events():
+                if not self._handle_event(wd, mask, name, changed):
+                    logger.warning("inotify event queue overflowed, rescanning calc tree.")
+                    self._last_rescan = time.monotonic()
+                    return None
+            if changed and deadline is None:
+                deadline = time.monotonic() + self.settle
+
+    def close(self):
+        if getattr(self, 'fd', -1) >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def create_watcher(base_dir, poll_interval=30, force_poll=False):
+    """
+    优先使用 inotify；在网络文件系统上、inotify 不可用或监视数超限时退化为轮询。
+    """
+    if force_poll:
+        return PollWatcher(base_dir, poll_interval)
+    if is_remote_filesystem(base_dir):
+        logger.info(f"{base_dir} is on a network filesystem, using stat polling every {poll_interval}s.")
+        return PollWatcher(base_dir, poll_interval)
+    try:
+        watcher = InotifyWatcher(base_dir, rescan_interval=max(poll_interval, 600))
+        logger.info(f"Watching {base_dir} with inotify ({len(watcher.watches)} directories).")
+        return watcher
+    except OSError as e:
+        logger.warning(f"inotify unavailable ({e}), using stat polling every {poll_interval}s.")
+        return PollWatcher(base_dir, poll_interval)